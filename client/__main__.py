@@ -1,26 +1,54 @@
 import getopt
 import sys
 import textwrap
+from typing import Any
 
+from client.action_registry import ActionRegistry
 from client.client import Client
+from client.script_runner import ScriptRunner
 from client.http_service import HTTPService
-from client.execute_command_action import ExecuteCommandAction
-from client.upload_file_action import UploadFileAction
-from client.download_file_action import DownloadFileAction
-from client.show_history_action import ShowHistoryAction 
-from client.delete_history_action import DeleteHistoryAction
-from client.show_help_action import ShowHelpAction
-
-def parse_arguments() -> dict[str, str]:
+from client.history_service import HistoryService
+
+def parse_arguments() -> dict[str, Any]:
     # Parse the arguments
-    options = 'u:h'
-    long_options = ['url=', 'help']
+    options = 'u:bh'
+    long_options = ['url=', 'binary', 'fsync=', 'history-size=', 'collapse-duplicates', 'history-db=', 'async', 'script=', 'format=', 'window=', 'timeout=', 'help']
     options, _ = getopt.getopt(sys.argv[1:], options, long_options)
 
     url = None
+    protocol = HTTPService.JSON_PROTOCOL
+    fsync = HistoryService.FSYNC_PERIODIC
+    history_size = str(HistoryService.MAX_ENTRIES)
+    collapse_duplicates = False
+    history_db = None
+    asynchronous = False
+    script = None
+    output_format = ScriptRunner.JSONL_FORMAT
+    window = '1'
+    timeout = str(HTTPService.READ_TIMEOUT)
     for opt, arg in options:
         if opt in ['-u', '--url']:
             url = arg
+        elif opt in ['-b', '--binary']:
+            protocol = HTTPService.BINARY_PROTOCOL
+        elif opt == '--fsync':
+            fsync = arg
+        elif opt == '--history-size':
+            history_size = arg
+        elif opt == '--collapse-duplicates':
+            collapse_duplicates = True
+        elif opt == '--history-db':
+            history_db = arg
+        elif opt == '--async':
+            asynchronous = True
+        elif opt == '--script':
+            script = arg
+        elif opt == '--format':
+            output_format = arg
+        elif opt == '--window':
+            window = arg
+        elif opt == '--timeout':
+            timeout = arg
         elif opt in ['-h', '--help']:
             show_help()
             exit(0)
@@ -33,7 +61,48 @@ def parse_arguments() -> dict[str, str]:
         print('Error: an url must be supplied. Use --help to show the help menu')
         exit(1)
 
-    return { 'url': url }
+    # Check the history fsync policy
+    if fsync not in [ HistoryService.FSYNC_ALWAYS, HistoryService.FSYNC_PERIODIC, HistoryService.FSYNC_NEVER ]:
+        print('Error: the fsync policy must be one of always, periodic or never')
+        exit(1)
+
+    # Check the maximum number of commands kept in the history
+    if not history_size.isdigit() or int(history_size) < 1:
+        print('Error: the history size must be a positive number')
+        exit(1)
+
+    # Check the script output format
+    if output_format not in [ ScriptRunner.JSONL_FORMAT, ScriptRunner.TEXT_FORMAT ]:
+        print('Error: the output format must be one of jsonl or text')
+        exit(1)
+
+    # Check the number of requests that may be in flight at once
+    if not window.isdigit() or int(window) < 1:
+        print('Error: the nonce window must be a positive number')
+        exit(1)
+
+    # Check the time to wait for each response
+    if not timeout.replace('.', '', 1).isdigit() or float(timeout) <= 0:
+        print('Error: the timeout must be a positive number of seconds')
+        exit(1)
+
+    # Commands piped to the client are run as a script
+    if script is None and not sys.stdin.isatty():
+        script = '-'
+
+    return {
+        'url': url,
+        'protocol': protocol,
+        'fsync': fsync,
+        'history_size': int(history_size),
+        'collapse_duplicates': collapse_duplicates,
+        'history_db': history_db,
+        'async': asynchronous,
+        'script': script,
+        'format': output_format,
+        'window': int(window),
+        'timeout': float(timeout)
+    }
 
 def show_help() -> None:
     help = '''
@@ -45,11 +114,31 @@ def show_help() -> None:
     
     python -m client -u https://www.example.com/webshell
     python -m client --url=https://www.example.com/webshell
+    python -m client -u https://www.example.com/webshell < commands.txt
 
 
     Arguments:
 
     -u <url>, --url <url> : target url where the webshell is accessible
+    -b, --binary          : use the compact binary protocol (the webshell must support it)
+    --fsync <policy>      : when to sync the command history to disk: always, periodic
+                            (default) or never
+    --history-size <n>    : maximum number of commands kept in the history (default 100000)
+    --collapse-duplicates : do not save a command repeated right after itself
+    --history-db <path>   : save the command history to an SQLite database, which can be
+                            searched by any fragment and shared by several clients
+    --async               : keep accepting commands while a request is in flight. Ctrl-C
+                            cancels the running command instead of closing the session
+    --script <file>       : run the commands of a file (- for the standard input, which is
+                            used by default when it is not a terminal) instead of reading
+                            them interactively, sending consecutive commands in a single
+                            request if possible
+    --window <n>          : allow up to n requests in flight at once (background jobs, for
+                            instance), if the webshell supports issuing several nonces
+    --timeout <seconds>   : time to wait for each response before giving up (default 300).
+                            Downloads and uploads are retried if the connection fails
+    --format <format>     : output of scripts: a JSON line per command with its output and
+                            timing (jsonl, the default) or the plain output (text)
     -h, --help            : help menu
 
     Actions:
@@ -62,25 +151,61 @@ def show_help() -> None:
     '''
     print(textwrap.dedent(help))
 
-if __name__ == '__main__':
-    # Parse arguments
-    args = parse_arguments()
-
+def initialize_services(args: dict[str, Any]) -> None:
     # Initialize HTTP Service
     key = bytes.fromhex('3b151a68047f4dcb2ba7a0fd58f670460366defdcce02236906e17f2332f6b64')
     nonce = '5cd6313bebd006dc5d19cf5175f9cba6'
-    HTTPService().initialize(args['url'], key, nonce)
-
-    # Create list of actions
-    actions = {
-        'execute_command': ExecuteCommandAction(),
-        'upload_file': UploadFileAction(),
-        'download_file': DownloadFileAction(),
-        'show_history': ShowHistoryAction(),
-        'delete_history': DeleteHistoryAction(),
-        'show_help': ShowHelpAction()
-    }
+    HTTPService().initialize(
+        args['url'],
+        key,
+        nonce,
+        args['protocol'],
+        args['window'],
+        (HTTPService.CONNECT_TIMEOUT, args['timeout'])
+    )
+
+    # Configure how the history is saved
+    HistoryService().configure(
+        fsync_policy = args['fsync'],
+        max_entries = args['history_size'],
+        collapse_duplicates = args['collapse_duplicates']
+    )
+    if args['history_db'] is not None:
+        HistoryService().use_database(args['history_db'])
+
+def create_actions() -> ActionRegistry:
+    # Register the actions, which are imported and created the first time they are run
+    actions = ActionRegistry()
+    actions.register('execute_command', 'client.execute_command_action', 'ExecuteCommandAction')
+    actions.register('execute_batch', 'client.execute_batch_action', 'ExecuteBatchAction')
+    actions.register('upload_file', 'client.upload_file_action', 'UploadFileAction')
+    actions.register('download_file', 'client.download_file_action', 'DownloadFileAction')
+    actions.register('show_history', 'client.show_history_action', 'ShowHistoryAction')
+    actions.register('delete_history', 'client.delete_history_action', 'DeleteHistoryAction')
+    actions.register('show_help', 'client.show_help_action', 'ShowHelpAction')
+    actions.register('show_stats', 'client.show_stats_action', 'ShowStatsAction')
+    actions.register('show_jobs', 'client.show_jobs_action', 'ShowJobsAction')
+    actions.register('foreground_job', 'client.foreground_job_action', 'ForegroundJobAction')
+    actions.register('resync', 'client.resync_action', 'ResyncAction')
+    actions.register('start_job', 'client.start_job_action', 'StartJobAction', actions)
+    return actions
+
+if __name__ == '__main__':
+    # Parse arguments and prepare the client
+    args = parse_arguments()
+    initialize_services(args)
+    actions = create_actions()
 
     # Run the client
-    client = Client(actions)
+    if args['script'] == '-':
+        exit(ScriptRunner(actions, sys.stdin, args['format']).run())
+    elif args['script'] is not None:
+        with open(args['script'], 'r') as script:
+            exit(ScriptRunner(actions, script, args['format']).run())
+    if args['async']:
+        # asyncio is only imported if it is used
+        from client.async_client import AsyncClient
+        client = AsyncClient(actions)
+    else:
+        client = Client(actions)
     client.run()
@@ -0,0 +1,33 @@
+from client.action import Action
+
+from typing import Any
+import importlib
+import threading
+
+class ActionRegistry(dict[str, Action]):
+    # Table of actions whose modules are only imported, and whose objects are only constructed, the
+    # first time each action is run, so that the startup does not pay for unused actions
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.__specs: dict[str, tuple[str, str, tuple[Any, ...]]] = {}
+        self.__lock = threading.Lock()
+
+    def register(self, name: str, module: str, class_name: str, *args: Any) -> None:
+        # Save where the action is defined and the arguments to construct it with
+        self.__specs[name] = (module, class_name, args)
+
+    def __contains__(self, name: object) -> bool:
+        return super().__contains__(name) or name in self.__specs
+
+    def __missing__(self, name: str) -> Action:
+        # Actions may be run from background jobs, so they are only constructed once
+        if name not in self.__specs:
+            raise KeyError(name)
+
+        with self.__lock:
+            if not super().__contains__(name):
+                module, class_name, args = self.__specs[name]
+                action = getattr(importlib.import_module(module), class_name)(*args)
+                self[name] = action
+            return super().__getitem__(name)
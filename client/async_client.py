@@ -0,0 +1,99 @@
+from client.action import Action
+from client.async_http_service import AsyncHTTPService
+from client.client import Client
+from client.command_parser import CommandError
+
+import asyncio
+import signal
+
+class AsyncClient(Client):
+    # Non-blocking version of the client. Input is read on a separate thread, so that commands can be
+    # typed while previous ones are running. Commands run in order, their output is printed as soon as
+    # it arrives, and Ctrl-C cancels the running command without closing the session
+
+    def __init__(self, actions: dict[str, Action]) -> None:
+        super().__init__(actions)
+        self.__actions = actions
+        self.__current = None
+
+    def run(self) -> int:
+        return asyncio.run(self.__run())
+
+    async def __run(self) -> int:
+        # Cancel the running command on Ctrl-C, if the platform allows handling signals in the loop
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        # Run the commands in the background, in the order they are typed
+        commands: asyncio.Queue[str | None] = asyncio.Queue()
+        worker = asyncio.create_task(self.__run_commands(commands))
+
+        user_input = await self.__input()
+        while user_input is not None and user_input != 'exit':
+            # Batches are read here, since input is only read from one thread at a time
+            if user_input == '!batch':
+                user_input = await self.__read_batch()
+            commands.put_nowait(user_input)
+            user_input = await self.__input()
+
+        # Wait for the pending commands before leaving
+        commands.put_nowait(None)
+        await worker
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        return 0
+
+    def cancel(self) -> None:
+        # Cancel the running command, if any
+        if self.__current is not None and not self.__current.done():
+            self.__current.cancel()
+
+    async def __input(self, prompt: str = '$ ') -> str | None:
+        # Read a line without blocking the loop. The end of the input closes the session
+        try:
+            return await asyncio.to_thread(input, prompt)
+        except EOFError:
+            return None
+
+    async def __read_batch(self) -> str:
+        # Join the commands typed until !end to the !batch line
+        lines = [ '!batch' ]
+        line = await self.__input('> ')
+        while line is not None and line != '!end':
+            lines.append(line)
+            line = await self.__input('> ')
+
+        return '\n'.join(lines)
+
+    async def __run_commands(self, commands: asyncio.Queue) -> None:
+        user_input = await commands.get()
+        while user_input is not None:
+            self.__current = asyncio.create_task(self.__run_command(user_input))
+            try:
+                print(await self.__current)
+            except asyncio.CancelledError:
+                print('Cancelled')
+            except CommandError as e:
+                print(f'Error: {e}')
+            except:
+                print('Error: the requested action could not be performed')
+            self.__current = None
+
+            user_input = await commands.get()
+
+    async def __run_command(self, user_input: str) -> str:
+        # Select and run the action on the transport thread, converting newlines if necessary. Big
+        # command outputs are previewed, since the pager would compete with the input thread
+        action, args = await AsyncHTTPService().call(self.select_action, user_input)
+        if action == 'execute_command' and 'output_file' not in args:
+            output = await AsyncHTTPService().call(self.run_command, args)
+            return output.preview()
+
+        output = await AsyncHTTPService().call(self.__actions[action].run, args)
+        return output.replace('\\n', '\n')
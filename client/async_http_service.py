@@ -0,0 +1,44 @@
+from client.singleton import Singleton
+from client.http_service import HTTPService
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+import asyncio
+import threading
+
+class AsyncHTTPService(Singleton):
+    # Asynchronous interface to HTTPService. Requests are sent on a single transport thread, since the
+    # nonce chain requires them to reach the webshell one at a time. Cancelling a request that has
+    # not been sent yet discards it. One already in flight is abandoned along with its thread, and the
+    # next request is sent from a new transport thread once the nonce is resynchronized, instead of
+    # waiting for the shell to answer the cancelled one
+
+    def __init__(self) -> None:
+        self.__start_transport()
+
+    async def send_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        return await self.call(HTTPService().send_request, request)
+
+    async def call(self, function: Callable[..., Any], *args: Any) -> Any:
+        # Run a function that sends requests (an action, for instance) on the transport thread
+        future = self.__executor.submit(function, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancel() and not future.done():
+                self.__abandon_transport()
+            raise
+
+    def __start_transport(self) -> None:
+        self.__transport = None
+        self.__executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'transport', initializer = self.__bind_transport)
+
+    def __bind_transport(self) -> None:
+        # The thread starts before running its first function, so it is known once a function runs
+        self.__transport = threading.current_thread()
+
+    def __abandon_transport(self) -> None:
+        # The abandoned thread stops as soon as its request is answered or times out
+        HTTPService().abort(self.__transport)
+        self.__executor.shutdown(wait = False, cancel_futures = True)
+        self.__start_transport()
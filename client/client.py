@@ -1,56 +1,123 @@
 from client.action import Action
+from client.command_parser import CommandError, CommandParser
+from client.output_sink import OutputSink
 
+from typing import Any
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
 import textwrap
 
 class Client:
-    def __init__(self, actions: dict[str, Action]) -> None:
+    # Class constants -> commands ending in > !<file> save their output to a local file. Outputs too
+    # big to be kept in memory are shown through the pager, or previewed if there is none
+    REDIRECT = re.compile(r'\s*>\s*!(\S+)\s*$')
+    DEFAULT_PAGER = 'less'
+
+    def __init__(self, actions: dict[str, Action], parser: CommandParser | None = None) -> None:
+        # New commands can be added by registering them in the parser
         self.__actions = actions
+        self.parser = parser if parser is not None else self.create_parser()
+
+    @staticmethod
+    def create_parser() -> CommandParser:
+        # Commands, and the action each of them runs. History recalls are resolved by the client
+        parser = CommandParser()
+        parser.register('!help', 'show_help')
+        parser.register('!put', 'upload_file', { 'filename': CommandParser.WORD }, { 'binary': False })
+        parser.register('!binput', 'upload_file', { 'filename': CommandParser.WORD }, { 'binary': True })
+        parser.register('!get', 'download_file', { 'filename': CommandParser.WORD }, { 'binary': False })
+        parser.register('!binget', 'download_file', { 'filename': CommandParser.WORD }, { 'binary': True })
+        parser.register('!history', 'show_history')
+        parser.register('!delete', 'delete_history')
+        parser.register('!stats', 'show_stats')
+        parser.register('!batch', 'execute_batch', { 'cmds': CommandParser.LINES })
+        parser.register('!resync', 'resync')
+        parser.register('!jobs', 'show_jobs')
+        parser.register('!fg', 'foreground_job', { 'id': CommandParser.INTEGER })
+        parser.register('!search', 'show_history', { 'find': CommandParser.LINE })
+        parser.register_prefix('!?', 'repeat_command', { 'contains': CommandParser.LINE })
+        parser.register_prefix('!', 'repeat_command', { 'search': CommandParser.LINE })
+        parser.register_prefix('', 'execute_command', { 'cmd': CommandParser.LINE })
+        return parser
 
     def run(self) -> int:
         user_input = input('$ ')
 
         while not user_input == 'exit':
-            # Call the appropriate action
-            action = ''
-            args = {}
-
-            # Select the appropriate action
-            if user_input == '!help':
-                action = 'show_help'
-                args = {}
-            elif user_input.startswith('!put'):
-                action = 'upload_file'
-                args = { 'filename': user_input.split(' ', 1)[1], 'binary': False }
-            elif user_input.startswith('!binput'):
-                action = 'upload_file'
-                args = { 'filename': user_input.split(' ', 1)[1], 'binary': True}
-            elif user_input.startswith('!get'):
-                action = 'download_file'
-                args = { 'filename': user_input.split(' ', 1)[1], 'binary': False }
-            elif user_input.startswith('!binget'):
-                action = 'download_file'
-                args = { 'filename': user_input.split(' ', 1)[1], 'binary': True}
-            elif user_input == '!history':
-                action = 'show_history'
-                args = {}
-            elif user_input == '!delete':
-                action = 'delete_history'
-                args = {}
-            elif user_input.startswith('!'):
-                previous_command = self.__actions['show_history'].run({ 'search': user_input.lstrip('!') })
-                action = 'execute_command'
-                args = { 'cmd': previous_command }
-            else:
-                action = 'execute_command'
-                args = { 'cmd': user_input }
-
-            # Run the action
+            # Run the appropriate action
             try:
-                output = self.__actions[action].run(args)
-                print(output.replace('\\n', '\n'))
+                action, args = self.select_action(user_input)
+                if action == 'execute_command' and 'output_file' not in args:
+                    self.show_output(self.run_command(args))
+                else:
+                    output = self.__actions[action].run(args)
+                    print(output.replace('\\n', '\n'))
+            except CommandError as e:
+                print(f'Error: {e}')
             except:
                 print('Error: the requested action could not be performed')
 
             user_input = input('$ ')
 
         return 0
+
+    def run_command(self, args: dict[str, Any]) -> OutputSink:
+        # Stream the output of the command into a sink, which keeps small outputs in memory and spills
+        # big ones to a temporary file. Outputs returned instead of streamed are written to it too
+        with OutputSink() as output:
+            returned_output = self.__actions['execute_command'].run({ **args, 'sink': output.write })
+            if isinstance(returned_output, str):
+                output.write(returned_output)
+
+        return output
+
+    def show_output(self, output: OutputSink) -> None:
+        # Print small outputs, and page big ones if the client runs on a terminal
+        if not output.spilled:
+            print(output.text)
+            return
+
+        pager = shlex.split(os.environ.get('PAGER', self.DEFAULT_PAGER))
+        if sys.stdout.isatty() and len(pager) > 0 and shutil.which(pager[0]) is not None:
+            subprocess.run(pager + [ output.path ])
+            print(f'Full output saved to {output.path}')
+        else:
+            print(output.preview())
+
+    def select_action(self, user_input: str) -> tuple[str, dict[str, Any]]:
+        # Command lines ending in & run in the background
+        command = user_input.rstrip()
+        if command.endswith('&') and not command.endswith('&&'):
+            command = command[:-1].rstrip()
+            action, args = self.select_action(command)
+            return 'start_job', { 'action': action, 'args': args, 'description': command }
+
+        action, args = self.parser.parse(user_input)
+        if action == 'repeat_command':
+            # Run the previous command found in the history
+            action, args = 'execute_command', { 'cmd': self.__actions['show_history'].run(args) }
+        elif action == 'execute_batch' and len(args['cmds']) == 0:
+            # The commands may follow the !batch line, or be typed until !end
+            args = { 'cmds': self.read_batch() }
+        elif action == 'execute_command':
+            # The output may be redirected to a local file
+            redirect = self.REDIRECT.search(user_input)
+            if redirect is not None:
+                args = { 'cmd': user_input[:redirect.start()], 'output_file': redirect.group(1) }
+
+        return action, args
+
+    def read_batch(self) -> list[str]:
+        # Prompt for the commands of the batch until !end
+        cmds = []
+        cmd = input('> ')
+        while not cmd == '!end':
+            if len(cmd) > 0:
+                cmds.append(cmd)
+            cmd = input('> ')
+
+        return cmds
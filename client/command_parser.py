@@ -0,0 +1,91 @@
+from typing import Any
+import shlex
+
+class CommandError(ValueError):
+    # Raised when a line does not match the arguments of its command
+    pass
+
+class CommandParser:
+    # Compiled command grammar -> the first word of a line selects its command from a dispatch table,
+    # and the rest of the line is split into the arguments of the command, honouring quotes but keeping
+    # backslashes, which are part of Windows paths. Prefixes
+    # glued to their argument (such as !?<fragment>) are looked up by length, from the longest one,
+    # and the empty prefix matches any line
+
+    # Kinds of arguments -> a single word, a word converted to a number, the rest of the line as
+    # typed, or the non-empty lines following the command
+    WORD = 'word'
+    INTEGER = 'integer'
+    LINE = 'line'
+    LINES = 'lines'
+
+    def __init__(self) -> None:
+        self.__commands: dict[str, tuple[str, dict[str, str], dict[str, Any], str]] = {}
+        self.__prefixes: dict[str, tuple[str, dict[str, str], dict[str, Any], str]] = {}
+        self.__prefix_lengths: list[int] = []
+
+    def register(self, name: str, action: str, schema: dict[str, str] = {}, defaults: dict[str, Any] = {}) -> None:
+        # Lines whose first word is the name run the action with the arguments of the schema, in
+        # order, and the defaults
+        self.__commands[name] = (action, schema, defaults, self.__usage(name, schema))
+
+    def register_prefix(self, prefix: str, action: str, schema: dict[str, str] = {}, defaults: dict[str, Any] = {}) -> None:
+        # Lines starting with the prefix, and matching no command, run the action with the rest of
+        # the line as its arguments
+        self.__prefixes[prefix] = (action, schema, defaults, self.__usage(prefix, schema))
+        self.__prefix_lengths = sorted({ len(p) for p in self.__prefixes }, reverse = True)
+
+    def parse(self, line: str) -> tuple[str, dict[str, Any]]:
+        # Look the first word up in the commands, and the start of the line up in the prefixes
+        words = line.split(None, 1)
+        name = words[0] if len(words) > 0 and line.startswith(words[0]) else None
+        if name in self.__commands:
+            command, rest = self.__commands[name], words[1] if len(words) > 1 else ''
+        else:
+            prefix = next((line[:length] for length in self.__prefix_lengths if line[:length] in self.__prefixes), None)
+            if prefix is None:
+                raise CommandError(f'Unknown command: {line}')
+            command, rest = self.__prefixes[prefix], line[len(prefix):]
+
+        action, schema, defaults, usage = command
+        return action, { **defaults, **self.__parse_arguments(rest, schema, usage) }
+
+    def __parse_arguments(self, rest: str, schema: dict[str, str], usage: str) -> dict[str, Any]:
+        # The rest of the line is split in words unless the schema takes it as typed
+        words = []
+        if not any(kind in [ self.LINE, self.LINES ] for kind in schema.values()):
+            try:
+                words = self.__split(rest)
+            except ValueError:
+                raise CommandError(f'Usage: {usage}')
+
+        args = {}
+        for name, kind in schema.items():
+            if kind == self.LINE:
+                args[name] = rest
+            elif kind == self.LINES:
+                args[name] = [ line for line in rest.split('\n') if len(line) > 0 ]
+            elif len(words) == 0:
+                raise CommandError(f'Usage: {usage}')
+            elif kind == self.INTEGER:
+                word = words.pop(0)
+                if not word.isdigit():
+                    raise CommandError(f'Usage: {usage}')
+                args[name] = int(word)
+            else:
+                args[name] = words.pop(0)
+
+        # Extra words are not silently ignored
+        if len(words) > 0:
+            raise CommandError(f'Usage: {usage}')
+        return args
+
+    def __split(self, rest: str) -> list[str]:
+        # Only quotes at the start of a word group it, and they are removed from it
+        lexer = shlex.shlex(rest, posix = False)
+        lexer.whitespace_split = True
+        lexer.commenters = ''
+        return [ word[1:-1] if len(word) > 1 and word[0] in '"\'' and word[-1] == word[0] else word for word in lexer ]
+
+    def __usage(self, name: str, schema: dict[str, str]) -> str:
+        return ' '.join([ name ] + [ f'<{arg}>' for arg, kind in schema.items() if kind != self.LINES ])
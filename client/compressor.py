@@ -0,0 +1,54 @@
+from typing import Any, Callable
+import zlib
+
+# lz4 is faster than zlib, but it is an optional dependency
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+class Compressor:
+    # Class constants -> codec names, ordered by preference, and their identifiers in binary frames
+    NONE = 0
+    CODEC_IDS = { 'lz4': 2, 'zlib': 1 }
+    ZLIB_LEVEL = 6
+
+    def __init__(self) -> None:
+        # Register the codecs whose modules are available, with a factory of incremental decompressors
+        # for each one
+        self.__codecs: dict[str, tuple[Callable[[Any], bytes], Callable[[Any], bytes]]] = {}
+        self.__decompressors: dict[str, Callable[[], Callable[[Any], bytes]]] = {}
+        if lz4 is not None:
+            self.__codecs['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+            self.__decompressors['lz4'] = lambda: lz4.frame.LZ4FrameDecompressor().decompress
+        self.__codecs['zlib'] = (lambda data: zlib.compress(data, self.ZLIB_LEVEL), zlib.decompress)
+        self.__decompressors['zlib'] = lambda: zlib.decompressobj().decompress
+
+    def codecs(self) -> list[str]:
+        return list(self.__codecs.keys())
+
+    def compress(self, codec: str, data: Any) -> bytes:
+        return self.__codecs[codec][0](data)
+
+    def decompress(self, codec: str, data: Any) -> bytes:
+        if codec not in self.__codecs:
+            raise ValueError(f'Unsupported compression codec: {codec}')
+        return self.__codecs[codec][1](data)
+
+    def decompressor(self, codec: str) -> Callable[[Any], bytes]:
+        # Return a function decompressing a stream in consecutive pieces
+        if codec not in self.__decompressors:
+            raise ValueError(f'Unsupported compression codec: {codec}')
+        return self.__decompressors[codec]()
+
+    def codec_id(self, codec: str | None) -> int:
+        return self.NONE if codec is None else self.CODEC_IDS[codec]
+
+    def codec_name(self, codec_id: int) -> str | None:
+        # Translate the identifier found in a binary frame
+        if codec_id == self.NONE:
+            return None
+        for name, identifier in self.CODEC_IDS.items():
+            if identifier == codec_id:
+                return name
+        raise ValueError(f'Unsupported compression codec: {codec_id}')
@@ -1,46 +1,159 @@
-from Crypto.Cipher import AES
+from client.lazy_module import LazyModule
+
 from base64 import b64encode, b64decode
+from typing import Any
 import secrets
 
+# The cypher is only loaded when the first message is encrypted or decrypted
+AES = LazyModule('Crypto.Cipher.AES')
+
 class AESCypher:
-    # Class constants
+    # Class constants -> buffers bigger than MAX_BUFFER_SIZE are not kept between calls, so that
+    # a single big message does not pin its memory for the rest of the session
     BLOCKSIZE = 16
+    MAX_BUFFER_SIZE = 4 * 1024 * 1024
 
     def __init__(self, key: bytes) -> None:
         self.__key = key
+        self.__buffer = bytearray()
+
+    def encrypt(self, plaintext: str | bytes | bytearray | memoryview) -> dict[str, str]:
+        # Encrypt the plaintext and return the base64 encoded string and iv
+        iv, cyphertext = self.encrypt_bytes(plaintext)
+        with cyphertext:
+            return {
+                'body': b64encode(cyphertext).decode(),
+                'iv': b64encode(iv).decode()
+            }
+
+    def decrypt(self, cyphertext: str | bytes, iv: str | bytes) -> str:
+        # Decode the cyphertext and iv, decrypt the message and decode it straight from the buffer
+        with self.decrypt_bytes(b64decode(cyphertext), b64decode(iv)) as plaintext:
+            return str(plaintext, 'utf-8')
 
-    def encrypt(self, plaintext: str) -> dict[str, str]:
-        # Add padding to the plaintext
-        padded_plaintext = self.__pad(plaintext).encode()
+    def encrypt_bytes(self, plaintext: str | bytes | bytearray | memoryview) -> tuple[bytes, memoryview]:
+        # Add padding to the plaintext. Text is padded after encoding it, so that the padding is
+        # computed over bytes instead of characters
+        raw_plaintext = plaintext.encode() if isinstance(plaintext, str) else plaintext
+        padded_plaintext = self.__pad(raw_plaintext)
 
-        # Generate a random initialization vector and create an AES cypher
+        # Generate a random initialization vector and encrypt the plaintext in place. The returned
+        # view is only valid until the next call
         iv = secrets.token_bytes(16)
         cypher = AES.new(self.__key, AES.MODE_CBC, iv)
+        cypher.encrypt(padded_plaintext, output = padded_plaintext)
+        return iv, padded_plaintext
 
-        # Encrypt the plaintext and return the base64 encoded string and iv
-        cyphertext = cypher.encrypt(padded_plaintext)
-        return {
-            'body': b64encode(cyphertext).decode(),
-            'iv': b64encode(iv).decode()
-        }
+    def decrypt_bytes(self, cyphertext: bytes | bytearray | memoryview, iv: bytes) -> memoryview:
+        # Decrypt the message into the reusable buffer
+        plaintext = self.__get_buffer(len(cyphertext))
+        cypher = AES.new(self.__key, AES.MODE_CBC, iv)
+        cypher.decrypt(cyphertext, output = plaintext)
 
-    def decrypt(self, cyphertext: str, iv: str) -> str:
-        # Decode the cyphertext and iv
-        raw_cyphertext = b64decode(cyphertext)
-        raw_iv = b64decode(iv)
+        # Unpad and return the response. The returned view is only valid until the next call
+        return self.__unpad(plaintext)
 
-        # Decrypt the message
-        cypher = AES.new(self.__key, AES.MODE_CBC, raw_iv)
-        plaintext = cypher.decrypt(raw_cyphertext)
+    def encryptor(self) -> 'AESEncryptor':
+        # Generate a random initialization vector for the new stream
+        return AESEncryptor(self.__key, secrets.token_bytes(16))
 
-        # Unpad and return the response
-        return self.__unpad(plaintext).decode()
+    def decryptor(self, iv: str | bytes, encoded: bool = True) -> 'AESDecryptor':
+        # Streams are base64 encoded, unless they come from binary frames
+        return AESDecryptor(self.__key, b64decode(iv) if encoded else iv, encoded)
 
-    def __pad(self, plaintext: str) -> str:
-        # Adds PKCS#7 padding -> k - (l mod k) octects with value k - (l mod k)
-        return plaintext + (16 - len(plaintext) % 16) * chr(16 - len(plaintext) % 16)
+    def __pad(self, plaintext: bytes | bytearray | memoryview) -> memoryview:
+        # Adds PKCS#7 padding -> k - (l mod k) octects with value k - (l mod k). The plaintext is
+        # copied to the reusable buffer and the padding is written right after it
+        length = len(plaintext)
+        padding = self.BLOCKSIZE - length % self.BLOCKSIZE
+        padded_plaintext = self.__get_buffer(length + padding)
+        padded_plaintext[:length] = plaintext
+        padded_plaintext[length:] = bytes((padding,)) * padding
+        return padded_plaintext
 
-    def __unpad(self, plaintext: bytes) -> bytes:
+    def __unpad(self, plaintext: memoryview) -> memoryview:
         # Reverse the operation -> since the padding value is the number of added bytes,
         # slice the received plaintext up to the first padded byte
-        return plaintext[:-ord(plaintext[len(plaintext) - 1:])]
+        return plaintext[:len(plaintext) - plaintext[-1]] if len(plaintext) > 0 else plaintext
+
+    def __get_buffer(self, size: int) -> memoryview:
+        # Big messages get a buffer of their own
+        if size > self.MAX_BUFFER_SIZE:
+            return memoryview(bytearray(size))
+
+        # Grow the reusable buffer if needed. A new buffer is created instead of resizing the old
+        # one, since views of the old one may still be alive
+        if len(self.__buffer) < size:
+            self.__buffer = bytearray(min(max(size, 2 * len(self.__buffer)), self.MAX_BUFFER_SIZE))
+        return memoryview(self.__buffer)[:size]
+
+class AESEncryptor:
+    # Class constants -> 48 bytes is the smallest amount of data that fills whole AES blocks and
+    # whole base64 quanta, so the output never needs to be re-encoded when more data arrives
+    STEP = 48
+
+    def __init__(self, key: bytes, iv: bytes) -> None:
+        self.__cypher = AES.new(key, AES.MODE_CBC, iv)
+        self.__pending = bytearray()
+        self.iv = b64encode(iv).decode()
+
+    def update(self, plaintext: Any) -> bytes:
+        # Encrypt as many complete steps as possible and keep the rest for the next call. The CBC
+        # state is kept by the cypher object across calls
+        self.__pending += plaintext
+        length = len(self.__pending) - len(self.__pending) % self.STEP
+        if length == 0:
+            return b''
+
+        cyphertext = self.__cypher.encrypt(memoryview(self.__pending)[:length])
+        del self.__pending[:length]
+        return b64encode(cyphertext)
+
+    def finalize(self) -> bytes:
+        # Add PKCS#7 padding to the remaining data and encrypt it
+        padding = AES.block_size - len(self.__pending) % AES.block_size
+        self.__pending += bytes([padding]) * padding
+        cyphertext = self.__cypher.encrypt(bytes(self.__pending))
+        self.__pending = bytearray()
+        return b64encode(cyphertext)
+
+class AESDecryptor:
+    # Class constants -> 64 base64 characters decode to 48 bytes, i.e. 3 AES blocks
+    STEP = 64
+
+    def __init__(self, key: bytes, iv: bytes, encoded: bool = True) -> None:
+        self.__cypher = AES.new(key, AES.MODE_CBC, iv)
+        self.__encoded = bytearray()
+        self.__last_block = b''
+
+        # Raw cyphertexts only need to be split into whole blocks
+        self.__step = self.STEP if encoded else AES.block_size
+        self.__decode = b64decode if encoded else bytes
+
+    def update(self, cyphertext: Any) -> bytes:
+        # Decode as many complete steps as possible and keep the rest for the next call
+        self.__encoded += cyphertext.encode() if isinstance(cyphertext, str) else cyphertext
+        length = len(self.__encoded) - len(self.__encoded) % self.__step
+        if length == 0:
+            return b''
+
+        raw_cyphertext = self.__decode(memoryview(self.__encoded)[:length])
+        del self.__encoded[:length]
+
+        # The last block is kept back, since it may contain the padding
+        plaintext = self.__last_block + self.__cypher.decrypt(raw_cyphertext)
+        self.__last_block = plaintext[-AES.block_size:]
+        return plaintext[:-AES.block_size]
+
+    def finalize(self) -> bytes:
+        # Decrypt the remaining data and remove the PKCS#7 padding
+        plaintext = self.__last_block + self.__cypher.decrypt(self.__decode(bytes(self.__encoded)))
+        self.__encoded = bytearray()
+        self.__last_block = b''
+
+        if len(plaintext) == 0 or len(plaintext) % AES.block_size != 0:
+            raise ValueError('Incomplete cyphertext')
+        padding = plaintext[-1]
+        if padding < 1 or padding > AES.block_size or plaintext[-padding:] != bytes([padding]) * padding:
+            raise ValueError('Invalid padding')
+        return plaintext[:-padding]
@@ -2,35 +2,129 @@ from client.action import Action
 from client.http_service import HTTPService
 
 import os
+import json
+import time
 from base64 import b64decode
 from typing import Any
 
-class DownloadFileAction(Action):
-    def run(self, args: dict[str, Any]) -> str:
-        # Create and send request
-        request = {
-            'action': 'download_file',
-            'args': {
-                'filename': args['filename'],
-                'binary': args['binary']
-            }
-        }
+class LinkEstimate:
+    # Round trip time and throughput measured by one download. Each download measures its own, since
+    # several of them may run at once in background jobs
+    __slots__ = ('rtt', 'throughput')
 
-        # Read response
-        response = HTTPService().send_request(request)
+    def __init__(self) -> None:
+        self.rtt: float | None = None
+        self.throughput: float | None = None
+
+class DownloadFileAction(Action):
+    # Class constants -> files are requested in ranges whose size adapts to the measured link speed,
+    # aiming for each request to last around TARGET_REQUEST_TIME seconds
+    INITIAL_CHUNK_SIZE = 1024 * 1024
+    MIN_CHUNK_SIZE = 64 * 1024
+    MAX_CHUNK_SIZE = 32 * 1024 * 1024
+    TARGET_REQUEST_TIME = 2.0
+    RTT_FACTOR = 4
+    PARTIAL_SUFFIX = '.part'
+    CHECKPOINT_SUFFIX = '.part.json'
 
+    def run(self, args: dict[str, Any]) -> str:
         # Keep only basename
         basename = os.path.basename(args['filename'])
+        partial_file = basename + self.PARTIAL_SUFFIX
+        checkpoint_file = basename + self.CHECKPOINT_SUFFIX
 
-        # Create binary or text output file
-        if (args['binary']):
-            with open(basename, 'wb') as f:
-                decoded_content = b64decode(response['output'].encode())
-                f.write(decoded_content)
-        else:
-            with open(basename, 'w') as f:
-                decoded_content = b64decode(response['output'].encode()).decode()
-                f.write(decoded_content)
+        # Resume a previous download of the same file if there is one
+        checkpoint = self.__load_checkpoint(args, partial_file, checkpoint_file)
+        offset = checkpoint['offset']
+        chunk_size = checkpoint['chunk_size']
+        link = LinkEstimate()
+
+        # Download the file one range at a time, appending each range to the partial file
+        with open(partial_file, 'r+b' if offset > 0 else 'wb') as f:
+            f.truncate(offset)
+            f.seek(offset)
+
+            finished = False
+            while not finished:
+                # Create and send request
+                request = {
+                    'action': 'download_file',
+                    'args': {
+                        'filename': args['filename'],
+                        'binary': args['binary'],
+                        'offset': offset,
+                        'length': chunk_size
+                    }
+                }
+                start = time.perf_counter()
+                response = HTTPService().send_request(request)
+                elapsed = time.perf_counter() - start
+
+                # Shells without support for ranges ignore them and return the whole file
+                content = self.__decode(response['output'])
+                if 'eof' not in response:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(content)
+                    break
+
+                # Save the range and a checkpoint to resume from in case the download is interrupted
+                f.write(content)
+                f.flush()
+                offset += len(content)
+                finished = response['eof'] or len(content) == 0
+                chunk_size = self.__next_chunk_size(link, len(content), elapsed, chunk_size)
+                self.__save_checkpoint(args, offset, chunk_size, checkpoint_file)
+
+        # Move the completed download to its final location
+        os.replace(partial_file, basename)
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
 
         return ''
 
+    def __decode(self, output: str | bytes) -> bytes:
+        # Contents are received as they are when the protocol allows it, and base64 encoded otherwise
+        return output if isinstance(output, bytes) else b64decode(output.encode())
+
+    def __next_chunk_size(self, link: LinkEstimate, size: int, elapsed: float, chunk_size: int) -> int:
+        # Track the lowest observed request time as an estimate of the round trip time, and the
+        # throughput of the remaining time as the transfer rate (smoothed across requests)
+        link.rtt = elapsed if link.rtt is None else min(link.rtt, elapsed)
+        transfer_time = max(elapsed - link.rtt, elapsed / 2, 1e-6)
+        throughput = size / transfer_time
+        if link.throughput is None:
+            link.throughput = throughput
+        else:
+            link.throughput = 0.7 * link.throughput + 0.3 * throughput
+
+        # Aim for requests that last TARGET_REQUEST_TIME, but always long enough for the round trip
+        # time not to dominate. Never grow more than twice the previous size at once
+        target_time = max(self.TARGET_REQUEST_TIME, self.RTT_FACTOR * link.rtt)
+        next_chunk_size = min(int(link.throughput * target_time), 2 * chunk_size)
+        return max(self.MIN_CHUNK_SIZE, min(next_chunk_size, self.MAX_CHUNK_SIZE))
+
+    def __load_checkpoint(self, args: dict[str, Any], partial_file: str, checkpoint_file: str) -> dict[str, Any]:
+        # Start from scratch unless a checkpoint for the same remote file exists
+        checkpoint = { 'offset': 0, 'chunk_size': self.INITIAL_CHUNK_SIZE }
+        try:
+            with open(checkpoint_file, 'r') as f:
+                saved_checkpoint = json.load(f)
+
+            same_file = saved_checkpoint['filename'] == args['filename'] and saved_checkpoint['binary'] == args['binary']
+            if same_file and os.path.getsize(partial_file) >= saved_checkpoint['offset']:
+                checkpoint = { 'offset': saved_checkpoint['offset'], 'chunk_size': saved_checkpoint['chunk_size'] }
+        except (OSError, ValueError, KeyError):
+            pass
+
+        return checkpoint
+
+    def __save_checkpoint(self, args: dict[str, Any], offset: int, chunk_size: int, checkpoint_file: str) -> None:
+        checkpoint = {
+            'filename': args['filename'],
+            'binary': args['binary'],
+            'offset': offset,
+            'chunk_size': chunk_size
+        }
+        with open(checkpoint_file, 'w') as f:
+            json.dump(checkpoint, f)
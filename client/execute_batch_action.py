@@ -0,0 +1,52 @@
+from client.action import Action
+from client.execute_command_action import ExecuteCommandAction
+from client.http_service import HTTPService
+from client.history_service import HistoryService
+from typing import Any, Iterator
+import time
+
+class ExecuteBatchAction(Action):
+    # Class constants -> maximum number of commands sent in a single request
+    MAX_BATCH_SIZE = 50
+
+    def run(self, args: dict[str, Any]) -> str:
+        # Show each command followed by its output
+        outputs = [ output for request_outputs in self.execute(args['cmds']) for output in request_outputs ]
+        return '\n'.join([ f"$ {cmd}\n{output.rstrip(chr(10))}" for cmd, output in zip(args['cmds'], outputs) ])
+
+    def execute(self, cmds: list[str]) -> Iterator[list[str]]:
+        # Commands are sent one at a time until the shell advertises batch support, which it does in
+        # every response, and in batches afterwards. The outputs of each request are yielded as soon as
+        # it completes, so that the commands already run are known if a later request fails
+        done = 0
+        while done < len(cmds):
+            pending = cmds[done:]
+            if len(pending) > 1 and HTTPService().supports('batch'):
+                outputs = self.__execute_batch(pending[:self.MAX_BATCH_SIZE])
+            else:
+                outputs = [ ExecuteCommandAction().run({ 'cmd': pending[0] }) ]
+            done += len(outputs)
+            yield outputs
+
+    def __execute_batch(self, cmds: list[str]) -> list[str]:
+        # Craft the request and log the commands
+        request = {
+            'action': 'execute_batch',
+            'args': {
+                'cmds': cmds
+            }
+        }
+        entries = [ HistoryService().add_command(cmd) for cmd in cmds ]
+
+        # Send the request and split the response into the output of each command
+        start = time.perf_counter()
+        response = HTTPService().send_request(request)
+        outputs = response.get('outputs')
+        if not isinstance(outputs, list) or len(outputs) != len(cmds):
+            raise ValueError('The batch response does not contain the output of every command')
+
+        # The round trip is shared by the commands of the batch
+        duration = (time.perf_counter() - start) / len(cmds)
+        for entry, output in zip(entries, outputs):
+            HistoryService().record_result(entry, duration, len(output))
+        return outputs
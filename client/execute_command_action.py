@@ -1,7 +1,9 @@
 from client.action import Action
 from client.http_service import HTTPService
 from client.history_service import HistoryService
-from typing import Any
+from client.output_sink import OutputSink
+from typing import Any, Callable
+import time
 
 class ExecuteCommandAction(Action):
     def run(self, args: dict[str, Any]) -> str:
@@ -12,8 +14,33 @@ class ExecuteCommandAction(Action):
                 'cmd': args['cmd']
             }
         }
-        HistoryService().add_command(args['cmd'])
+        entry = HistoryService().add_command(args['cmd'])
 
-        # Send the request and return the response
-        response = HTTPService().send_request(request)
-        return response['output']
+        # Send the request, save how long it took and how big the output was, and return the output.
+        # If a sink is given, the output is passed to it in pieces as it arrives instead, and outputs
+        # redirected to a local file are written to it
+        start = time.perf_counter()
+        if args.get('output_file') is not None:
+            with OutputSink(args['output_file']) as output:
+                output_size = self.__stream(request, output.write)
+            result = f"Output saved to {args['output_file']}"
+        elif args.get('sink') is not None:
+            output_size = self.__stream(request, args['sink'])
+            result = ''
+        else:
+            result = HTTPService().send_request(request)['output']
+            output_size = len(result)
+
+        HistoryService().record_result(entry, time.perf_counter() - start, output_size)
+        return result
+
+    def __stream(self, request: dict[str, Any], sink: Callable[[str], None]) -> int:
+        # Return the size of the streamed output
+        output_size = 0
+        def write(piece: str) -> None:
+            nonlocal output_size
+            output_size += len(piece)
+            sink(piece)
+
+        HTTPService().send_request(request, write)
+        return output_size
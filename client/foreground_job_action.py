@@ -0,0 +1,8 @@
+from client.action import Action
+from client.job_service import JobService
+from typing import Any
+
+class ForegroundJobAction(Action):
+    def run(self, args: dict[str, Any]) -> str:
+        # Wait for the job and return its buffered output
+        return JobService().wait(args['id'])
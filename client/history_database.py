@@ -0,0 +1,130 @@
+from client.lazy_module import LazyModule
+
+from typing import Any
+import time
+
+# SQLite is only loaded if the history is saved to a database
+sqlite3 = LazyModule('sqlite3')
+
+class HistoryDatabase:
+    # Class constants -> several clients may write to the same database, so writers wait up to
+    # BUSY_TIMEOUT seconds for each other instead of failing
+    BUSY_TIMEOUT = 5.0
+
+    # Full-text index of the commands. The trigram tokenizer allows searching any fragment of at
+    # least MIN_FRAGMENT_LENGTH characters, shorter ones are searched by scanning the commands
+    MIN_FRAGMENT_LENGTH = 3
+    SCHEMA = [
+        '''CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cmd TEXT NOT NULL,
+            timestamp REAL,
+            duration REAL,
+            output_size INTEGER
+        )'''
+    ]
+    FTS_SCHEMA = [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            cmd, content = 'history', content_rowid = 'id', tokenize = 'trigram case_sensitive 1'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+            INSERT INTO history_fts(rowid, cmd) VALUES (new.id, new.cmd);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+            INSERT INTO history_fts(history_fts, rowid, cmd) VALUES ('delete', old.id, old.cmd);
+        END'''
+    ]
+
+    def __init__(self, path: str) -> None:
+        # Use write-ahead logging, so that readers do not block writers from other processes
+        self.__connection = sqlite3.connect(path, timeout = self.BUSY_TIMEOUT, check_same_thread = False)
+        self.__connection.execute(f'PRAGMA busy_timeout = {int(self.BUSY_TIMEOUT * 1000)}')
+        self.__connection.execute('PRAGMA journal_mode = WAL')
+
+        # Create the tables. The full-text index is optional, since SQLite may be built without FTS5
+        with self.__connection:
+            for statement in self.SCHEMA:
+                self.__connection.execute(statement)
+        try:
+            with self.__connection:
+                for statement in self.FTS_SCHEMA:
+                    self.__connection.execute(statement)
+            self.__full_text = True
+        except sqlite3.OperationalError:
+            self.__full_text = False
+
+    @property
+    def full_text(self) -> bool:
+        return self.__full_text
+
+    def __len__(self) -> int:
+        return self.__connection.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def add(self, cmd: str, timestamp: float | None = None) -> int:
+        # Save the command and return its identifier, to record its result later
+        with self.__connection:
+            cursor = self.__connection.execute(
+                'INSERT INTO history (cmd, timestamp) VALUES (?, ?)',
+                (cmd, time.time() if timestamp is None else timestamp)
+            )
+        return cursor.lastrowid
+
+    def add_many(self, cmds: list[str]) -> None:
+        # Save commands without known execution time in a single transaction
+        with self.__connection:
+            self.__connection.executemany('INSERT INTO history (cmd) VALUES (?)', [ (cmd,) for cmd in cmds ])
+
+    def record_result(self, entry: int, duration: float, output_size: int) -> None:
+        with self.__connection:
+            self.__connection.execute(
+                'UPDATE history SET duration = ?, output_size = ? WHERE id = ?',
+                (duration, output_size, entry)
+            )
+
+    def last(self) -> str | None:
+        row = self.__connection.execute('SELECT cmd FROM history ORDER BY id DESC LIMIT 1').fetchone()
+        return None if row is None else row[0]
+
+    def commands(self) -> list[str]:
+        return [ row[0] for row in self.__connection.execute('SELECT cmd FROM history ORDER BY id') ]
+
+    def latest(self, prefix: str) -> str | None:
+        # Return the last command starting with the prefix
+        row = self.__connection.execute(
+            'SELECT cmd FROM history WHERE substr(cmd, 1, ?) = ? ORDER BY id DESC LIMIT 1',
+            (len(prefix), prefix)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def search(self, fragment: str, limit: int | None = None) -> list[dict[str, Any]]:
+        # Return the commands containing the fragment, from newest to oldest, using the full-text index
+        # if possible
+        if self.__full_text and len(fragment) >= self.MIN_FRAGMENT_LENGTH:
+            query = '''SELECT history.cmd, history.timestamp, history.duration, history.output_size
+                FROM history_fts JOIN history ON history.id = history_fts.rowid
+                WHERE history_fts MATCH ? ORDER BY history.id DESC LIMIT ?'''
+            parameters = ('"' + fragment.replace('"', '""') + '"', -1 if limit is None else limit)
+        else:
+            query = '''SELECT cmd, timestamp, duration, output_size FROM history
+                WHERE instr(cmd, ?) > 0 ORDER BY id DESC LIMIT ?'''
+            parameters = (fragment, -1 if limit is None else limit)
+
+        return [
+            { 'cmd': cmd, 'timestamp': timestamp, 'duration': duration, 'output_size': output_size }
+            for cmd, timestamp, duration, output_size in self.__connection.execute(query, parameters)
+        ]
+
+    def trim(self, max_entries: int) -> None:
+        # Drop the oldest commands beyond the maximum
+        with self.__connection:
+            self.__connection.execute(
+                'DELETE FROM history WHERE id <= (SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self.__connection:
+            self.__connection.execute('DELETE FROM history')
+
+    def close(self) -> None:
+        self.__connection.close()
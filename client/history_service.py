@@ -1,35 +1,419 @@
 from client.singleton import Singleton
+from client.prefix_index import PrefixIndex
+from client.history_store import HistoryStore
+from client.history_database import HistoryDatabase
 
+from array import array
+import atexit
+import bisect
+import itertools
+import mmap
 import os
+import threading
+from typing import Any, BinaryIO
 
 class HistoryService(Singleton):
+    # Class constants -> commands are written to disk in batches, when FLUSH_SIZE commands are
+    # pending, FLUSH_INTERVAL seconds after the first pending one, or when the program exits
+    HISTORY_FILE = './.webshell_history'
+    FLUSH_SIZE = 64
+    FLUSH_INTERVAL = 5.0
+
+    # Number of commands loaded at startup and every time older commands are needed
+    TAIL_LINES = 1000
+    PAGE_LINES = 10000
+    BLOCK_SIZE = 64 * 1024
+
+    # Only the most recent MAX_ENTRIES commands are kept. The history file is rewritten in the
+    # background, keeping only those, once it grows beyond COMPACTION_THRESHOLD bytes
+    MAX_ENTRIES = 100000
+    COMPACTION_THRESHOLD = 8 * 1024 * 1024
+
+    # fsync policies -> sync every command, sync every batch, or leave it to the operating system
+    FSYNC_ALWAYS = 'always'
+    FSYNC_PERIODIC = 'periodic'
+    FSYNC_NEVER = 'never'
 
     def __init__(self) -> None:
-        # Load history from disk
-        try:
-            with open('./.webshell_history', 'r') as f:
-                history = f.readlines()
-                self.__history = [ cmd.strip() for cmd in history ]
-        except FileNotFoundError:
-            self.__history = []
+        # Write-behind buffer and persistent handle of the history file
+        self.__lock = threading.RLock()
+        self.__buffer: list[str] = []
+        self.__file = None
+        self.__timer = None
+
+        # Background compaction. The generation changes whenever the history file is deleted
+        self.__compaction = None
+        self.__generation = 0
+        # The history is saved to the history file unless a database is used
+        self.__history = HistoryStore()
+        self.__database = None
+        self.configure()
+
+        # The history file is not read at startup. Only its most recent commands are loaded the first
+        # time the history is used, and older ones are paged in when needed, keeping the offset where
+        # the loaded part of the history file starts to do so
+        self.__tail_loaded = False
+        self.__loaded_offset = 0
+
+        # The prefix index is built the first time it is needed
+        self.__index = None
+        atexit.register(self.close)
+
+    def configure(
+        self,
+        fsync_policy: str = FSYNC_PERIODIC,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_entries: int = MAX_ENTRIES,
+        collapse_duplicates: bool = False,
+        compaction_threshold: int = COMPACTION_THRESHOLD
+    ) -> None:
+        if fsync_policy not in [ self.FSYNC_ALWAYS, self.FSYNC_PERIODIC, self.FSYNC_NEVER ]:
+            raise ValueError(f'Unknown fsync policy: {fsync_policy}')
+        if max_entries < 1:
+            raise ValueError(f'Invalid maximum number of entries: {max_entries}')
+
+        self.__fsync_policy = fsync_policy
+        self.__flush_size = flush_size
+        self.__flush_interval = flush_interval
+        self.__max_entries = max_entries
+        self.__collapse_duplicates = collapse_duplicates
+        self.__compaction_threshold = compaction_threshold
+
+        # Drop the commands beyond the new maximum
+        self.__trim()
+        if self.__database is not None:
+            with self.__lock:
+                self.__database.trim(max_entries)
+
+    def use_database(self, path: str) -> None:
+        # Save the commands to an SQLite database instead of the history file, importing the saved
+        # history into it the first time
+        database = HistoryDatabase(path)
+        with self.__lock:
+            if len(database) == 0:
+                database.add_many(self.get_history())
+                database.trim(self.__max_entries)
+            self.__database = database
 
     def get_history(self) -> list[str]:
-        return self.__history
+        if self.__database is not None:
+            with self.__lock:
+                return self.__database.commands()
+
+        # The full history is needed. Commands may be added from background jobs meanwhile
+        with self.__lock:
+            self.__load_tail()
+            self.__load_older(None)
+            return self.__history.to_list()
+
+    def add_command(self, cmd: str) -> int | None:
+        # Commands saved to the database get an identifier, used to record their result later
+        if self.__database is not None:
+            return self.__add_to_database(cmd)
+
+        # Commands may be added from background jobs. They follow the commands saved before
+        with self.__lock:
+            self.__load_tail()
 
-    def add_command(self, cmd: str) -> None:
-        # Add the command to the saved history
-        self.__history.append(cmd)
+            # Consecutive duplicates are neither kept nor saved if they are collapsed
+            if self.__collapse_duplicates and len(self.__history) > 0 and self.__history[-1] == cmd:
+                return None
 
-        # Save the command to disk
-        with open('./.webshell_history', 'a') as f:
-            f.write(f'{cmd}\n')
+            # Add the command to the saved history and to the index
+            cmd = self.__append(cmd)
+            if self.__index is not None:
+                self.__index.add(cmd)
+
+            # Queue the command to be saved to disk. It is written straight away if the policy requires
+            # syncing every command or the buffer is full, and after the flush interval otherwise
+            self.__buffer.append(f'{cmd}\n')
+            if self.__fsync_policy == self.FSYNC_ALWAYS or len(self.__buffer) >= self.__flush_size:
+                self.flush()
+            elif self.__timer is None:
+                self.__timer = threading.Timer(self.__flush_interval, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+        return None
+
+    def record_result(self, entry: int | None, duration: float, output_size: int) -> None:
+        # The execution time and output size are only saved to the database
+        if self.__database is not None and entry is not None:
+            with self.__lock:
+                self.__database.record_result(entry, duration, output_size)
+
+    def flush(self) -> None:
+        with self.__lock:
+            # Cancel the pending timer, if any
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+
+            if len(self.__buffer) == 0:
+                return
+            self.__write_buffer()
+
+            # Compact the history file in the background once it is too big
+            if self.__compaction is None and os.path.getsize(self.HISTORY_FILE) > self.__compaction_threshold:
+                self.__compaction = threading.Thread(target = self.compact, daemon = True)
+                self.__compaction.start()
+
+    def close(self) -> None:
+        # Let a running compaction finish, since it needs the lock to complete
+        compaction = self.__compaction
+        if compaction is not None and compaction is not threading.current_thread():
+            compaction.join()
+
+        # Save the pending commands and release the history file
+        with self.__lock:
+            self.flush()
+            self.__close_file()
+
+    def compact(self) -> None:
+        self.__load_tail()
+        try:
+            self.__compact()
+        finally:
+            self.__compaction = None
 
     def search_command(self, cmd: str) -> list[str]:
-        return [ c for c in self.__history if c.startswith(cmd) ] 
+        return [ c for c in self.get_history() if c.startswith(cmd) ]
+
+    def search_fragment(self, fragment: str, limit: int | None = None) -> list[dict[str, Any]]:
+        # Return the commands containing the fragment, from newest to oldest
+        if self.__database is not None:
+            with self.__lock:
+                return self.__database.search(fragment, limit)
+
+        matches = (
+            { 'cmd': cmd, 'timestamp': None, 'duration': None, 'output_size': None }
+            for cmd in reversed(self.get_history()) if fragment in cmd
+        )
+        return list(matches if limit is None else itertools.islice(matches, limit))
+
+    def search_latest(self, prefix: str) -> str | None:
+        if self.__database is not None:
+            with self.__lock:
+                return self.__database.latest(prefix)
+
+        # Build the index from the loaded history if needed
+        with self.__lock:
+            self.__load_tail()
+            if self.__index is None:
+                self.__index = PrefixIndex()
+                for cmd in self.__history:
+                    self.__index.add(cmd)
+
+            # Page in older commands until a match is found or the whole history is loaded
+            cmd = self.__index.latest(prefix)
+            while cmd is None and self.__loaded_offset > 0:
+                self.__load_older(self.PAGE_LINES)
+                cmd = self.__index.latest(prefix)
+
+            return cmd
 
     def delete_history(self) -> None:
-        # Empty the saved history
-        self.__history = []
+        # Make a running compaction discard its work, and let it finish before taking the lock, since
+        # it needs the lock to complete
+        with self.__lock:
+            self.__generation += 1
+        compaction = self.__compaction
+        if compaction is not None and compaction is not threading.current_thread():
+            compaction.join()
+
+        # Empty the saved history, discarding the pending commands
+        with self.__lock:
+            self.__history.clear()
+            self.__tail_loaded = True
+            self.__loaded_offset = 0
+            self.__index = None
+            if self.__database is not None:
+                self.__database.clear()
+            self.__buffer = []
+            self.__generation += 1
+            self.flush()
+            self.__close_file()
+
+            # Delete the history file
+            if os.path.exists(self.HISTORY_FILE):
+                os.remove(self.HISTORY_FILE)
+
+    def __close_file(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __add_to_database(self, cmd: str) -> int | None:
+        with self.__lock:
+            if self.__collapse_duplicates and self.__database.last() == cmd:
+                return None
+            entry = self.__database.add(cmd)
+            self.__database.trim(self.__max_entries)
+            return entry
+
+    def __load_tail(self) -> None:
+        # Load the most recent commands of the history file, unless they already were
+        with self.__lock:
+            if self.__tail_loaded:
+                return
+            self.__tail_loaded = True
+
+            try:
+                with open(self.HISTORY_FILE, 'rb') as f:
+                    end = os.fstat(f.fileno()).st_size
+                    self.__loaded_offset = self.__find_lines_start(f, end, min(self.TAIL_LINES, self.__max_entries))
+                    for cmd in self.__read_lines(f, self.__loaded_offset, end):
+                        self.__append(cmd)
+            except FileNotFoundError:
+                pass
+
+    def __append(self, cmd: str) -> str:
+        # Keep the stored copy of the command, dropping the oldest ones beyond the maximum
+        cmd = self.__history.append(cmd)
+        self.__trim()
+        return cmd
+
+    def __trim(self) -> None:
+        # Older commands can no longer be paged in once the history is full. The commands no longer in
+        # the history are removed from the index, from the least recently used
+        if len(self.__history) <= self.__max_entries:
+            return
+        self.__loaded_offset = 0
+        for cmd in self.__history.trim(self.__max_entries):
+            if self.__index is not None:
+                self.__index.remove(cmd)
+
+    def __write_buffer(self) -> None:
+        # Write the pending commands using the persistent handle
+        if len(self.__buffer) > 0:
+            if self.__file is None:
+                self.__file = open(self.HISTORY_FILE, 'a')
+            self.__file.write(''.join(self.__buffer))
+            self.__buffer = []
+            self.__file.flush()
+
+            if self.__fsync_policy != self.FSYNC_NEVER:
+                os.fsync(self.__file.fileno())
+
+    def __compact(self) -> None:
+        # Take a snapshot of the history file, saving the pending commands first
+        with self.__lock:
+            self.__write_buffer()
+            generation = self.__generation
+            max_entries = self.__max_entries
+            collapse_duplicates = self.__collapse_duplicates
+            try:
+                end = os.path.getsize(self.HISTORY_FILE)
+            except FileNotFoundError:
+                return
+
+        # Copy the most recent commands of the snapshot to a temporary file without holding the
+        # lock, saving where each copied line was and where it is now
+        compacted_file = f'{self.HISTORY_FILE}.compact'
+        old_offsets, new_offsets = array('Q'), array('Q')
+        with open(self.HISTORY_FILE, 'rb') as f, open(compacted_file, 'wb') as output:
+            start = self.__find_lines_start(f, end, max_entries)
+            f.seek(start)
+            offset, previous = start, None
+            while offset < end:
+                line = f.readline(end - offset)
+                cmd = line.strip()
+                if not (collapse_duplicates and cmd == previous):
+                    old_offsets.append(offset)
+                    new_offsets.append(output.tell())
+                    output.write(line if line.endswith(b'\n') else line + b'\n')
+                offset += len(line)
+                previous = cmd
+
+        with self.__lock:
+            # The history may have been deleted in the meantime
+            if generation != self.__generation or not os.path.exists(self.HISTORY_FILE):
+                os.remove(compacted_file)
+                return
+
+            # Copy the commands saved since the snapshot and replace the history file
+            self.__write_buffer()
+            with open(self.HISTORY_FILE, 'rb') as f, open(compacted_file, 'ab') as output:
+                f.seek(end)
+                compacted_end = output.tell()
+                output.write(f.read())
+                output.flush()
+                if self.__fsync_policy != self.FSYNC_NEVER:
+                    os.fsync(output.fileno())
+            self.__close_file()
+            os.replace(compacted_file, self.HISTORY_FILE)
+
+            # Translate the offset of the loaded part of the history to the compacted file
+            if self.__loaded_offset >= end:
+                self.__loaded_offset = compacted_end + self.__loaded_offset - end
+            else:
+                index = bisect.bisect_left(old_offsets, self.__loaded_offset)
+                self.__loaded_offset = 0 if index == 0 else (new_offsets[index] if index < len(new_offsets) else compacted_end)
+
+            # Avoid compacting again until the file grows significantly
+            self.__compaction_threshold = max(self.__compaction_threshold, 2 * os.path.getsize(self.HISTORY_FILE))
+
+    def __load_older(self, lines: int | None) -> None:
+        # Read the given number of commands (or all of them) preceding the loaded ones, as long as
+        # there is room for them
+        if self.__loaded_offset == 0:
+            return
+        room = self.__max_entries - len(self.__history)
+        if room <= 0:
+            self.__loaded_offset = 0
+            return
+        lines = room if lines is None else min(lines, room)
+
+        with open(self.HISTORY_FILE, 'rb') as f:
+            start = self.__find_lines_start(f, self.__loaded_offset, lines)
+            older_history = self.__history.prepend(self.__read_lines(f, start, self.__loaded_offset))
+        self.__loaded_offset = start if len(self.__history) < self.__max_entries else 0
+
+        # Index them from newest to oldest, without replacing the more recent matches
+        if self.__index is not None:
+            for cmd in reversed(older_history):
+                self.__index.add_older(cmd)
+
+    def __find_lines_start(self, f: BinaryIO, end: int, lines: int) -> int:
+        # Find the offset where the last lines before the end offset start, scanning backwards. The
+        # file is memory-mapped if possible, and read in blocks otherwise
+        if end == 0:
+            return 0
+        try:
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                # Ignore the newline ending the last line
+                position = end - 1 if data[end - 1:end] == b'\n' else end
+                for _ in range(lines):
+                    position = data.rfind(b'\n', 0, position)
+                    if position == -1:
+                        return 0
+                return position + 1
+        except (OSError, ValueError):
+            return self.__find_lines_start_in_blocks(f, end, lines)
+
+    def __find_lines_start_in_blocks(self, f: BinaryIO, end: int, lines: int) -> int:
+        # Ignore the newline ending the last line
+        f.seek(end - 1)
+        position = end - 1 if f.read(1) == b'\n' else end
+
+        # Read blocks backwards, counting newlines
+        while position > 0:
+            block_start = max(position - self.BLOCK_SIZE, 0)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+
+            index = len(block)
+            while lines > 0:
+                index = block.rfind(b'\n', 0, index)
+                if index == -1:
+                    break
+                lines -= 1
+            if lines == 0:
+                return block_start + index + 1
+            position = block_start
+
+        return 0
 
-        # Delete the history file
-        os.remove('./.webshell_history')
+    def __read_lines(self, f: BinaryIO, start: int, end: int) -> list[str]:
+        f.seek(start)
+        return [ cmd.strip() for cmd in f.read(end - start).decode(errors = 'replace').splitlines() ]
@@ -0,0 +1,89 @@
+from array import array
+from typing import Iterator
+
+class HistoryStore:
+    # Compact in-memory history -> every distinct command is stored once in a string table, and the
+    # history itself is an array of indices into that table
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __getitem__(self, index: int) -> str:
+        return self.__strings[self.__entries[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.__strings[i] for i in self.__entries)
+
+    def __reversed__(self) -> Iterator[str]:
+        return (self.__strings[i] for i in reversed(self.__entries))
+
+    def __contains__(self, cmd: str) -> bool:
+        return cmd in self.__ids
+
+    def append(self, cmd: str) -> str:
+        # Return the stored copy of the command, so that other structures can share it
+        cmd_id = self.__intern(cmd)
+        self.__entries.append(cmd_id)
+        return self.__strings[cmd_id]
+
+    def prepend(self, cmds: list[str]) -> list[str]:
+        # Add older commands before the stored ones
+        ids = array('I', [ self.__intern(cmd) for cmd in cmds ])
+        self.__entries[:0] = ids
+        return [ self.__strings[i] for i in ids ]
+
+    def trim(self, max_entries: int) -> list[str]:
+        # Drop the oldest entries beyond the maximum, releasing the strings no longer referenced. The
+        # released commands are returned from the least to the most recently used
+        excess = len(self.__entries) - max_entries
+        if excess <= 0:
+            return []
+
+        released = []
+        for cmd_id in self.__entries[:excess]:
+            cmd = self.__strings[cmd_id]
+            if self.__release(cmd_id):
+                released.append(cmd)
+        del self.__entries[:excess]
+        return released
+
+    def to_list(self) -> list[str]:
+        return list(self)
+
+    def clear(self) -> None:
+        self.__ids: dict[str, int] = {}
+        self.__strings: list[str | None] = []
+        self.__references = array('I')
+        self.__free_ids: list[int] = []
+        self.__entries = array('I')
+
+    def __intern(self, cmd: str) -> int:
+        # Reuse the identifier of known commands, or assign a new (or freed) one
+        cmd_id = self.__ids.get(cmd)
+        if cmd_id is None:
+            if len(self.__free_ids) > 0:
+                cmd_id = self.__free_ids.pop()
+                self.__strings[cmd_id] = cmd
+                self.__references[cmd_id] = 0
+            else:
+                cmd_id = len(self.__strings)
+                self.__strings.append(cmd)
+                self.__references.append(0)
+            self.__ids[cmd] = cmd_id
+
+        self.__references[cmd_id] += 1
+        return cmd_id
+
+    def __release(self, cmd_id: int) -> bool:
+        # Return whether the command is no longer referenced
+        self.__references[cmd_id] -= 1
+        if self.__references[cmd_id] > 0:
+            return False
+
+        del self.__ids[self.__strings[cmd_id]]
+        self.__strings[cmd_id] = None
+        self.__free_ids.append(cmd_id)
+        return True
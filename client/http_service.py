@@ -1,47 +1,540 @@
 from client.singleton import Singleton
 from client.cypher import AESCypher
+from client.compressor import Compressor
+from client.stats_service import StatsService
+from client.json_stream import JSONStreamParser
+from client.lazy_module import LazyModule
+from client.serializer import Serializer
 
-from typing import Any
-import requests
-import json
+from base64 import b64decode
+from collections import deque
+from typing import Any, Callable
+import codecs
+import itertools
+import struct
+import tempfile
+import threading
+import time
+import weakref
+
+# The HTTP stack is only loaded when the first request is sent
+requests = LazyModule('requests')
 
 class HTTPService(Singleton):
-    def initialize(self, url: str, key: bytes, nonce: str) -> None:
+    # Class constants -> supported protocols. The binary protocol sends a frame with the magic
+    # number, the compression codec and the iv, followed by the cyphertext. Its plaintext is the
+    # length of a JSON header, the header itself and the raw content of the transferred file
+    JSON_PROTOCOL = 'json'
+    BINARY_PROTOCOL = 'binary'
+    BINARY_MAGIC = b'WSB1'
+    FRAME_HEADER = struct.Struct('>4sB16s')
+    PLAINTEXT_HEADER = struct.Struct('>I')
+
+    # Plaintexts smaller than the threshold are not worth compressing
+    COMPRESSION_THRESHOLD = 1024
+
+    # Seconds to wait for the connection and for the response. Requests of idempotent actions are
+    # sent again if the connection fails, waiting RETRY_BACKOFF seconds and doubling it every time
+    CONNECT_TIMEOUT = 10.0
+    READ_TIMEOUT = 300.0
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.5
+    IDEMPOTENT_ACTIONS = [ 'download_file', 'upload_file' ]
+
+    # Streamed responses are read in chunks of STREAM_CHUNK_SIZE bytes. Bodies arriving before the iv
+    # and codec needed to process them are spooled until the end, to disk once bigger than SPOOL_SIZE
+    STREAM_CHUNK_SIZE = 64 * 1024
+    SPOOL_SIZE = 4 * 1024 * 1024
+
+    def initialize(
+        self,
+        url: str,
+        key: bytes,
+        nonce: str,
+        protocol: str = JSON_PROTOCOL,
+        window: int = 1,
+        timeout: tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    ) -> None:
         self.__url = url
-        self.__nonce = nonce
-        self.__cypher = AESCypher(key)
-        self.__session = requests.session()
-
-    def send_request(self, request: dict[str, Any]) -> dict[str, str]:
-        # Add nonce and encrypt the request
-        request['nonce'] = self.__nonce
-        jsonBody = json.dumps(request)
-        encrypted_request = self.__cypher.encrypt(jsonBody)
-
-        # Send the request
-        response = self.__session.post(self.__url, json = {
+        self.__key = key
+        self.__session = None
+        self.__session_lock = threading.Lock()
+        self.__timeout = timeout
+        self.__protocol = protocol
+        self.__compressor = Compressor()
+        self.__compression = None
+        self.__serializer = Serializer()
+        self.__capabilities: set[str] = set()
+
+        # Every request uses one of the valid nonces, waiting for one if all of them are in use. Each
+        # response replaces the used nonce, so there is a single one unless the shell supports issuing
+        # a window of them, which is requested when the window is bigger than one
+        self.__nonces = deque([ nonce ])
+        self.__nonces_available = threading.Condition()
+        self.__window = window
+        self.__request_ids = itertools.count(1)
+
+        # Threads whose request was abandoned cannot send more requests, and the nonces they hold or
+        # receive are dropped. The next request resynchronizes the nonces, since some of them are lost
+        self.__aborted_threads: weakref.WeakSet[threading.Thread] = weakref.WeakSet()
+        self.__resync_pending = False
+
+        # Requests may be sent from several threads. Each thread has its own cypher, since cyphers
+        # reuse their buffers, and may listen to the amount of bytes it transfers
+        self.__thread_state = threading.local()
+
+    @property
+    def raw_content(self) -> bool:
+        # File contents can only travel unencoded with the binary protocol
+        return self.__protocol == self.BINARY_PROTOCOL
+
+    def supports(self, capability: str) -> bool:
+        # Optional features advertised by the shell in its last response
+        return capability in self.__capabilities
+
+    def set_transfer_listener(self, listener: Callable[[int], None] | None) -> None:
+        # Call the listener with the bytes sent and received by each request of the current thread
+        self.__thread_state.listener = listener
+
+    def send_request(self, request: dict[str, Any], sink: Callable[[Any], None] | None = None) -> dict[str, Any]:
+        # Send the request with a valid nonce. Requests rejected because of a stale nonce were not run,
+        # so they are sent again once the nonce is resynchronized. If a sink is given, the response is
+        # processed as it arrives, and the output is passed to the sink in pieces instead of returned
+        self.__resync_if_aborted()
+        attempt = 0
+        while True:
+            nonce = self.__acquire_nonce()
+            try:
+                processed_response = self.__send_request(request, nonce, sink)
+            except PermissionError:
+                # Keep the nonce if the shell cannot issue new ones, so that the state does not change
+                if attempt >= self.MAX_RETRIES:
+                    self.__release_nonces([ nonce ])
+                    raise
+                try:
+                    self.resync()
+                except BaseException:
+                    self.__release_nonces([ nonce ])
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                # The shell may not have received the request, so the nonce may still be valid
+                self.__release_nonces([ nonce ])
+                # Streamed outputs cannot be taken back, so their requests are not retried
+                retry = request.get('action') in self.IDEMPOTENT_ACTIONS and sink is None
+                if not retry or attempt >= self.MAX_RETRIES:
+                    raise
+                time.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+            except BaseException:
+                self.__release_nonces([ nonce ])
+                raise
+            else:
+                return self.__accept_response(request, nonce, processed_response)
+            attempt += 1
+
+    def resync(self) -> None:
+        # Ask the shell for new nonces, replacing the known ones. The request does not need a valid
+        # nonce, and only the holder of the key can read the response
+        processed_response = self.__send_request({ 'action': 'resync' }, None)
+        if 'nonce' not in processed_response:
+            raise PermissionError('The webshell could not resynchronize the nonce')
+
+        nonces = [ processed_response.pop('nonce') ] + processed_response.pop('nonces', [])
+        with self.__nonces_available:
+            self.__check_aborted()
+            self.__nonces.clear()
+            self.__nonces.extend(nonces)
+            self.__nonces_available.notify_all()
+        self.__negotiate(processed_response)
+
+    def abort(self, thread: threading.Thread) -> None:
+        # Abandon the request the thread is sending. The session is closed, so that its connection is
+        # dropped instead of reused once the shell answers, and the next request opens a new one
+        with self.__nonces_available:
+            self.__aborted_threads.add(thread)
+            self.__resync_pending = True
+        with self.__session_lock:
+            session, self.__session = self.__session, None
+        if session is not None:
+            session.close()
+
+    def __send_request(self, request: dict[str, Any], nonce: str | None, sink: Callable[[Any], None] | None = None) -> dict[str, Any]:
+        # Add nonce and the supported compression codecs, and send the request using the selected protocol.
+        # Requests sent with a window of nonces are identified, so that responses can be matched to them.
+        # The time spent on each stage is recorded
+        request['nonce'] = nonce
+        request['compression'] = self.__compressor.codecs()
+        if self.__window > 1:
+            request['id'] = next(self.__request_ids)
+            request['window'] = self.__window
+        timings = { 'start': time.perf_counter() }
+        if self.__protocol == self.BINARY_PROTOCOL:
+            return self.__send_binary_request(request, timings, sink)
+
+        # Compress and encrypt the request
+        plaintext = self.__serializer.dumps(request)
+        self.__lap(timings, 'serialize')
+        plaintext, codec = self.__compress(plaintext, timings)
+        encrypted_request = self.__get_cypher().encrypt(plaintext)
+        del plaintext
+        self.__lap(timings, 'encrypt')
+
+        # Send the request, serializing the outer object once instead of letting requests encode it
+        body = {
             'body': encrypted_request['body'],
             'iv': encrypted_request['iv'],
+        }
+        if codec is not None:
+            body['compression'] = codec
+        response = self.__post(data = self.__serializer.dumps(body), stream = sink is not None, headers = {
+            'Content-Type': 'application/json'
         })
+        self.__lap(timings, 'http')
 
         # Process response
-        return self.__process_response(response)
+        if sink is not None:
+            processed_response, response_bytes = self.__stream_response(response, sink, timings)
+        else:
+            processed_response = self.__process_response(response, timings)
+            response_bytes = len(response.content)
+        self.__record(request, timings, len(body['body']) + len(body['iv']), response_bytes)
+        return processed_response
 
-    def __process_response(self, response: requests.Response) -> dict[str, str]:
+    def __process_response(self, response: 'requests.Response', timings: dict[str, float]) -> dict[str, Any]:
         # Create an empty response
         processed_response = {}
 
         # Check if the response contains a body
-        if len(response.text) > 0:
-            # Extract the nonce and body
-            response_body = response.json()
-            processed_response = json.loads(
-                    self.__cypher.decrypt(response_body['body'].encode(), response_body['iv'].encode())
-            )
-
-            # Extract the nonce from the response and update its value
-            self.__nonce = processed_response.pop('nonce')
+        if len(response.content) > 0:
+            # Extract the nonce and body, decompressing it if the shell compressed it
+            response_body = self.__serializer.loads(response.content)
+            self.__lap(timings, 'response_parse')
+            codec = response_body.get('compression')
+            if codec is None:
+                plaintext = self.__get_cypher().decrypt(response_body['body'], response_body['iv'])
+                self.__lap(timings, 'decrypt')
+                processed_response = self.__serializer.loads(plaintext)
+            else:
+                with self.__get_cypher().decrypt_bytes(b64decode(response_body['body']), b64decode(response_body['iv'])) as plaintext:
+                    self.__lap(timings, 'decrypt')
+                    decompressed_plaintext = self.__compressor.decompress(codec, plaintext)
+                self.__lap(timings, 'decompress')
+                processed_response = self.__serializer.loads(decompressed_plaintext)
+            self.__lap(timings, 'inner_parse')
         else:
             processed_response = { 'output': '' }
 
         return processed_response
+
+    def __stream_response(self, response: 'requests.Response', sink: Callable[[Any], None], timings: dict[str, float]) -> tuple[dict[str, Any], int]:
+        # Parse the outer object as it arrives. Its body is decrypted, decompressed and parsed on the fly
+        # if the iv came before it, and spooled otherwise. A body decoded on the fly is taken as not
+        # compressed if the codec did not come before it either, so a codec sent after it is a protocol
+        # error. The time spent on each stage is added up over the pieces, and the time spent waiting for
+        # them is part of the HTTP stage
+        stream = None
+        codec_known = None
+        spool = tempfile.SpooledTemporaryFile(self.SPOOL_SIZE)
+        def process_body(piece: str) -> None:
+            nonlocal stream, codec_known
+            self.__lap(timings, 'response_parse')
+            if codec_known is None:
+                codec_known = 'compression' in outer.fields
+                if 'iv' in outer.fields:
+                    stream = self.__open_plaintext_stream(outer.fields['iv'], outer.fields.get('compression'), sink, timings)
+            if stream is not None:
+                stream[0](piece)
+            else:
+                spool.write(piece.encode())
+
+        outer = JSONStreamParser({ 'body': process_body })
+        text = codecs.getincrementaldecoder('utf-8')()
+        response_bytes = 0
+        with response, spool:
+            for chunk in response.iter_content(self.STREAM_CHUNK_SIZE):
+                self.__lap(timings, 'http')
+                response_bytes += len(chunk)
+                outer.feed(text.decode(chunk))
+                self.__lap(timings, 'response_parse')
+            if response_bytes == 0:
+                return {}, 0
+            outer.close()
+            if stream is not None and not codec_known and 'compression' in outer.fields:
+                raise ValueError('The response codec was sent after its body')
+
+            # Process the spooled body once the whole outer object is known
+            if stream is None:
+                stream = self.__open_plaintext_stream(outer.fields['iv'], outer.fields.get('compression'), sink, timings)
+                spool.seek(0)
+                for piece in iter(lambda: spool.read(self.STREAM_CHUNK_SIZE), b''):
+                    stream[0](piece)
+
+        processed_response = stream[1]()
+        return processed_response, response_bytes
+
+    def __open_plaintext_stream(
+        self,
+        iv: str,
+        codec: str | None,
+        sink: Callable[[Any], None],
+        timings: dict[str, float]
+    ) -> tuple[Callable[[Any], None], Callable[[], dict[str, Any]]]:
+        # Return the functions to process the body in pieces and to finish it. Each piece is decrypted,
+        # decompressed and parsed, and the output is passed to the sink
+        decryptor = self.__get_cypher().decryptor(iv)
+        decompress = None if codec is None else self.__compressor.decompressor(codec)
+        text = codecs.getincrementaldecoder('utf-8')()
+        inner = JSONStreamParser({ 'output': self.__timed_sink(sink, timings, 'inner_parse') })
+
+        def process(plaintext: bytes, final: bool = False) -> None:
+            self.__lap(timings, 'decrypt')
+            if decompress is not None:
+                plaintext = decompress(plaintext)
+                self.__lap(timings, 'decompress')
+            inner.feed(text.decode(plaintext, final = final))
+            self.__lap(timings, 'inner_parse')
+        def update(cyphertext: Any) -> None:
+            process(decryptor.update(cyphertext))
+        def finalize() -> dict[str, Any]:
+            process(decryptor.finalize(), final = True)
+            return inner.close()
+        return update, finalize
+
+    def __timed_sink(self, sink: Callable[[Any], None], timings: dict[str, float], stage: str) -> Callable[[Any], None]:
+        # Time spent passing the output to the sink, such as printing it, is not part of the stage calling it
+        def timed_sink(piece: Any) -> None:
+            self.__lap(timings, stage)
+            sink(piece)
+            self.__lap(timings, 'output')
+        return timed_sink
+
+    def __send_binary_request(self, request: dict[str, Any], timings: dict[str, float], sink: Callable[[Any], None] | None = None) -> dict[str, Any]:
+        # Move raw file contents out of the JSON header and into the payload
+        content = b''
+        if isinstance(request.get('args', {}).get('content'), (bytes, bytearray, memoryview)):
+            request = { **request, 'args': dict(request['args']) }
+            content = request['args'].pop('content')
+
+        # Build, compress and encrypt the plaintext
+        header = self.__serializer.dumps(request)
+        plaintext = b''.join([ self.PLAINTEXT_HEADER.pack(len(header)), header, content ])
+        self.__lap(timings, 'serialize')
+        plaintext, codec = self.__compress(plaintext, timings)
+        iv, cyphertext = self.__get_cypher().encrypt_bytes(plaintext)
+        del plaintext
+
+        # Frame and send the request
+        with cyphertext:
+            frame_header = self.FRAME_HEADER.pack(self.BINARY_MAGIC, self.__compressor.codec_id(codec), iv)
+            body = b''.join([ frame_header, cyphertext ])
+        self.__lap(timings, 'encrypt')
+        response = self.__post(data = body, stream = sink is not None, headers = {
+            'Content-Type': 'application/octet-stream'
+        })
+        self.__lap(timings, 'http')
+
+        # Process response
+        if sink is not None:
+            processed_response, response_bytes = self.__stream_binary_response(response, sink, timings)
+        else:
+            processed_response = self.__process_binary_response(response, timings)
+            response_bytes = len(response.content)
+        self.__record(request, timings, len(body), response_bytes)
+        return processed_response
+
+    def __process_binary_response(self, response: 'requests.Response', timings: dict[str, float]) -> dict[str, Any]:
+        # Check if the response contains a body
+        body = response.content
+        if len(body) == 0:
+            return { 'output': '' }
+
+        # Check the frame and extract the codec and iv
+        if len(body) < self.FRAME_HEADER.size:
+            raise ValueError('Truncated response frame')
+        magic, codec_id, iv = self.FRAME_HEADER.unpack_from(body)
+        if magic != self.BINARY_MAGIC:
+            raise ValueError('Invalid response frame')
+        codec = self.__compressor.codec_name(codec_id)
+        self.__lap(timings, 'response_parse')
+
+        # Decrypt and decompress the plaintext
+        with self.__get_cypher().decrypt_bytes(memoryview(body)[self.FRAME_HEADER.size:], iv) as plaintext:
+            self.__lap(timings, 'decrypt')
+            if codec is None:
+                processed_response = self.__split_plaintext(plaintext)
+            else:
+                decompressed_plaintext = memoryview(self.__compressor.decompress(codec, plaintext))
+                self.__lap(timings, 'decompress')
+                processed_response = self.__split_plaintext(decompressed_plaintext)
+        self.__lap(timings, 'inner_parse')
+
+        return processed_response
+
+    def __stream_binary_response(self, response: 'requests.Response', sink: Callable[[Any], None], timings: dict[str, float]) -> tuple[dict[str, Any], int]:
+        # Read the frame header, then decrypt and decompress the plaintext as it arrives. The output in
+        # its JSON header, or the raw payload after it, is passed to the sink
+        header = JSONStreamParser({ 'output': self.__timed_sink(sink, timings, 'inner_parse') })
+        text = codecs.getincrementaldecoder('utf-8')()
+        prefix = bytearray()
+        header_left = None
+        def process_plaintext(plaintext: bytes) -> None:
+            nonlocal header_left
+            self.__lap(timings, 'decrypt')
+            if decompress is not None:
+                plaintext = decompress(plaintext)
+                self.__lap(timings, 'decompress')
+            if header_left is None:
+                prefix.extend(plaintext)
+                if len(prefix) < self.PLAINTEXT_HEADER.size:
+                    return
+                header_left = self.PLAINTEXT_HEADER.unpack_from(prefix)[0]
+                plaintext = bytes(prefix[self.PLAINTEXT_HEADER.size:])
+
+            length = min(header_left, len(plaintext))
+            if length > 0:
+                header_left -= length
+                header.feed(text.decode(plaintext[:length], final = header_left == 0))
+            self.__lap(timings, 'inner_parse')
+            if length < len(plaintext):
+                sink(plaintext[length:])
+                self.__lap(timings, 'output')
+
+        frame = bytearray()
+        decryptor = None
+        response_bytes = 0
+        with response:
+            for chunk in response.iter_content(self.STREAM_CHUNK_SIZE):
+                self.__lap(timings, 'http')
+                response_bytes += len(chunk)
+                if decryptor is not None:
+                    process_plaintext(decryptor.update(chunk))
+                    continue
+
+                # Check the frame and extract the codec and iv
+                frame.extend(chunk)
+                if len(frame) < self.FRAME_HEADER.size:
+                    continue
+                magic, codec_id, iv = self.FRAME_HEADER.unpack_from(frame)
+                if magic != self.BINARY_MAGIC:
+                    raise ValueError('Invalid response frame')
+                codec = self.__compressor.codec_name(codec_id)
+                decryptor = self.__get_cypher().decryptor(iv, encoded = False)
+                decompress = None if codec is None else self.__compressor.decompressor(codec)
+                self.__lap(timings, 'response_parse')
+                process_plaintext(decryptor.update(frame[self.FRAME_HEADER.size:]))
+
+        if response_bytes == 0:
+            return {}, 0
+        if decryptor is None:
+            raise ValueError('Truncated response frame')
+        process_plaintext(decryptor.finalize())
+        processed_response = header.close()
+        return processed_response, response_bytes
+
+    def __split_plaintext(self, plaintext: memoryview) -> dict[str, Any]:
+        # Split the plaintext into the JSON header and the raw payload
+        header_end = self.PLAINTEXT_HEADER.size + self.PLAINTEXT_HEADER.unpack_from(plaintext)[0]
+        processed_response = self.__serializer.loads(plaintext[self.PLAINTEXT_HEADER.size:header_end])
+
+        # Raw file contents are returned as the output
+        if 'output' not in processed_response:
+            processed_response['output'] = bytes(plaintext[header_end:])
+        return processed_response
+
+    def __post(self, **kwargs: Any) -> 'requests.Response':
+        # Shells reject requests with an invalid nonce without running them
+        response = self.__get_session().post(self.__url, timeout = self.__timeout, **kwargs)
+        if response.status_code == 403:
+            raise PermissionError('The webshell rejected the nonce')
+        return response
+
+    def __get_session(self) -> 'requests.Session':
+        # The session, and with it the HTTP stack, is only created when the first request is sent
+        with self.__session_lock:
+            if self.__session is None:
+                self.__session = requests.session()
+            return self.__session
+
+    def __accept_response(self, request: dict[str, Any], nonce: str, processed_response: dict[str, Any]) -> dict[str, Any]:
+        # Keep the nonces issued by the shell, or the used one if the shell answered without rotating it
+        nonces = processed_response.pop('nonces', [])
+        if 'nonce' in processed_response:
+            nonces.insert(0, processed_response.pop('nonce'))
+        self.__release_nonces(nonces if len(nonces) > 0 else [ nonce ])
+
+        # Identified requests must receive their own response
+        if processed_response.pop('id', request.get('id')) != request.get('id'):
+            raise ValueError('The response does not match the request')
+
+        self.__negotiate(processed_response)
+        return processed_response
+
+    def __resync_if_aborted(self) -> None:
+        with self.__nonces_available:
+            self.__check_aborted()
+            resync, self.__resync_pending = self.__resync_pending, False
+        if resync:
+            try:
+                self.resync()
+            except BaseException:
+                self.__resync_pending = True
+                raise
+
+    def __check_aborted(self) -> None:
+        if threading.current_thread() in self.__aborted_threads:
+            raise ConnectionAbortedError('The request was cancelled')
+
+    def __acquire_nonce(self) -> str:
+        with self.__nonces_available:
+            self.__nonces_available.wait_for(lambda: len(self.__nonces) > 0)
+            return self.__nonces.popleft()
+
+    def __release_nonces(self, nonces: list[str]) -> None:
+        with self.__nonces_available:
+            if threading.current_thread() in self.__aborted_threads:
+                return
+            self.__nonces.extend(nonces)
+            self.__nonces_available.notify(len(nonces))
+
+    def __get_cypher(self) -> AESCypher:
+        cypher = getattr(self.__thread_state, 'cypher', None)
+        if cypher is None:
+            cypher = self.__thread_state.cypher = AESCypher(self.__key)
+        return cypher
+
+    def __compress(self, plaintext: bytes, timings: dict[str, float]) -> tuple[bytes, str | None]:
+        # Only compress once the shell has accepted a codec, and only if it pays off
+        if self.__compression is None or len(plaintext) < self.COMPRESSION_THRESHOLD:
+            return plaintext, None
+
+        compressed_plaintext = self.__compressor.compress(self.__compression, plaintext)
+        self.__lap(timings, 'compress')
+        if len(compressed_plaintext) >= len(plaintext):
+            return plaintext, None
+        return compressed_plaintext, self.__compression
+
+    def __negotiate(self, processed_response: dict[str, Any]) -> None:
+        # Shells supporting compression answer with the codec they chose among the offered ones
+        codec = processed_response.pop('compression', None)
+        if codec in self.__compressor.codecs():
+            self.__compression = codec
+
+        # Shells supporting optional features advertise them in every response
+        capabilities = processed_response.pop('capabilities', None)
+        if capabilities is not None:
+            self.__capabilities = set(capabilities)
+
+    def __lap(self, timings: dict[str, float], stage: str) -> None:
+        # Add the time elapsed since the previous lap to the duration of the stage, which streamed
+        # responses go through once per piece
+        now = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + now - timings.pop('lap', timings['start'])
+        timings['lap'] = now
+
+    def __record(self, request: dict[str, Any], timings: dict[str, float], request_bytes: int, response_bytes: int) -> None:
+        # Save the stage durations and the total time of the request
+        timings['total'] = timings.pop('lap', timings['start']) - timings.pop('start')
+        StatsService().record(request.get('action', 'unknown'), timings, request_bytes, response_bytes)
+
+        listener = getattr(self.__thread_state, 'listener', None)
+        if listener is not None:
+            listener(request_bytes + response_bytes)
@@ -0,0 +1,80 @@
+from client.singleton import Singleton
+from client.http_service import HTTPService
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+import threading
+import time
+
+class JobService(Singleton):
+    # Class constants -> number of jobs run at once, and states of a job
+    MAX_WORKERS = 4
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self) -> None:
+        self.__executor = ThreadPoolExecutor(max_workers = self.MAX_WORKERS, thread_name_prefix = 'job')
+        self.__jobs: dict[int, dict[str, Any]] = {}
+        self.__next_id = 1
+        self.__lock = threading.Lock()
+
+    def submit(self, description: str, function: Callable[[dict[str, Any]], str], args: dict[str, Any]) -> int:
+        # Register the job and run it on the worker pool
+        with self.__lock:
+            job_id = self.__next_id
+            self.__next_id += 1
+            job = { 'id': job_id, 'description': description, 'start': None, 'end': None, 'bytes': 0 }
+            self.__jobs[job_id] = job
+            job['future'] = self.__executor.submit(self.__run, job, function, args)
+
+        return job_id
+
+    def get_jobs(self) -> list[dict[str, Any]]:
+        # Return the state of every job not brought to the foreground yet
+        with self.__lock:
+            jobs = list(self.__jobs.values())
+
+        now = time.monotonic()
+        return [
+            {
+                'id': job['id'],
+                'description': job['description'],
+                'status': self.__status(job['future']),
+                'elapsed': 0.0 if job['start'] is None else (job['end'] or now) - job['start'],
+                'bytes': job['bytes']
+            }
+            for job in jobs
+        ]
+
+    def wait(self, job_id: int) -> str:
+        # Wait for the job to finish and return its output, or raise its error. The job is forgotten
+        # once it has finished, so that interrupting the wait does not lose it
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+        if job is None:
+            raise LookupError(f'Unknown job: {job_id}')
+
+        wait([ job['future'] ])
+        with self.__lock:
+            self.__jobs.pop(job_id, None)
+        return job['future'].result()
+
+    def __run(self, job: dict[str, Any], function: Callable[[dict[str, Any]], str], args: dict[str, Any]) -> str:
+        # Count the bytes transferred by the requests of the job
+        job['start'] = time.monotonic()
+        HTTPService().set_transfer_listener(lambda size: self.__add_bytes(job, size))
+        try:
+            return function(args)
+        finally:
+            HTTPService().set_transfer_listener(None)
+            job['end'] = time.monotonic()
+
+    def __add_bytes(self, job: dict[str, Any], size: int) -> None:
+        job['bytes'] += size
+
+    def __status(self, future: Future) -> str:
+        if not future.done():
+            return self.RUNNING if future.running() else self.QUEUED
+        return self.FAILED if future.exception() is not None else self.DONE
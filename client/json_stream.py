@@ -0,0 +1,195 @@
+from typing import Any, Callable
+import json
+import re
+
+class JSONStreamParser:
+    # Class constants -> runs of string characters and escapes, and the tokens that matter while
+    # skipping over a value
+    STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+    STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+    VALUE_TOKEN = re.compile(r'["\[\]{},]')
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}')
+
+    # Parser states
+    START = 0
+    KEY = 1
+    COLON = 2
+    VALUE = 3
+    STREAM = 4
+    RAW = 5
+    RAW_STRING = 6
+    NEXT = 7
+    DONE = 8
+
+    def __init__(self, handlers: dict[str, Callable[[str], None]]) -> None:
+        # Incremental parser of a JSON object. String values of the fields with a handler are passed
+        # to it in pieces as they arrive, without keeping them. The other values are parsed once
+        # complete and saved in the fields
+        self.__handlers = handlers
+        self.fields: dict[str, Any] = {}
+        self.__state = self.START
+        self.__buffer = ''
+        self.__position = 0
+        self.__key = None
+
+        # Pieces of the value being skipped over, and the depth of the arrays and objects in it
+        self.__value_start = 0
+        self.__value_parts: list[str] = []
+        self.__depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self.__state == self.DONE
+
+    def feed(self, text: str) -> None:
+        # Only a few characters are left from the previous call, unless a key was split
+        self.__buffer = self.__buffer[self.__position:] + text
+        self.__position = 0
+        self.__value_start = 0
+        while self.__step():
+            pass
+
+        # Keep the pieces of the value being skipped over
+        if self.__state in (self.RAW, self.RAW_STRING):
+            self.__value_parts.append(self.__buffer[self.__value_start:self.__position])
+            self.__value_start = self.__position
+
+    def close(self) -> dict[str, Any]:
+        if self.__state != self.DONE:
+            raise ValueError('Incomplete JSON object')
+        return self.fields
+
+    def __step(self) -> bool:
+        # Process the next token, returning False if more text is needed
+        buffer = self.__buffer
+        if self.__state not in (self.STREAM, self.RAW_STRING):
+            self.__position = self.WHITESPACE.match(buffer, self.__position).end()
+        position = self.__position
+        if position >= len(buffer):
+            return False
+        char = buffer[position]
+
+        if self.__state == self.START:
+            self.__expect(char, '{', self.KEY)
+        elif self.__state == self.KEY:
+            if char == '}' and len(self.fields) == 0:
+                self.__expect(char, '}', self.DONE)
+                return True
+            if char != '"':
+                raise ValueError(f'Expected a key at "{char}"')
+            match = self.STRING.match(buffer, position)
+            if match is None:
+                return False
+            self.__key = json.loads(match.group())
+            self.__position = match.end()
+            self.__state = self.COLON
+        elif self.__state == self.COLON:
+            self.__expect(char, ':', self.VALUE)
+        elif self.__state == self.VALUE:
+            if char == '"' and self.__key in self.__handlers:
+                self.__expect(char, '"', self.STREAM)
+            else:
+                self.__state = self.RAW
+                self.__value_start = position
+                self.__value_parts = []
+                self.__depth = 0
+        elif self.__state == self.STREAM:
+            return self.__stream_string()
+        elif self.__state == self.RAW:
+            return self.__skip_value()
+        elif self.__state == self.RAW_STRING:
+            end = self.STRING_BODY.match(buffer, position).end()
+            if end >= len(buffer) or buffer[end] != '"':
+                self.__position = end
+                return False
+            self.__position = end + 1
+            self.__state = self.RAW
+        elif self.__state == self.NEXT:
+            if char == ',':
+                self.__expect(char, ',', self.KEY)
+            else:
+                self.__expect(char, '}', self.DONE)
+        else:
+            raise ValueError('Unexpected data after the JSON object')
+
+        return True
+
+    def __stream_string(self) -> bool:
+        # Decode the characters received so far, holding back escapes that may be incomplete
+        buffer = self.__buffer
+        start = self.__position
+        end = self.STRING_BODY.match(buffer, start).end()
+        complete = end < len(buffer) and buffer[end] == '"'
+        if not complete:
+            end = self.__complete_escapes_end(start, end)
+        if end > start:
+            self.__handlers[self.__key](json.loads('"' + buffer[start:end] + '"'))
+
+        if not complete:
+            self.__position = end
+            return False
+        self.__position = end + 1
+        self.__state = self.NEXT
+        return True
+
+    def __complete_escapes_end(self, start: int, end: int) -> int:
+        # Move the end back while it splits a unicode escape or a surrogate pair
+        buffer = self.__buffer
+        while end > start:
+            backslash = buffer.rfind('\\', max(start, end - 12), end)
+            if backslash == -1:
+                return end
+
+            # Backslashes preceded by an odd number of them are escaped, and start nothing
+            first = backslash
+            while first > start and buffer[first - 1] == '\\':
+                first -= 1
+            if (backslash - first) % 2 == 1:
+                return end
+
+            escape = buffer[backslash:end]
+            incomplete = len(escape) < 2 or (escape[1] == 'u' and len(escape) < 6)
+            unpaired = len(escape) == 6 and self.HIGH_SURROGATE.fullmatch(escape) is not None
+            if not incomplete and not unpaired:
+                return end
+            end = backslash
+
+        return end
+
+    def __skip_value(self) -> bool:
+        # Find the end of the value, which is the first comma or brace outside arrays, objects and
+        # strings
+        buffer = self.__buffer
+        match = self.VALUE_TOKEN.search(buffer, self.__position)
+        if match is None:
+            self.__position = len(buffer)
+            return False
+
+        token = match.group()
+        self.__position = match.end()
+        if token == '"':
+            self.__state = self.RAW_STRING
+        elif token in '[{':
+            self.__depth += 1
+        elif token in ']}' and self.__depth > 0:
+            self.__depth -= 1
+        elif token == ',' and self.__depth > 0:
+            pass
+        elif token in ',}':
+            # Parse the whole value, leaving the delimiter for the next state
+            self.__position = match.start()
+            raw_value = ''.join(self.__value_parts) + buffer[self.__value_start:self.__position]
+            self.fields[self.__key] = json.loads(raw_value)
+            self.__value_parts = []
+            self.__state = self.NEXT
+        else:
+            raise ValueError(f'Unexpected "{token}" in value')
+
+        return True
+
+    def __expect(self, char: str, expected: str, state: int) -> None:
+        if char != expected:
+            raise ValueError(f'Expected "{expected}" at "{char}"')
+        self.__position += 1
+        self.__state = state
@@ -0,0 +1,17 @@
+from types import ModuleType
+from typing import Any
+import importlib
+
+class LazyModule:
+    # Stand-in for a module that is only imported the first time one of its attributes is used, so
+    # that heavy dependencies do not slow down the startup
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+        self.__module: ModuleType | None = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Imports are thread safe, and return the module already imported by other threads
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attribute)
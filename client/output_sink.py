@@ -0,0 +1,138 @@
+from typing import Any
+import os
+import tempfile
+
+class OutputSink:
+    # Class constants -> outputs are kept in memory up to THRESHOLD characters and spilled to a
+    # temporary file beyond that. Spilled outputs are previewed by their first and last lines
+    THRESHOLD = 1024 * 1024
+    HEAD_LINES = 20
+    TAIL_LINES = 20
+    MAX_LINE_LENGTH = 1000
+    TAIL_BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, path: str | None = None, threshold: int = THRESHOLD) -> None:
+        # Outputs redirected to a file are written to it from the start
+        self.__threshold = threshold
+        self.__parts: list[str] = []
+        self.__pending = ''
+        self.__size = 0
+        self.__newlines = 0
+        self.__last_char = ''
+        self.__file = None
+        self.__path = path
+        self.__temporary = path is None
+        if path is not None:
+            self.__file = open(path, 'w', encoding = 'utf-8', newline = '')
+
+    def __enter__(self) -> 'OutputSink':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def path(self) -> str | None:
+        return self.__path
+
+    @property
+    def spilled(self) -> bool:
+        # Whether the output was too big to be kept in memory
+        return self.__temporary and self.__path is not None
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def lines(self) -> int:
+        return self.__newlines + (1 if self.__last_char not in ('', '\n') else 0)
+
+    @property
+    def text(self) -> str | None:
+        # Outputs kept in memory, or None if they were written to a file
+        return ''.join(self.__parts) if self.__path is None else None
+
+    def write(self, piece: str) -> None:
+        # Convert escaped newlines as they arrive, holding back a trailing backslash that may start one
+        piece = self.__pending + piece
+        self.__pending = ''
+        if piece.endswith('\\'):
+            piece, self.__pending = piece[:-1], '\\'
+        self.__append(piece.replace('\\n', '\n'))
+
+    def close(self) -> None:
+        self.__append(self.__pending)
+        self.__pending = ''
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def preview(self, head_lines: int = HEAD_LINES, tail_lines: int = TAIL_LINES) -> str:
+        # Show the first and last lines of outputs written to a file, cutting long lines
+        if self.__path is None:
+            return self.text
+        lines = self.__read_head(head_lines)
+        lines.append(f'... {self.lines} lines, {self.__size} characters, full output in {self.__path} ...')
+        if self.lines > head_lines:
+            lines += self.__read_tail(min(tail_lines, self.lines - head_lines))
+        return '\n'.join(lines)
+
+    def __append(self, text: str) -> None:
+        if len(text) == 0:
+            return
+        self.__size += len(text)
+        self.__newlines += text.count('\n')
+        self.__last_char = text[-1]
+
+        # Move the output to a temporary file once it reaches the threshold
+        if self.__file is None and self.__size > self.__threshold:
+            self.__file = tempfile.NamedTemporaryFile(
+                'w',
+                prefix = 'webshell-output-',
+                suffix = '.txt',
+                delete = False,
+                encoding = 'utf-8',
+                newline = ''
+            )
+            self.__path = self.__file.name
+            self.__file.writelines(self.__parts)
+            self.__parts = []
+
+        if self.__file is not None:
+            self.__file.write(text)
+        else:
+            self.__parts.append(text)
+
+    def __read_head(self, lines: int) -> list[str]:
+        head = []
+        with open(self.__path, 'r', encoding = 'utf-8', errors = 'replace', newline = '') as f:
+            while len(head) < lines:
+                line = f.readline(self.MAX_LINE_LENGTH + 1)
+                if len(line) == 0:
+                    break
+                head.append(self.__cut(line.rstrip('\n')))
+
+                # Skip the rest of long lines
+                while len(line) > 0 and not line.endswith('\n'):
+                    line = f.readline(self.TAIL_BLOCK_SIZE)
+
+        return head
+
+    def __read_tail(self, lines: int) -> list[str]:
+        # Read blocks from the end of the file until they hold enough lines, or enough characters to
+        # fill them
+        with open(self.__path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            tail = b''
+            while position > 0 and tail.count(b'\n') <= lines and len(tail) < (lines + 1) * self.MAX_LINE_LENGTH * 4:
+                size = min(self.TAIL_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                tail = f.read(size) + tail
+
+        text = tail.decode('utf-8', errors = 'replace')
+        return [ self.__cut(line) for line in text.removesuffix('\n').split('\n')[-lines:] ]
+
+    def __cut(self, line: str) -> str:
+        return line if len(line) <= self.MAX_LINE_LENGTH else line[:self.MAX_LINE_LENGTH] + '...'
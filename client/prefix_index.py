@@ -0,0 +1,102 @@
+class PrefixNode:
+    # Node of a radix trie, labelled with the characters of the edge leading to it. Only the nodes
+    # where commands branch or end are kept, so there are at most two per command whatever its
+    # length. Each node points at the most recent command below it
+    __slots__ = ('label', 'children', 'latest')
+
+    def __init__(self, label: str, children: dict[str, 'PrefixNode'] | None = None, latest: str | None = None) -> None:
+        self.label = label
+        self.children = children
+        self.latest = latest
+
+class PrefixIndex:
+    # Radix trie of the distinct commands. The most recent command starting with a prefix is found by
+    # following the prefix -> O(len(prefix))
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def add(self, cmd: str) -> None:
+        # Mark the command as the most recent one, below every node on its path
+        self.__insert(cmd, True)
+
+    def add_older(self, cmd: str) -> None:
+        # Index a command older than all the indexed ones, which never replaces the most recent ones
+        self.__insert(cmd, False)
+
+    def remove(self, cmd: str) -> None:
+        # Remove a command used before all the other indexed ones. The commands below the first node
+        # pointing at it are even older, so they were removed before it, and the node is dropped
+        path = [ self.__root ]
+        depth = 0
+        while path[-1].latest != cmd:
+            node = path[-1].children.get(cmd[depth]) if path[-1].children is not None and depth < len(cmd) else None
+            if node is None or not cmd.startswith(node.label, depth):
+                return
+            path.append(node)
+            depth += len(node.label)
+
+        if len(path) == 1:
+            self.clear()
+            return
+        node, parent = path.pop(), path[-1]
+        del parent.children[node.label[0]]
+
+        # The parent is left as the node of the command ending there, or merged with its only child
+        # if no command ends there
+        if len(parent.children) == 0:
+            parent.children = None
+        elif len(path) > 1 and len(parent.children) == 1:
+            child = next(iter(parent.children.values()))
+            if child.latest == parent.latest:
+                child.label = parent.label + child.label
+                path[-2].children[parent.label[0]] = child
+
+    def latest(self, prefix: str) -> str | None:
+        # The prefix may end in the middle of the label of the last node
+        node = self.__root
+        depth = 0
+        while depth < len(prefix):
+            node = node.children.get(prefix[depth]) if node.children is not None else None
+            if node is None:
+                return None
+            length = min(len(node.label), len(prefix) - depth)
+            if not prefix.startswith(node.label[:length], depth):
+                return None
+            depth += length
+
+        return node.latest
+
+    def clear(self) -> None:
+        self.__root = PrefixNode('')
+
+    def __insert(self, cmd: str, newest: bool) -> None:
+        # Follow the path of the command, splitting the edge where it branches off
+        node = self.__root
+        depth = 0
+        end = len(cmd)
+        while True:
+            if newest or node.latest is None:
+                node.latest = cmd
+            if depth == end:
+                return
+
+            children = node.children
+            if children is None:
+                children = node.children = {}
+            child = children.get(cmd[depth])
+            if child is None:
+                child = children[cmd[depth]] = PrefixNode(cmd[depth:])
+                depth = end
+            elif cmd.startswith(child.label, depth):
+                depth += len(child.label)
+            else:
+                # Split the label where the command leaves it
+                label = child.label
+                length = 1
+                while depth + length < end and label[length] == cmd[depth + length]:
+                    length += 1
+                child.label = label[length:]
+                child = children[cmd[depth]] = PrefixNode(label[:length], { label[length]: child }, child.latest)
+                depth += length
+            node = child
@@ -0,0 +1,9 @@
+from client.action import Action
+from client.http_service import HTTPService
+from typing import Any
+
+class ResyncAction(Action):
+    def run(self, args: dict[str, Any]) -> str:
+        # Replace the known nonces with new ones issued by the webshell
+        HTTPService().resync()
+        return 'Nonce resynchronized'
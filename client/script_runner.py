@@ -0,0 +1,115 @@
+from client.action import Action
+from client.client import Client
+
+from typing import Any, TextIO
+import json
+import time
+
+class ScriptRunner(Client):
+    # Runs the commands of a script instead of reading them interactively. Consecutive shell commands
+    # are run as a batch, which the shell may receive in a single request. The output of each command
+    # is written as a JSON line (the default) or as plain text
+    JSONL_FORMAT = 'jsonl'
+    TEXT_FORMAT = 'text'
+
+    def __init__(self, actions: dict[str, Action], script: TextIO, output_format: str = JSONL_FORMAT) -> None:
+        super().__init__(actions)
+        self.__actions = actions
+        self.__script = script
+        self.__output_format = output_format
+        self.__sequence = 0
+
+    def run(self) -> int:
+        status = 0
+        cmds = []
+        for line in self.__script:
+            # Skip empty lines and comments
+            user_input = line.rstrip('\n')
+            if len(user_input.strip()) == 0 or user_input.lstrip().startswith('#'):
+                continue
+            if user_input == 'exit':
+                break
+
+            # The commands of an explicit batch follow it in the script, and are batched with the
+            # pending ones
+            if user_input.strip() == '!batch':
+                cmds += self.read_batch()
+                continue
+
+            # Run the pending commands before any other action, since it may depend on them. Commands
+            # redirecting their output to a local file are run on their own
+            if not user_input.startswith('!') and not user_input.rstrip().endswith('&') and self.REDIRECT.search(user_input) is None:
+                cmds.append(user_input)
+                continue
+            status |= self.__run_batch(cmds)
+            cmds = []
+            status |= self.__run_action(user_input)
+
+        return status | self.__run_batch(cmds)
+
+    def read_batch(self) -> list[str]:
+        # Read the commands of a batch from the script until !end, instead of prompting for them
+        cmds = []
+        for line in self.__script:
+            cmd = line.rstrip('\n')
+            if cmd == '!end':
+                break
+            if len(cmd) > 0:
+                cmds.append(cmd)
+
+        return cmds
+
+    def __run_batch(self, cmds: list[str]) -> int:
+        if len(cmds) == 0:
+            return 0
+        if self.__output_format == self.TEXT_FORMAT:
+            return self.__run_action('\n'.join([ '!batch' ] + cmds))
+
+        # Write a frame per command as soon as its request completes. The time of each request is
+        # shared by its commands
+        done = 0
+        started, start = time.time(), time.perf_counter()
+        try:
+            for outputs in self.__actions['execute_batch'].execute(cmds):
+                duration = (time.perf_counter() - start) / len(outputs)
+                for cmd, output in zip(cmds[done:], outputs):
+                    self.__write_frame(cmd, output, None, started, duration)
+                done += len(outputs)
+                started, start = time.time(), time.perf_counter()
+        except Exception as e:
+            # Only the commands that were not run are reported as failed
+            duration = (time.perf_counter() - start) / (len(cmds) - done)
+            for cmd in cmds[done:]:
+                self.__write_frame(cmd, None, e, started, duration)
+            return 1
+
+        return 0
+
+    def __run_action(self, user_input: str) -> int:
+        started, start = time.time(), time.perf_counter()
+        try:
+            action, args = self.select_action(user_input)
+            output, error = self.__actions[action].run(args), None
+        except Exception as e:
+            output, error = None, e
+
+        if self.__output_format == self.TEXT_FORMAT:
+            print('Error: the requested action could not be performed' if error is not None else output.replace('\\n', '\n'))
+        else:
+            self.__write_frame(user_input, output, error, started, time.perf_counter() - start)
+        return 0 if error is None else 1
+
+    def __write_frame(self, user_input: str, output: str | None, error: Exception | None, started: float, duration: float) -> None:
+        # Write the frame on a single line, flushing it so that it can be read straight away
+        self.__sequence += 1
+        frame: dict[str, Any] = {
+            'seq': self.__sequence,
+            'input': user_input,
+            'status': 'ok' if error is None else 'error',
+            'output': None if output is None else output.replace('\\n', '\n'),
+            'started': started,
+            'duration': duration
+        }
+        if error is not None:
+            frame['error'] = str(error) or type(error).__name__
+        print(json.dumps(frame), flush = True)
@@ -0,0 +1,47 @@
+from typing import Any, Callable
+import json
+
+# orjson and ujson are faster than the json module, but they are optional dependencies
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+class Serializer:
+    # Class constants -> JSON backends, ordered by preference. The json module is always available
+    BACKENDS = [ 'orjson', 'ujson', 'json' ]
+
+    def __init__(self, backend: str | None = None) -> None:
+        # Register the backends whose modules are available, with functions to serialize objects to
+        # UTF-8 encoded bytes and to parse strings, bytes or buffers
+        self.__backends: dict[str, tuple[Callable[[Any], bytes], Callable[[Any], Any]]] = {}
+        if orjson is not None:
+            self.__backends['orjson'] = (orjson.dumps, orjson.loads)
+        if ujson is not None:
+            self.__backends['ujson'] = (lambda obj: ujson.dumps(obj).encode(), lambda data: ujson.loads(self.__to_bytes(data)))
+        self.__backends['json'] = (lambda obj: json.dumps(obj).encode(), lambda data: json.loads(self.__to_bytes(data)))
+
+        # Use the requested backend, or the fastest available one
+        if backend is None:
+            backend = next(b for b in self.BACKENDS if b in self.__backends)
+        elif backend not in self.__backends:
+            raise ValueError(f'Unsupported JSON backend: {backend}')
+        self.backend = backend
+        self.__dumps, self.__loads = self.__backends[backend]
+
+    def backends(self) -> list[str]:
+        return [ b for b in self.BACKENDS if b in self.__backends ]
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.__dumps(obj)
+
+    def loads(self, data: str | bytes | bytearray | memoryview) -> Any:
+        return self.__loads(data)
+
+    def __to_bytes(self, data: str | bytes | bytearray | memoryview) -> str | bytes | bytearray:
+        # Buffers are only accepted by orjson
+        return bytes(data) if isinstance(data, memoryview) else data
@@ -16,7 +16,16 @@ class ShowHelpAction(Action):
         - !binput <filename> : upload a binary file.
         - !history           : view a list of all previously executed commands.
         - !delete            : clear the command history.
+        - !stats             : show the time spent on each stage of the requests.
+        - <cmd> > !<file>    : save the output of the command to a local file.
+        - <cmd> &            : run the command (or any action, such as !get) in the background.
+        - !jobs              : list the background jobs.
+        - !fg <id>           : wait for a background job and show its output.
+        - !resync            : get a new nonce from the webshell if requests are being rejected.
+        - !batch             : type several commands, ended by !end, and run them in a single request.
         - !<cmd>             : repeat the last command that starts with the provided string.
+        - !?<fragment>       : repeat the last command that contains the provided string.
+        - !search <fragment> : list the commands that contain the provided string.
         - !help              : show this help menu.
 
         """
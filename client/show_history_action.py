@@ -2,16 +2,35 @@ from client.action import Action
 from client.history_service import HistoryService
 from typing import Any
 
+import time
+
 class ShowHistoryAction(Action):
     def run(self, args: dict[str, Any]) -> str:
         # Get a history service instance
         history_service = HistoryService()
 
-        # Search a command or return the full history
+        # Search a command, list the commands containing a fragment or return the full history
         output = ''
         if 'search' in args.keys():
-            output = history_service.search_command(args['search'])[-1]
+            output = history_service.search_latest(args['search'])
+            if output is None:
+                raise LookupError(f"No command starts with '{args['search']}'")
+        elif 'contains' in args.keys():
+            matches = history_service.search_fragment(args['contains'], 1)
+            if len(matches) == 0:
+                raise LookupError(f"No command contains '{args['contains']}'")
+            output = matches[0]['cmd']
+        elif 'find' in args.keys():
+            matches = history_service.search_fragment(args['find'])
+            output = '\n'.join([ self.__format_entry(entry) for entry in reversed(matches) ])
         else:
-            output = '\n'.join(HistoryService().get_history())
+            output = '\n'.join(history_service.get_history())
 
         return output
+
+    def __format_entry(self, entry: dict[str, Any]) -> str:
+        # Show when the command was run, how long it took and how big its output was, if known
+        timestamp = '-' if entry['timestamp'] is None else time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['timestamp']))
+        duration = '-' if entry['duration'] is None else f"{entry['duration'] * 1000:.1f} ms"
+        output_size = '-' if entry['output_size'] is None else f"{entry['output_size']} B"
+        return f"{timestamp:<19}  {duration:>10}  {output_size:>10}  {entry['cmd']}"
@@ -0,0 +1,19 @@
+from client.action import Action
+from client.job_service import JobService
+from typing import Any
+
+class ShowJobsAction(Action):
+    def run(self, args: dict[str, Any]) -> str:
+        # Get the background jobs
+        jobs = JobService().get_jobs()
+        if len(jobs) == 0:
+            return 'No background jobs'
+
+        # Show a line per job with its state, elapsed time and transferred bytes
+        lines = [ f"{'id':<6}{'status':<10}{'elapsed':>12}{'bytes':>14}  command" ]
+        for job in jobs:
+            elapsed = f"{job['elapsed']:.1f} s"
+            transferred = f"{job['bytes']} B"
+            lines.append(f"{job['id']:<6}{job['status']:<10}{elapsed:>12}{transferred:>14}  {job['description']}")
+
+        return '\n'.join(lines)
@@ -0,0 +1,31 @@
+from client.action import Action
+from client.stats_service import StatsService
+from typing import Any
+
+class ShowStatsAction(Action):
+    # Class constants -> metrics measured in bytes instead of seconds
+    BYTE_METRICS = [ 'request_bytes', 'response_bytes' ]
+
+    def run(self, args: dict[str, Any]) -> str:
+        # Get the statistics of each action
+        stats = StatsService().get_stats()
+        if len(stats) == 0:
+            return 'No requests have been sent yet'
+
+        # Show a table per action with the percentiles of each stage
+        lines = []
+        for action, metrics in stats.items():
+            lines.append(f"{action} ({metrics['total']['count']} requests)")
+            lines.append(f"  {'stage':<16}{'p50':>14}{'p95':>14}{'p99':>14}")
+            for metric, summary in metrics.items():
+                values = [ self.__format(metric, summary[p]) for p in [ 'p50', 'p95', 'p99' ] ]
+                lines.append(f'  {metric:<16}' + ''.join(f'{value:>14}' for value in values))
+            lines.append('')
+
+        return '\n'.join(lines)
+
+    def __format(self, metric: str, value: float) -> str:
+        # Sizes are shown in bytes and durations in milliseconds
+        if metric in self.BYTE_METRICS:
+            return f'{int(value)} B'
+        return f'{value * 1000:.2f} ms'
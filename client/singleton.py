@@ -1,7 +1,18 @@
-from abc import ABC
+from abc import ABC, ABCMeta
+import threading
 
-class Singleton(ABC):
-    def __new__(cls):
-        if not hasattr(cls, 'instance'):
-            cls.instance = super(Singleton, cls).__new__(cls)
+class SingletonMeta(ABCMeta):
+    # Construct the instance of each class the first time it is called, and return that instance
+    # afterwards without running __init__ again, so that subclasses initialize their state only once
+
+    # Class constants -> constructors may construct other singletons, on any thread
+    LOCK = threading.RLock()
+
+    def __call__(cls, *args, **kwargs):
+        with SingletonMeta.LOCK:
+            if not hasattr(cls, 'instance'):
+                cls.instance = super().__call__(*args, **kwargs)
         return cls.instance
+
+class Singleton(ABC, metaclass = SingletonMeta):
+    pass
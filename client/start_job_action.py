@@ -0,0 +1,12 @@
+from client.action import Action
+from client.job_service import JobService
+from typing import Any
+
+class StartJobAction(Action):
+    def __init__(self, actions: dict[str, Action]) -> None:
+        self.__actions = actions
+
+    def run(self, args: dict[str, Any]) -> str:
+        # Run the requested action in the background
+        job_id = JobService().submit(args['description'], self.__actions[args['action']].run, args['args'])
+        return f"[{job_id}] {args['description']}"
@@ -0,0 +1,62 @@
+from client.singleton import Singleton
+
+from collections import deque
+from typing import Any
+import math
+import threading
+
+class StatsService(Singleton):
+    # Class constants -> only the most recent samples of each action are kept
+    MAX_SAMPLES = 1000
+
+    def __init__(self) -> None:
+        # Samples are recorded by the jobs too, so they are only accessed under the lock
+        self.__samples: dict[str, deque[dict[str, float]]] = {}
+        self.__lock = threading.Lock()
+
+    def record(self, action: str, timings: dict[str, float], request_bytes: int, response_bytes: int) -> None:
+        # Save the timings of each stage alongside the transferred bytes
+        sample = { **timings, 'request_bytes': request_bytes, 'response_bytes': response_bytes }
+        with self.__lock:
+            self.__samples.setdefault(action, deque(maxlen = self.MAX_SAMPLES)).append(sample)
+
+    def get_stats(self) -> dict[str, dict[str, dict[str, Any]]]:
+        # Compute the statistics of each action, and of all of them together, from a snapshot of the
+        # samples so that recording is not blocked while they are summarized
+        with self.__lock:
+            snapshot = { action: list(samples) for action, samples in self.__samples.items() }
+
+        stats = {}
+        for action, samples in snapshot.items():
+            stats[action] = self.__summarize(samples)
+        if len(snapshot) > 0:
+            stats['all'] = self.__summarize([ s for samples in snapshot.values() for s in samples ])
+
+        return stats
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__samples = {}
+
+    def __summarize(self, samples: list[dict[str, float]]) -> dict[str, dict[str, Any]]:
+        # Group the values of each metric, preserving the order in which they were recorded
+        metrics: dict[str, list[float]] = {}
+        for sample in samples:
+            for metric, value in sample.items():
+                metrics.setdefault(metric, []).append(value)
+
+        summary = {}
+        for metric, values in metrics.items():
+            values.sort()
+            summary[metric] = {
+                'count': len(values),
+                'p50': self.__percentile(values, 50),
+                'p95': self.__percentile(values, 95),
+                'p99': self.__percentile(values, 99)
+            }
+        return summary
+
+    def __percentile(self, sorted_values: list[float], percentile: int) -> float:
+        # Nearest-rank percentile
+        rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+        return sorted_values[rank - 1]
@@ -1,20 +1,31 @@
 from client.action import Action
 from client.http_service import HTTPService
 from base64 import b64encode
-from typing import Any
+from typing import Any, IO
+
+import os
 
 class UploadFileAction(Action):
+    # Class constants -> files bigger than the chunk size are uploaded in several requests if the
+    # shell supports it, so that memory usage is bounded by the chunk size instead of by the file size
+    CHUNK_SIZE = 1024 * 1024
+    CAPABILITY = 'chunked_upload'
+
     def run(self, args: dict[str, Any]) -> str:
-        content = None
+        # Small files are sent in a single request, big ones are split in chunks
+        if os.path.getsize(args['filename']) <= self.CHUNK_SIZE:
+            self.__upload_file(args)
+        else:
+            self.__upload_file_in_chunks(args)
 
+        # Return empty string
+        return ''
+
+    def __upload_file(self, args: dict[str, Any]) -> None:
         # Read and base64 encode the appropriate file. The mode depends on if the file is
         # binary or not
-        if args['binary']:
-            with open(args['filename'], 'rb') as f:
-                content = b64encode(f.read()).decode()
-        else:
-            with open(args['filename'], 'r') as f:
-                content = b64encode(f.read().encode()).decode()
+        with self.__open(args) as f:
+            content = self.__encode(f.read())
 
         # Craft and send the request
         request = {
@@ -27,5 +38,43 @@ class UploadFileAction(Action):
         }
         HTTPService().send_request(request)
 
-        # Return empty string
-        return ''
+    def __upload_file_in_chunks(self, args: dict[str, Any]) -> None:
+        # Read the file one block at a time. Each block is sent on its own request, specifying
+        # the offset at which it must be written. The first chunk truncates the remote file and
+        # the following ones are appended to it
+        offset = 0
+        with self.__open(args) as f:
+            chunk = f.read(self.CHUNK_SIZE)
+            while len(chunk) > 0:
+                raw_chunk = chunk if args['binary'] else chunk.encode()
+                request = {
+                    'action': 'upload_file',
+                    'args': {
+                        'filename': args['filename'],
+                        'content': self.__encode(raw_chunk),
+                        'binary': args['binary'],
+                        'offset': offset,
+                        'append': offset > 0
+                    }
+                }
+                HTTPService().send_request(request)
+
+                # Shells without chunk support write the first chunk as the whole file, so the file is
+                # sent again in a single request. The capabilities are known once the shell answers
+                if offset == 0 and not HTTPService().supports(self.CAPABILITY):
+                    del chunk, raw_chunk, request
+                    self.__upload_file(args)
+                    return
+
+                # Move to the next chunk, releasing the current one first
+                offset += len(raw_chunk)
+                del raw_chunk, request
+                chunk = f.read(self.CHUNK_SIZE)
+
+    def __open(self, args: dict[str, Any]) -> IO[Any]:
+        return open(args['filename'], 'rb' if args['binary'] else 'r')
+
+    def __encode(self, content: str | bytes) -> str | bytes:
+        # Contents are sent as they are when the protocol allows it, and base64 encoded otherwise
+        raw_content = content if isinstance(content, bytes) else content.encode()
+        return raw_content if HTTPService().raw_content else b64encode(raw_content).decode()
@@ -0,0 +1,20 @@
+from tests.webshell_server import WebshellServer
+
+import pytest
+
+################################################################################
+#                                                                              #
+# Shared fixtures                                                              #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def webshell_server(tmp_path) -> WebshellServer:
+    # Start a local webshell serving a temporary directory
+    root = tmp_path / 'server'
+    root.mkdir()
+    server = WebshellServer(str(root)).start()
+
+    yield server
+
+    server.stop()
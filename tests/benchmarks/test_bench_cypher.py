@@ -0,0 +1,44 @@
+from client.cypher import AESCypher
+
+import pytest
+import secrets
+
+################################################################################
+#                                                                              #
+# Benchmarks -> AESCypher encryption and decryption of different payload sizes #
+#                                                                              #
+################################################################################
+
+SIZES = [ 1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024 ]
+
+@pytest.mark.parametrize('size', SIZES)
+def test_encrypt(benchmark, size: int) -> None:
+    cypher = AESCypher(secrets.token_bytes(32))
+    plaintext = 'a' * size
+
+    benchmark.extra_info['bytes'] = size
+    benchmark(cypher.encrypt, plaintext)
+
+@pytest.mark.parametrize('size', SIZES)
+def test_decrypt(benchmark, size: int) -> None:
+    cypher = AESCypher(secrets.token_bytes(32))
+    message = cypher.encrypt('a' * size)
+
+    benchmark.extra_info['bytes'] = size
+    result = benchmark(cypher.decrypt, message['body'], message['iv'])
+    assert len(result) == size
+
+@pytest.mark.parametrize('size', SIZES)
+def test_streaming_encrypt(benchmark, size: int) -> None:
+    cypher = AESCypher(secrets.token_bytes(32))
+    plaintext = memoryview(b'a' * size)
+    chunk_size = 64 * 1024
+
+    def encrypt() -> None:
+        encryptor = cypher.encryptor()
+        for offset in range(0, size, chunk_size):
+            encryptor.update(plaintext[offset:offset + chunk_size])
+        encryptor.finalize()
+
+    benchmark.extra_info['bytes'] = size
+    benchmark(encrypt)
@@ -0,0 +1,58 @@
+from client.http_service import HTTPService
+from client.upload_file_action import UploadFileAction
+from client.download_file_action import DownloadFileAction
+from tests.webshell_server import WebshellServer
+
+import pytest
+import os
+
+################################################################################
+#                                                                              #
+# Benchmarks -> file uploads and downloads end to end against the local        #
+# webshell, using both protocols                                               #
+#                                                                              #
+################################################################################
+
+SIZES = [ 1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024 ]
+
+@pytest.fixture(params = [ HTTPService.JSON_PROTOCOL, HTTPService.BINARY_PROTOCOL ])
+def http_service(webshell_server: WebshellServer, tmp_path, monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest) -> HTTPService:
+    # Run from an empty directory, connected to the local webshell
+    local_dir = tmp_path / 'client'
+    local_dir.mkdir()
+    monkeypatch.chdir(local_dir)
+    http_service = HTTPService()
+    http_service.initialize(webshell_server.url, webshell_server.key, webshell_server.nonce, request.param)
+
+    yield http_service
+
+    delattr(HTTPService, 'instance')
+
+@pytest.mark.parametrize('size', SIZES)
+def test_upload_file(benchmark, http_service: HTTPService, size: int) -> None:
+    # Create the local file
+    with open('upload.bin', 'wb') as f:
+        f.write(os.urandom(size))
+
+    benchmark.extra_info['bytes'] = size
+    benchmark.pedantic(UploadFileAction().run, args = ({ 'filename': 'upload.bin', 'binary': True },), rounds = rounds(size))
+
+@pytest.mark.parametrize('size', SIZES)
+def test_download_file(benchmark, http_service: HTTPService, webshell_server: WebshellServer, size: int) -> None:
+    # Create the remote file
+    with open(os.path.join(webshell_server.root, 'download.bin'), 'wb') as f:
+        f.write(os.urandom(size))
+
+    benchmark.extra_info['bytes'] = size
+    benchmark.pedantic(DownloadFileAction().run, args = ({ 'filename': 'download.bin', 'binary': True },), rounds = rounds(size))
+    assert os.path.getsize('download.bin') == size
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def rounds(size: int) -> int:
+    # Keep the duration of the biggest transfers reasonable
+    return 10 if size < 10 * 1024 * 1024 else 3
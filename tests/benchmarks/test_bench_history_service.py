@@ -0,0 +1,94 @@
+from client.history_service import HistoryService
+
+import pytest
+import tracemalloc
+
+################################################################################
+#                                                                              #
+# Benchmarks -> HistoryService searches over histories of different sizes      #
+#                                                                              #
+################################################################################
+
+ENTRIES = [ 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6 ]
+
+# Memory allowed per indexed command for prefix searches, besides the command itself
+MAX_INDEX_BYTES_PER_ENTRY = 200
+
+@pytest.fixture
+def history_file(tmp_path, monkeypatch: pytest.MonkeyPatch) -> str:
+    # Run from an empty directory
+    monkeypatch.chdir(tmp_path)
+
+    yield './.webshell_history'
+
+    if hasattr(HistoryService, 'instance'):
+        HistoryService().close()
+        delattr(HistoryService, 'instance')
+
+@pytest.mark.parametrize('entries', ENTRIES)
+def test_search_command(benchmark, history_file: str, entries: int) -> None:
+    history_service = load_history(create_history(history_file, entries), entries)
+
+    benchmark.extra_info['entries'] = entries
+    result = benchmark(history_service.search_command, 'cat /var/log/')
+    assert len(result) == (entries + 3) // 5
+
+@pytest.mark.parametrize('entries', ENTRIES)
+@pytest.mark.parametrize('prefix', [ 'cat /var/log/', 'cat', '' ])
+def test_search_latest(benchmark, history_file: str, entries: int, prefix: str) -> None:
+    # Index the whole history, then search a prefix matching a fifth of it or all of it
+    history_service = load_history(create_history(history_file, entries), entries)
+    history_service.search_latest('')
+
+    benchmark.extra_info['entries'] = entries
+    result = benchmark(history_service.search_latest, prefix)
+    assert result is not None
+
+@pytest.mark.parametrize('entries', ENTRIES[2:])
+def test_search_latest_index_memory(history_file: str, entries: int) -> None:
+    # Load the whole history, and measure the memory used to index it by a search matching nothing
+    history_service = load_history(create_history(history_file, entries), entries)
+
+    tracemalloc.start()
+    try:
+        assert history_service.search_latest('zzz') is None
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    print(f'\nindex: {peak / entries:.2f} bytes per entry')
+
+    # Expect the overhead per command to be bounded
+    assert peak < MAX_INDEX_BYTES_PER_ENTRY * entries
+
+@pytest.mark.parametrize('entries', ENTRIES)
+def test_load_history(benchmark, history_file: str, entries: int) -> None:
+    create_history(history_file, entries)
+    delattr(HistoryService, 'instance')
+
+    def load_history() -> None:
+        HistoryService()
+        delattr(HistoryService, 'instance')
+
+    benchmark.extra_info['entries'] = entries
+    benchmark(load_history)
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def create_history(history_file: str, entries: int) -> HistoryService:
+    # Save a history mixing different commands
+    commands = [ 'ls -la /var/www/html', 'cat /var/log/apache2/access.log', 'id', 'ps aux', 'find / -name "*.conf"' ]
+    with open(history_file, 'w') as f:
+        f.writelines(f'{commands[i % len(commands)]} # {i}\n' for i in range(entries))
+
+    return HistoryService()
+
+def load_history(history_service: HistoryService, entries: int) -> HistoryService:
+    # Keep and load every saved command, instead of the default maximum and the tail
+    history_service.configure(max_entries = entries)
+    history_service.get_history()
+
+    return history_service
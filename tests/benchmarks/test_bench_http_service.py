@@ -0,0 +1,61 @@
+from client.http_service import HTTPService
+from client.cypher import AESCypher
+
+import pytest
+import requests
+import secrets
+import json
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Benchmarks -> HTTPService request building and response processing with a   #
+# mocked session, so that only the client side work is measured               #
+#                                                                              #
+################################################################################
+
+SIZES = [ 1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024 ]
+
+@pytest.fixture
+def http_service(mocker) -> HTTPService:
+    # Initialize the HTTPService with a mocked session
+    key = secrets.token_bytes(32)
+    mocker.patch('requests.session')
+    http_service = HTTPService()
+    http_service.initialize('https://example.com/webshell.php', key, 'd9c0dce01d7770b3a61ec53382f7fb60')
+    http_service.key = key
+
+    yield http_service
+
+    delattr(HTTPService, 'instance')
+
+@pytest.mark.parametrize('size', SIZES)
+def test_process_response(benchmark, http_service: HTTPService, size: int) -> None:
+    # Create a response with an output of the given size
+    response = create_mock_response(http_service.key, 'a' * size)
+
+    benchmark.extra_info['bytes'] = size
+    result = benchmark(http_service._HTTPService__process_response, response, { 'start': 0 })
+    assert len(result['output']) == size
+
+@pytest.mark.parametrize('size', SIZES)
+def test_send_request(benchmark, http_service: HTTPService, size: int) -> None:
+    # Send a request with an argument of the given size, receiving a small response
+    requests.session.return_value.post.return_value = create_mock_response(http_service.key, '')
+    request = { 'action': 'upload_file', 'args': { 'filename': 'test.txt', 'content': 'a' * size, 'binary': False } }
+
+    benchmark.extra_info['bytes'] = size
+    benchmark(http_service.send_request, request)
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def create_mock_response(key: bytes, output: str) -> MagicMock:
+    # Encrypt the body and return it in the format of the webshell
+    response = AESCypher(key).encrypt(json.dumps({ 'output': output, 'nonce': 'd9c0dce01d7770b3a61ec53382f7fb60' }))
+    mock_response = MagicMock()
+    mock_response.content = json.dumps(response).encode()
+    return mock_response
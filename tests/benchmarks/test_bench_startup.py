@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+################################################################################
+#                                                                              #
+# Benchmarks -> time taken to import the client entry point and prepare the    #
+# services, which is what delays the first prompt, and the modules imported    #
+# to do so                                                                     #
+#                                                                              #
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that must only be imported when they are first used
+DEFERRED_MODULES = [ 'requests', 'Crypto.Cipher.AES', 'sqlite3', 'asyncio' ]
+DEFERRED_ACTIONS = [ 'client.execute_command_action', 'client.upload_file_action', 'client.download_file_action' ]
+
+# Everything the entry point does before the first prompt, with the arguments of a user
+STARTUP = '''
+import sys
+sys.argv = [ 'client', '-u', 'https://example.com/webshell.php' ]
+from client.__main__ import parse_arguments, initialize_services, create_actions
+initialize_services(parse_arguments())
+create_actions()
+'''
+
+def test_startup(benchmark, tmp_path) -> None:
+    benchmark.pedantic(start_client, args = (tmp_path,), rounds = 10, warmup_rounds = 1)
+
+def test_startup_does_not_import_deferred_modules(tmp_path) -> None:
+    # Expect neither the heavy dependencies nor the actions to be imported before the first prompt
+    imported = start_client(tmp_path)
+    for module in DEFERRED_MODULES + DEFERRED_ACTIONS:
+        assert not any(name == module or name.startswith(f'{module}.') for name in imported)
+
+def start_client(cwd: str) -> dict[str, int]:
+    # Parse the arguments and initialize the services in a new interpreter, from a directory
+    # without a history, as reported by -X importtime, and return the cumulative time spent
+    # importing each module in microseconds
+    result = subprocess.run(
+        [ sys.executable, '-X', 'importtime', '-c', STARTUP ],
+        cwd = cwd,
+        env = { **os.environ, 'PYTHONPATH': ROOT },
+        capture_output = True,
+        text = True,
+        check = True
+    )
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix('import time:').split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            imported[fields[2].strip()] = int(fields[1])
+    return imported
@@ -0,0 +1,73 @@
+from client.cypher import AESCypher
+from Crypto.Cipher import AES
+from base64 import b64encode, b64decode
+
+import secrets
+import tracemalloc
+import pytest
+
+################################################################################
+#                                                                              #
+# Benchmarks -> measure the memory allocated to encrypt and decrypt each       #
+# megabyte of payload, compared with the previous str based implementation     #
+#                                                                              #
+################################################################################
+
+MEGABYTE = 1024 * 1024
+
+@pytest.mark.parametrize('size', [ MEGABYTE, 2 * MEGABYTE ])
+def test_encrypt_allocates_less_per_megabyte(size: int) -> None:
+    # Measure both implementations with the same payload
+    key = secrets.token_bytes(32)
+    payload = 'a' * size
+    cypher = AESCypher(key)
+    cypher.encrypt(payload)
+
+    baseline = measure_peak_allocation(lambda: str_encrypt(payload, key))
+    current = measure_peak_allocation(lambda: cypher.encrypt(payload))
+    print(f'\nencrypt: {baseline / size:.2f} -> {current / size:.2f} bytes allocated per byte')
+
+    # Expect the bytes based implementation to allocate less
+    assert current < baseline
+
+@pytest.mark.parametrize('size', [ MEGABYTE, 2 * MEGABYTE ])
+def test_decrypt_allocates_less_per_megabyte(size: int) -> None:
+    # Measure both implementations with the same payload
+    key = secrets.token_bytes(32)
+    cypher = AESCypher(key)
+    message = cypher.encrypt('a' * size)
+    cypher.decrypt(message['body'], message['iv'])
+
+    baseline = measure_peak_allocation(lambda: str_decrypt(message['body'], message['iv'], key))
+    current = measure_peak_allocation(lambda: cypher.decrypt(message['body'], message['iv']))
+    print(f'\ndecrypt: {baseline / size:.2f} -> {current / size:.2f} bytes allocated per byte')
+
+    # Expect the bytes based implementation to allocate less
+    assert current < baseline
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def measure_peak_allocation(function) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def str_encrypt(plaintext: str, key: bytes) -> dict[str, str]:
+    # Previous implementation -> pad the str, encode it and encrypt it into a new object
+    padded_plaintext = (plaintext + (16 - len(plaintext) % 16) * chr(16 - len(plaintext) % 16)).encode()
+    iv = secrets.token_bytes(16)
+    cyphertext = AES.new(key, AES.MODE_CBC, iv).encrypt(padded_plaintext)
+    return { 'body': b64encode(cyphertext).decode(), 'iv': b64encode(iv).decode() }
+
+def str_decrypt(cyphertext: str, iv: str, key: bytes) -> str:
+    # Previous implementation -> every step creates a new object
+    plaintext = AES.new(key, AES.MODE_CBC, b64decode(iv)).decrypt(b64decode(cyphertext))
+    return plaintext[:-ord(plaintext[len(plaintext) - 1:])].decode()
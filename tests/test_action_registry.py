@@ -0,0 +1,46 @@
+from client.action import Action
+from client.action_registry import ActionRegistry
+from client.show_help_action import ShowHelpAction
+from client.start_job_action import StartJobAction
+
+import pytest
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_constructs_actions_on_first_use() -> None:
+    # Register an action
+    actions = ActionRegistry()
+    actions.register('show_help', 'client.show_help_action', 'ShowHelpAction')
+
+    # Expect it to be constructed only when it is first requested, and only once
+    assert 'show_help' in actions
+    assert len(actions) == 0
+    action = actions['show_help']
+    assert isinstance(action, ShowHelpAction)
+    assert actions['show_help'] is action
+
+def test_constructs_actions_with_the_registered_arguments() -> None:
+    actions = ActionRegistry()
+    actions.register('start_job', 'client.start_job_action', 'StartJobAction', actions)
+    action = actions['start_job']
+    assert isinstance(action, StartJobAction)
+    assert action._StartJobAction__actions is actions
+
+def test_keeps_actions_added_directly() -> None:
+    actions = ActionRegistry()
+    action = ShowHelpAction()
+    actions['show_help'] = action
+    assert actions['show_help'] is action
+
+def test_raises_an_error_for_unknown_actions() -> None:
+    actions = ActionRegistry()
+    assert 'show_help' not in actions
+    with pytest.raises(KeyError):
+        actions['show_help']
+
+def test_is_a_dictionary_of_actions() -> None:
+    assert issubclass(ActionRegistry, dict)
@@ -0,0 +1,129 @@
+from client.async_client import AsyncClient
+from client.client import Client
+from client.http_service import HTTPService
+
+import os
+import pytest
+import signal
+import time
+from unittest.mock import ANY, MagicMock
+from pytest_mock import MockFixture
+
+################################################################################
+#                                                                              #
+# Pytest Fixtures -> used to arrange tests                                     #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def client() -> AsyncClient:
+    # Create a series of MagicMock objects for each action
+    keys = [
+        'execute_command',
+        'upload_file',
+        'download_file',
+        'show_history',
+        'delete_history',
+        'show_help',
+        'show_stats',
+        'execute_batch'
+    ]
+    actions = {}
+    for key in keys:
+        actions[key] = MagicMock()
+
+    # Mock HTTPService, which abandons the requests of cancelled commands
+    setattr(HTTPService, 'instance', MagicMock())
+
+    yield AsyncClient(actions)
+
+    # Revert mock
+    delattr(HTTPService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_a_client() -> None:
+    assert issubclass(AsyncClient, Client)
+
+def test_when_exit_command_is_inputted_loop_stops(client: AsyncClient, mocker: MockFixture) -> None:
+    mock_input(['exit'], mocker)
+    assert client.run() == 0
+
+def test_when_input_ends_loop_stops(client: AsyncClient, mocker: MockFixture) -> None:
+    mock_input([ EOFError() ], mocker)
+    assert client.run() == 0
+
+def test_runs_commands_in_order_and_prints_their_output(client: AsyncClient, mocker: MockFixture) -> None:
+    # Craft a list of input commands and their outputs
+    mock_input(['pwd', 'whoami', '!help'], mocker, append_exit=True)
+    client._AsyncClient__actions['execute_command'].run.side_effect = [ '/var/www/html', 'www\\ndata' ]
+    client._AsyncClient__actions['show_help'].run.return_value = 'help'
+    mock_print = mocker.patch('builtins.print')
+
+    # Run the client
+    client.run()
+
+    # Expect every command to have run, and its output to have been printed in order
+    client._AsyncClient__actions['execute_command'].run.assert_any_call({ 'cmd': 'pwd', 'sink': ANY })
+    client._AsyncClient__actions['execute_command'].run.assert_any_call({ 'cmd': 'whoami', 'sink': ANY })
+    assert [ c.args[0] for c in mock_print.call_args_list ] == [ '/var/www/html', 'www\ndata', 'help' ]
+
+def test_runs_commands_typed_in_batch_mode_as_a_batch(client: AsyncClient, mocker: MockFixture) -> None:
+    mock_input(['!batch', 'id', 'pwd', '!end', 'whoami'], mocker, append_exit=True)
+    client._AsyncClient__actions['execute_batch'].run.return_value = 'batch'
+    client._AsyncClient__actions['execute_command'].run.return_value = 'www-data'
+    mocker.patch('builtins.print')
+
+    client.run()
+
+    client._AsyncClient__actions['execute_batch'].run.assert_called_once_with({ 'cmds': [ 'id', 'pwd' ] })
+    client._AsyncClient__actions['execute_command'].run.assert_called_once_with({ 'cmd': 'whoami', 'sink': ANY })
+
+def test_if_an_error_occurs_an_error_message_is_shown(client: AsyncClient, mocker: MockFixture) -> None:
+    mock_input(['cd /etc/passwd', 'id'], mocker, append_exit=True)
+    client._AsyncClient__actions['execute_command'].run.side_effect = [ Exception('Test error'), 'uid=33' ]
+    mock_print = mocker.patch('builtins.print')
+
+    client.run()
+
+    # Expect the error message to be shown, and the session to go on
+    assert [ c.args[0] for c in mock_print.call_args_list ] == [
+        'Error: the requested action could not be performed',
+        'uid=33'
+    ]
+
+def test_ctrl_c_cancels_only_the_running_command(client: AsyncClient, mocker: MockFixture) -> None:
+    # Press Ctrl-C while the first command is running
+    mock_input(['sleep 10', 'id'], mocker, append_exit=True)
+    client._AsyncClient__actions['execute_command'].run.side_effect = lambda args: press_ctrl_c() if args['cmd'] == 'sleep 10' else 'uid=33'
+    mock_print = mocker.patch('builtins.print')
+
+    # Run the client
+    assert client.run() == 0
+
+    # Expect the first command to have been cancelled, and the next one to have run
+    assert [ c.args[0] for c in mock_print.call_args_list ] == [ 'Cancelled', 'uid=33' ]
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def mock_input(user_inputs: list, mocker: MockFixture, append_exit = False) -> None:
+    # Mock the built-in input function to return the appropriate values on successive calls
+    mocked_input = mocker.patch('builtins.input')
+    if append_exit:
+        mocked_input.side_effect = user_inputs + ['exit']
+    else:
+        mocked_input.side_effect = user_inputs
+
+def press_ctrl_c() -> str:
+    # Send SIGINT to the process while the command is running
+    os.kill(os.getpid(), signal.SIGINT)
+    time.sleep(0.1)
+    return 'too late'
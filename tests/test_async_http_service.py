@@ -0,0 +1,123 @@
+from client.async_http_service import AsyncHTTPService
+from client.http_service import HTTPService
+from client.singleton import Singleton
+
+import asyncio
+import pytest
+import threading
+import time
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def http_service() -> MagicMock:
+    # Mock HTTPService to return a mock instance
+    http_service = MagicMock()
+    setattr(HTTPService, 'instance', http_service)
+
+    yield http_service
+
+    # Revert mock
+    delattr(HTTPService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_singleton() -> None:
+    assert issubclass(AsyncHTTPService, Singleton)
+
+def test_sends_requests_using_http_service(http_service: MagicMock) -> None:
+    http_service.send_request.return_value = { 'output': 'www-data' }
+    request = { 'action': 'execute_command', 'args': { 'cmd': 'whoami' } }
+
+    response = asyncio.run(AsyncHTTPService().send_request(request))
+
+    assert response == { 'output': 'www-data' }
+    http_service.send_request.assert_called_once_with(request)
+
+def test_sends_requests_one_at_a_time(http_service: MagicMock) -> None:
+    # Track how many requests are in flight at once
+    tracker = RequestTracker()
+    http_service.send_request.side_effect = tracker.send_request
+
+    async def send_requests() -> list[dict]:
+        requests = [ AsyncHTTPService().send_request({ 'id': i }) for i in range(5) ]
+        return await asyncio.gather(*requests)
+
+    # Expect every request to have been answered, without overlapping
+    responses = asyncio.run(send_requests())
+    assert responses == [ { 'output': i } for i in range(5) ]
+    assert tracker.max_in_flight == 1
+
+def test_cancelled_requests_are_not_sent_if_still_queued(http_service: MagicMock) -> None:
+    # Block the transport thread with a first request
+    release = threading.Event()
+    http_service.send_request.side_effect = lambda request: release.wait(5) and { 'output': request['id'] }
+
+    async def cancel_queued_request() -> dict:
+        first = asyncio.create_task(AsyncHTTPService().send_request({ 'id': 1 }))
+        second = asyncio.create_task(AsyncHTTPService().send_request({ 'id': 2 }))
+        await asyncio.sleep(0.01)
+        second.cancel()
+        await asyncio.gather(second, return_exceptions = True)
+        release.set()
+        return await first
+
+    # Expect only the first request to have been sent
+    assert asyncio.run(cancel_queued_request()) == { 'output': 1 }
+    assert asyncio.run(AsyncHTTPService().send_request({ 'id': 3 })) == { 'output': 3 }
+    assert [ c.args[0]['id'] for c in http_service.send_request.call_args_list ] == [ 1, 3 ]
+
+def test_cancelled_requests_in_flight_do_not_delay_the_next_one(http_service: MagicMock) -> None:
+    # Block the transport thread with a first request, recording the thread of each request
+    release = threading.Event()
+    threads = []
+    def send_request(request: dict) -> dict:
+        threads.append(threading.current_thread())
+        if request['id'] == 1:
+            release.wait(5)
+        return { 'output': request['id'] }
+    http_service.send_request.side_effect = send_request
+
+    async def cancel_request_in_flight() -> dict:
+        first = asyncio.create_task(AsyncHTTPService().send_request({ 'id': 1 }))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions = True)
+        return await AsyncHTTPService().send_request({ 'id': 2 })
+
+    # Expect the second request to have been answered while the first one is still blocked, from a
+    # new transport thread, and the thread of the first one to have been aborted
+    try:
+        assert asyncio.run(asyncio.wait_for(cancel_request_in_flight(), 1)) == { 'output': 2 }
+        assert not release.is_set() and threads[0] is not threads[1]
+        http_service.abort.assert_called_once_with(threads[0])
+    finally:
+        release.set()
+
+################################################################################
+#                                                                              #
+# Helper functions and classes                                                 #
+#                                                                              #
+################################################################################
+
+class RequestTracker:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def send_request(self, request: dict) -> dict:
+        # Count the requests being sent, including this one
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        self.in_flight -= 1
+        return { 'output': request['id'] }
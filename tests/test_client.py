@@ -1,8 +1,13 @@
 from client.client import Client
+from client.command_parser import CommandParser
+from client.output_sink import OutputSink
 
 import pytest
+import os
+import re
+import shlex
 import textwrap
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock
 from pytest_mock import MockFixture
 from multiprocessing import Process
 
@@ -21,7 +26,13 @@ def client() -> Client:
         'download_file',
         'show_history',
         'delete_history',
-        'show_help'
+        'show_help',
+        'show_stats',
+        'start_job',
+        'show_jobs',
+        'foreground_job',
+        'execute_batch',
+        'resync'
     ]
     actions = {}
     for key in keys:
@@ -66,7 +77,7 @@ def test_calls_execute_command_action_when_receives_a_command(client: Client, mo
 
     # Expect the execute_command action to have been called once with each command
     for cmd in commands:
-        client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': cmd })
+        client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': cmd, 'sink': ANY })
 
 def test_prints_command_output(client: Client, mocker: MockFixture) -> None:
     # Craft a list of input commands and their outputs
@@ -110,7 +121,7 @@ def test_calls_upload_file_action_for_text_files(client: Client, mocker: MockFix
     # Expect the execute_command action to have been called once with each command
     for cmd in commands:
         request = {
-            'filename': cmd.split(' ', 1)[1],
+            'filename': shlex.split(cmd)[1],
             'binary': False
         }
         client._Client__actions['upload_file'].run.assert_any_call(request)
@@ -126,7 +137,7 @@ def test_calls_upload_file_action_for_binary_files(client: Client, mocker: MockF
     # Expect the execute_command action to have been called once with each command
     for cmd in commands:
         request = {
-            'filename': cmd.split(' ', 1)[1],
+            'filename': shlex.split(cmd)[1],
             'binary': True
         }
         client._Client__actions['upload_file'].run.assert_any_call(request)
@@ -142,7 +153,7 @@ def test_calls_download_file_action_for_text_files(client: Client, mocker: MockF
     # Expect the execute_command action to have been called once with each command
     for cmd in commands:
         request = {
-            'filename': cmd.split(' ', 1)[1],
+            'filename': shlex.split(cmd)[1],
             'binary': False
         }
         client._Client__actions['download_file'].run.assert_any_call(request)
@@ -158,7 +169,7 @@ def test_calls_download_file_action_for_binary_files(client: Client, mocker: Moc
     # Expect the execute_command action to have been called once with each command
     for cmd in commands:
         request = {
-            'filename': cmd.split(' ', 1)[1],
+            'filename': shlex.split(cmd)[1],
             'binary': True
         }
         client._Client__actions['download_file'].run.assert_any_call(request)
@@ -197,7 +208,33 @@ def test_can_repeat_last_call_to_command(client: Client, mocker: MockFixture) ->
     # Expect the show_history action to have been used to query for the command and the
     # execute_command action to run it
     client._Client__actions['show_history'].run.assert_any_call({ 'search': 'who' })
-    client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': 'whoami' })
+    client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': 'whoami', 'sink': ANY })
+
+def test_can_repeat_last_command_containing_a_fragment(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['cat /etc/passwd', '!?passwd']
+    mock_input(commands, mocker, append_exit=True)
+    client._Client__actions['show_history'].run.return_value = commands[0]
+
+    # Run the client
+    client.run()
+
+    # Expect the show_history action to have been used to query for the command and the
+    # execute_command action to run it
+    client._Client__actions['show_history'].run.assert_any_call({ 'contains': 'passwd' })
+    assert client._Client__actions['execute_command'].run.call_count == 2
+    client._Client__actions['execute_command'].run.assert_called_with({ 'cmd': 'cat /etc/passwd', 'sink': ANY })
+
+def test_can_search_commands_containing_a_fragment(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['!search /etc/passwd']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the show_history action to have been called
+    client._Client__actions['show_history'].run.assert_called_once_with({ 'find': '/etc/passwd' })
 
 def test_can_show_a_help_menu(client: Client, mocker: MockFixture) -> None:
     # Craft the list of expected commands
@@ -210,6 +247,117 @@ def test_can_show_a_help_menu(client: Client, mocker: MockFixture) -> None:
     # Expect the show_help action to have been called
     client._Client__actions['show_help'].run.assert_any_call({})
 
+def test_can_show_request_statistics(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['!stats']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the show_stats action to have been called
+    client._Client__actions['show_stats'].run.assert_called_once_with({})
+
+def test_runs_command_lines_ending_in_ampersand_in_the_background(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['find / -name "*.conf" &', '!get backup.tar.gz &']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the start_job action to have been called with the action to run
+    client._Client__actions['start_job'].run.assert_any_call({
+        'action': 'execute_command',
+        'args': { 'cmd': 'find / -name "*.conf"' },
+        'description': 'find / -name "*.conf"'
+    })
+    client._Client__actions['start_job'].run.assert_any_call({
+        'action': 'download_file',
+        'args': { 'filename': 'backup.tar.gz', 'binary': False },
+        'description': '!get backup.tar.gz'
+    })
+    client._Client__actions['execute_command'].run.assert_not_called()
+
+def test_does_not_run_command_lists_in_the_background(client: Client, mocker: MockFixture) -> None:
+    mock_input(['make &&'], mocker, append_exit=True)
+    client.run()
+    client._Client__actions['execute_command'].run.assert_called_once_with({ 'cmd': 'make &&', 'sink': ANY })
+
+def test_can_show_and_foreground_jobs(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['!jobs', '!fg 2']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the job actions to have been called
+    client._Client__actions['show_jobs'].run.assert_called_once_with({})
+    client._Client__actions['foreground_job'].run.assert_called_once_with({ 'id': 2 })
+
+def test_can_resync_the_nonce(client: Client, mocker: MockFixture) -> None:
+    mock_input(['!resync'], mocker, append_exit=True)
+    client.run()
+    client._Client__actions['resync'].run.assert_called_once_with({})
+
+def test_runs_commands_typed_in_batch_mode_as_a_batch(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['!batch', 'id', '', 'pwd', '!end', 'whoami']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the commands until !end to have been run as a batch, and the next one on its own
+    client._Client__actions['execute_batch'].run.assert_called_once_with({ 'cmds': [ 'id', 'pwd' ] })
+    client._Client__actions['execute_command'].run.assert_called_once_with({ 'cmd': 'whoami', 'sink': ANY })
+
+def test_can_redirect_the_output_of_commands_to_a_file(client: Client, mocker: MockFixture) -> None:
+    # Craft the list of expected commands
+    commands = ['ls -la /var/www > !listing.txt', 'echo a>b']
+    mock_input(commands, mocker, append_exit=True)
+
+    # Run the client
+    client.run()
+
+    # Expect the first command to have been run with the file, and the second one with a sink
+    client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': 'ls -la /var/www', 'output_file': 'listing.txt' })
+    client._Client__actions['execute_command'].run.assert_any_call({ 'cmd': 'echo a>b', 'sink': ANY })
+
+def test_previews_big_outputs(client: Client, mocker: MockFixture) -> None:
+    # Run a command with an output bigger than the threshold
+    mock_input(['find /'], mocker, append_exit=True)
+    output = ''.join(f'/usr/share/file{i}\\n' for i in range(100000))
+    client._Client__actions['execute_command'].run.side_effect = lambda args: args['sink'](output)
+    mock_print = mocker.patch('builtins.print')
+    client.run()
+
+    # Expect a preview with the first and last lines to have been printed
+    lines = mock_print.call_args.args[0].split('\n')
+    assert lines[0] == '/usr/share/file0' and lines[-1] == '/usr/share/file99999'
+    assert len(lines) == OutputSink.HEAD_LINES + OutputSink.TAIL_LINES + 1
+    os.remove(re.search(r'in (\S+) \.\.\.', lines[OutputSink.HEAD_LINES]).group(1))
+
+def test_pages_big_outputs_on_terminals(client: Client, mocker: MockFixture, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Run a command with an output bigger than the threshold on a terminal
+    mock_input(['find /'], mocker, append_exit=True)
+    output = ''.join(f'/usr/share/file{i}\\n' for i in range(100000))
+    client._Client__actions['execute_command'].run.side_effect = lambda args: args['sink'](output)
+    monkeypatch.setenv('PAGER', 'less -S')
+    mocker.patch('sys.stdout.isatty', return_value = True)
+    mocker.patch('shutil.which', return_value = '/usr/bin/less')
+    mock_run = mocker.patch('subprocess.run')
+    mocker.patch('builtins.print')
+    client.run()
+
+    # Expect the pager to have been run on the saved output
+    command = mock_run.call_args.args[0]
+    assert command[:2] == [ 'less', '-S' ]
+    with open(command[2], 'r') as f:
+        assert f.read() == output.replace('\\n', '\n')
+    os.remove(command[2])
+
 def test_if_an_error_occurs_an_error_message_is_shown(client: Client, mocker: MockFixture) -> None:
     # Craft the list of expected commands
     commands = ['cd /etc/passwd']
@@ -225,6 +373,24 @@ def test_if_an_error_occurs_an_error_message_is_shown(client: Client, mocker: Mo
     # Expect the error message to be shown
     mock_print.assert_any_call('Error: the requested action could not be performed')
 
+def test_shows_the_usage_of_commands_with_missing_arguments(client: Client, mocker: MockFixture) -> None:
+    # Download a file without naming it
+    mock_input(['!get'], mocker, append_exit=True)
+    mock_print = mocker.patch('builtins.print')
+    client.run()
+
+    # Expect the usage of the command to be shown, without running it
+    mock_print.assert_any_call('Error: Usage: !get <filename>')
+    client._Client__actions['download_file'].run.assert_not_called()
+
+def test_runs_commands_registered_in_the_parser(client: Client, mocker: MockFixture) -> None:
+    # Register a new command for an existing action
+    client.parser.register('!mget', 'download_file', { 'filename': CommandParser.WORD, 'target': CommandParser.WORD })
+    mock_input(['!mget a.txt b.txt'], mocker, append_exit=True)
+    client.run()
+
+    client._Client__actions['download_file'].run.assert_called_once_with({ 'filename': 'a.txt', 'target': 'b.txt' })
+
 ################################################################################
 #                                                                              #
 # Helper functions                                                             #
@@ -0,0 +1,71 @@
+from client.command_parser import CommandError, CommandParser
+
+import pytest
+
+################################################################################
+#                                                                              #
+# Pytest Fixtures -> used to arrange tests                                     #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def parser() -> CommandParser:
+    # Create a grammar with a command of each kind and a default action
+    parser = CommandParser()
+    parser.register('!help', 'show_help')
+    parser.register('!get', 'download_file', { 'filename': CommandParser.WORD }, { 'binary': False })
+    parser.register('!copy', 'copy_file', { 'source': CommandParser.WORD, 'target': CommandParser.WORD })
+    parser.register('!fg', 'foreground_job', { 'id': CommandParser.INTEGER })
+    parser.register('!batch', 'execute_batch', { 'cmds': CommandParser.LINES })
+    parser.register('!search', 'show_history', { 'find': CommandParser.LINE })
+    parser.register_prefix('!?', 'repeat_command', { 'contains': CommandParser.LINE })
+    parser.register_prefix('!', 'repeat_command', { 'search': CommandParser.LINE })
+    parser.register_prefix('', 'execute_command', { 'cmd': CommandParser.LINE })
+
+    yield parser
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_selects_commands_by_their_first_word(parser: CommandParser) -> None:
+    assert parser.parse('!help') == ('show_help', {})
+    assert parser.parse('!get php.ini') == ('download_file', { 'filename': 'php.ini', 'binary': False })
+    assert parser.parse('!fg 2') == ('foreground_job', { 'id': 2 })
+
+def test_supports_quoted_and_multiple_arguments(parser: CommandParser) -> None:
+    assert parser.parse('!get "config backup.txt"') == ('download_file', { 'filename': 'config backup.txt', 'binary': False })
+    assert parser.parse("!copy 'a b.txt' c.txt") == ('copy_file', { 'source': 'a b.txt', 'target': 'c.txt' })
+
+def test_keeps_backslashes_in_arguments(parser: CommandParser) -> None:
+    assert parser.parse(r'!get C:\inetpub\wwwroot\web.config') == ('download_file', { 'filename': r'C:\inetpub\wwwroot\web.config', 'binary': False })
+    assert parser.parse(r'!copy "C:\Program Files\a.txt" \\server\share') == ('copy_file', { 'source': r'C:\Program Files\a.txt', 'target': r'\\server\share' })
+
+def test_keeps_line_arguments_as_typed(parser: CommandParser) -> None:
+    assert parser.parse('!search cat "/etc') == ('show_history', { 'find': 'cat "/etc' })
+    assert parser.parse('!batch\nid\n\npwd') == ('execute_batch', { 'cmds': [ 'id', 'pwd' ] })
+    assert parser.parse('!batch') == ('execute_batch', { 'cmds': [] })
+
+def test_selects_the_longest_matching_prefix(parser: CommandParser) -> None:
+    assert parser.parse('!?passwd') == ('repeat_command', { 'contains': 'passwd' })
+    assert parser.parse('!cat /etc') == ('repeat_command', { 'search': 'cat /etc' })
+    assert parser.parse('!gets') == ('repeat_command', { 'search': 'gets' })
+    assert parser.parse('ls -la') == ('execute_command', { 'cmd': 'ls -la' })
+    assert parser.parse(' !help') == ('execute_command', { 'cmd': ' !help' })
+
+@pytest.mark.parametrize('line', [ '!get', '!get a b', '!get "unbalanced', '!help me', '!fg', '!fg one', '!copy a' ])
+def test_shows_the_usage_of_commands_with_wrong_arguments(parser: CommandParser, line: str) -> None:
+    command = line.split(' ', 1)[0]
+    with pytest.raises(CommandError, match = f'Usage: {command}'):
+        parser.parse(line)
+
+def test_rejects_lines_matching_no_command() -> None:
+    parser = CommandParser()
+    parser.register('!help', 'show_help')
+    with pytest.raises(CommandError):
+        parser.parse('ls')
+
+def test_errors_are_value_errors() -> None:
+    assert issubclass(CommandError, ValueError)
@@ -0,0 +1,46 @@
+from client.compressor import Compressor
+
+import pytest
+import zlib
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_zlib_is_always_available() -> None:
+    assert 'zlib' in Compressor().codecs()
+
+def test_compresses_and_decompresses_with_each_codec() -> None:
+    compressor = Compressor()
+    data = b'drwxr-xr-x 2 www-data www-data 4096 index.php\n' * 100
+    for codec in compressor.codecs():
+        compressed_data = compressor.compress(codec, data)
+        assert len(compressed_data) < len(data) and compressor.decompress(codec, compressed_data) == data
+
+def test_decompresses_streams_in_pieces_with_each_codec() -> None:
+    compressor = Compressor()
+    data = b'drwxr-xr-x 2 www-data www-data 4096 index.php\n' * 100
+    for codec in compressor.codecs():
+        compressed_data = compressor.compress(codec, data)
+        decompress = compressor.decompressor(codec)
+        assert b''.join(decompress(compressed_data[i:i + 10]) for i in range(0, len(compressed_data), 10)) == data
+
+def test_zlib_output_is_standard() -> None:
+    data = b'Sample data' * 10
+    assert zlib.decompress(Compressor().compress('zlib', data)) == data
+
+def test_translates_codec_identifiers() -> None:
+    compressor = Compressor()
+    assert compressor.codec_id(None) == Compressor.NONE and compressor.codec_name(Compressor.NONE) is None
+    assert compressor.codec_name(compressor.codec_id('zlib')) == 'zlib'
+
+def test_rejects_unknown_codecs() -> None:
+    compressor = Compressor()
+    with pytest.raises(ValueError):
+        compressor.decompress('brotli', b'')
+    with pytest.raises(ValueError):
+        compressor.decompressor('brotli')
+    with pytest.raises(ValueError):
+        compressor.codec_name(255)
@@ -28,6 +28,91 @@ def test_uses_supplied_key_and_iv_to_decode_a_different_encrypted_messages(mocke
     message = 'Different test message'
     run_decryption_test_scenario(message, mocker)
 
+def test_pads_multibyte_text_by_its_encoded_length() -> None:
+    # Encrypt a message whose length in characters differs from its length in bytes
+    key = secrets.token_bytes(32)
+    cypher = AESCypher(key)
+    message = 'Contraseña: ñandú'
+    encrypted_message = cypher.encrypt(message)
+
+    # Expect the cyphertext to be correctly padded and the message to be recovered
+    cyphertext = base64.b64decode(encrypted_message['body'])
+    iv = base64.b64decode(encrypted_message['iv'])
+    assert AES.new(key, AES.MODE_CBC, iv).decrypt(cyphertext) == pad_bytes(message.encode())
+    assert cypher.decrypt(encrypted_message['body'], encrypted_message['iv']) == message
+
+def test_encrypts_and_decrypts_raw_bytes() -> None:
+    # Encrypt a binary message several times, reusing the cypher buffers
+    cypher = AESCypher(secrets.token_bytes(32))
+    for size in [ 0, 15, 16, 1000, 10 ]:
+        message = secrets.token_bytes(size)
+        iv, cyphertext = cypher.encrypt_bytes(memoryview(message))
+        raw_cyphertext = bytes(cyphertext)
+
+        # Expect the message to be recovered
+        assert bytes(cypher.decrypt_bytes(raw_cyphertext, iv)) == message
+
+def test_encryptor_produces_same_output_as_encrypt(mocker: MockFixture) -> None:
+    chunks = [ b'Secret ', b'message split ', b'', b'in several chunks' * 10 ]
+    run_streaming_encryption_test_scenario(chunks, mocker)
+
+def test_encryptor_adds_full_padding_block_to_aligned_input(mocker: MockFixture) -> None:
+    chunks = [ b'a' * 16, b'b' * 32 ]
+    run_streaming_encryption_test_scenario(chunks, mocker)
+
+def test_encryptor_output_can_be_decrypted_in_chunks() -> None:
+    # Encrypt a message in chunks
+    key = secrets.token_bytes(32)
+    plaintext = secrets.token_bytes(1000)
+    encryptor = AESCypher(key).encryptor()
+    cyphertext = b''.join(encryptor.update(plaintext[i:i + 7]) for i in range(0, len(plaintext), 7)) + encryptor.finalize()
+
+    # Decrypt the message, feeding the cyphertext in chunks of a different size
+    decryptor = AESCypher(key).decryptor(encryptor.iv)
+    decrypted = b''.join(decryptor.update(cyphertext[i:i + 13]) for i in range(0, len(cyphertext), 13)) + decryptor.finalize()
+
+    # Expect the original message to be recovered
+    assert decrypted == plaintext
+
+def test_decryptor_produces_same_output_as_decrypt() -> None:
+    # Encrypt a message
+    key = secrets.token_bytes(32)
+    cypher = AESCypher(key)
+    encrypted_message = cypher.encrypt('Test message' * 20)
+
+    # Decrypt it in chunks
+    decryptor = cypher.decryptor(encrypted_message['iv'])
+    body = encrypted_message['body']
+    decrypted = b''.join(decryptor.update(body[i:i + 10]) for i in range(0, len(body), 10)) + decryptor.finalize()
+
+    # Expect both methods to return the same plaintext
+    assert decrypted.decode() == cypher.decrypt(encrypted_message['body'], encrypted_message['iv'])
+
+def test_decryptor_decrypts_raw_cyphertexts_in_chunks() -> None:
+    # Encrypt a message into raw bytes
+    key = secrets.token_bytes(32)
+    cypher = AESCypher(key)
+    plaintext = secrets.token_bytes(1000)
+    iv, cyphertext = cypher.encrypt_bytes(plaintext)
+    cyphertext = bytes(cyphertext)
+
+    # Decrypt it in chunks without decoding it
+    decryptor = cypher.decryptor(iv, encoded = False)
+    decrypted = b''.join(decryptor.update(cyphertext[i:i + 7]) for i in range(0, len(cyphertext), 7)) + decryptor.finalize()
+    assert decrypted == plaintext
+
+def test_decryptor_rejects_invalid_padding() -> None:
+    # Encrypt a message without padding
+    key = secrets.token_bytes(32)
+    iv = secrets.token_bytes(16)
+    cyphertext = base64.b64encode(AES.new(key, AES.MODE_CBC, iv).encrypt(b'a' * 32))
+
+    # Expect the decryptor to reject it
+    decryptor = AESCypher(key).decryptor(base64.b64encode(iv))
+    decryptor.update(cyphertext)
+    with pytest.raises(ValueError):
+        decryptor.finalize()
+
 ################################################################################
 #                                                                              #
 # Test scenarios to avoid test-case code duplication                           #
@@ -65,7 +150,24 @@ def run_decryption_test_scenario(plaintext: str, mocker: MockFixture) -> None:
 
     # Expect the decrypted message to match the one returned by the cypher
     assert cypher.decrypt(encrypted_message['body'], encrypted_message['iv']) == decrypted_message
-    
+
+def run_streaming_encryption_test_scenario(chunks: list[bytes], mocker: MockFixture) -> None:
+    # Initialize variables
+    key = secrets.token_bytes(32)
+    iv = secrets.token_bytes(16)
+    plaintext = b''.join(chunks)
+    encrypted_message = base64.b64encode(AES.new(key, AES.MODE_CBC, iv).encrypt(pad_bytes(plaintext))).decode()
+
+    # Mock secrets.token_bytes to return the same iv
+    mocker.patch('secrets.token_bytes')
+    secrets.token_bytes.return_value = iv
+
+    # Encrypt the message one chunk at a time
+    encryptor = AESCypher(key).encryptor()
+    output = b''.join(encryptor.update(chunk) for chunk in chunks) + encryptor.finalize()
+
+    # Expect the encryptor to produce the same encrypted message and iv
+    assert output.decode() == encrypted_message and encryptor.iv == base64.b64encode(iv).decode()
 
 ################################################################################
 #                                                                              #
@@ -83,6 +185,9 @@ def pad(plaintext: str) -> str:
     # Adds PKCS#7 padding -> k - (l mod k) octects with value k - (l mod k)
     return plaintext + (16 - len(plaintext) % 16) * chr(16 - len(plaintext) % 16)
 
+def pad_bytes(plaintext: bytes) -> bytes:
+    return plaintext + (16 - len(plaintext) % 16) * bytes([16 - len(plaintext) % 16])
+
 def decrypt(cyphertext: bytes, key: bytes, iv: bytes) -> str:
     cypher = AES.new(key, AES.MODE_CBC, iv)
     padded_plaintext = cypher.decrypt(cyphertext).decode()
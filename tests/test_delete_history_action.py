@@ -13,8 +13,8 @@ from pyfakefs.fake_filesystem import FakeFilesystem
 ################################################################################
 
 @pytest.fixture
-def history_service() -> HistoryService:
-    # Return a history service instance
+def history_service(fs: FakeFilesystem) -> HistoryService:
+    # Return a history service instance, using the fake filesystem
     yield HistoryService()
 
     # Reset the history service
@@ -62,5 +62,6 @@ def test_deletes_history_file(history_service: HistoryService, fs: FakeFilesyste
 ################################################################################
 
 def reset_history_service() -> None:
-    # Destroy the created instance to reset state
+    # Save the pending commands and destroy the created instance to reset state
+    HistoryService().close()
     delattr(HistoryService, 'instance')
@@ -5,9 +5,11 @@ from client.http_service import HTTPService
 import pytest
 import pytest_mock
 import os
+import json
 from pyfakefs.fake_filesystem import FakeFilesystem
 from base64 import b64encode
 from unittest.mock import MagicMock
+from typing import Any
 
 
 ################################################################################
@@ -20,6 +22,7 @@ from unittest.mock import MagicMock
 def http_service(mocker: pytest_mock.MockFixture) -> MagicMock:
     # Change the HTTPService instance for a mocked version
     mocked_service = MagicMock()
+    mocked_service.raw_content = False
     setattr(HTTPService, 'instance', mocked_service)
 
     yield mocked_service
@@ -77,6 +80,132 @@ def test_only_includes_basename_when_creating_binary_file(http_service: MagicMoc
     content = b'Sample binary content'
     run_uses_basename_to_create_file_test_scenario(path, content, True, http_service)
 
+def test_writes_raw_contents_if_the_protocol_returns_them(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    # Return the raw file contents
+    content = b'\x00\x01Sample binary content'
+    http_service.send_request.return_value = { 'output': content, 'eof': True }
+
+    # Call the action
+    action = DownloadFileAction()
+    action.run({ 'filename': 'test.bin', 'binary': True })
+
+    # Expect the contents to have been written as they are
+    with open('test.bin', 'rb') as f:
+        assert content == f.read()
+
+def test_downloads_text_file_in_ranges(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    filename = 'big_file.txt'
+    content = 'Sample content that spans several ranges'
+    run_downloads_file_in_ranges_test_scenario(filename, content.encode(), False, http_service)
+
+def test_downloads_binary_file_in_ranges(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    filename = 'big_file.bin'
+    content = b'\x00\x01Sample binary content that spans several ranges\xff'
+    run_downloads_file_in_ranges_test_scenario(filename, content, True, http_service)
+
+def test_keeps_a_checkpoint_if_the_download_is_interrupted(http_service: MagicMock, fs: FakeFilesystem, mocker: pytest_mock.MockFixture) -> None:
+    # Serve the first range and then fail
+    mocker.patch.object(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 8)
+    mocker.patch.object(DownloadFileAction, 'MIN_CHUNK_SIZE', 8)
+    mocker.patch.object(DownloadFileAction, 'MAX_CHUNK_SIZE', 8)
+    content = b'0123456789abcdef'
+    serve_ranges(http_service, content, fail_at = 8)
+
+    # Run the action, expecting it to fail
+    action = DownloadFileAction()
+    with pytest.raises(Exception):
+        action.run({ 'filename': 'test.bin', 'binary': True })
+
+    # Expect the first range to have been saved alongside a checkpoint
+    with open('test.bin.part', 'rb') as f:
+        assert f.read() == content[:8]
+    with open('test.bin.part.json', 'r') as f:
+        assert json.load(f)['offset'] == 8
+
+def test_resumes_interrupted_download_from_checkpoint(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    # Create an interrupted download
+    content = b'0123456789abcdef'
+    with open('test.bin.part', 'wb') as f:
+        f.write(content[:8])
+    with open('test.bin.part.json', 'w') as f:
+        json.dump({ 'filename': '/tmp/test.bin', 'binary': True, 'offset': 8, 'chunk_size': 8 }, f)
+    serve_ranges(http_service, content)
+
+    # Run the action
+    action = DownloadFileAction()
+    action.run({ 'filename': '/tmp/test.bin', 'binary': True })
+
+    # Expect only the missing range to have been requested
+    first_request = http_service.send_request.call_args_list[0].args[0]
+    assert first_request['args']['offset'] == 8
+
+    # Expect the file to be complete and the partial download to have been cleaned up
+    with open('test.bin', 'rb') as f:
+        assert f.read() == content
+    assert not os.path.exists('test.bin.part') and not os.path.exists('test.bin.part.json')
+
+def test_ignores_checkpoint_of_a_different_file(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    # Create an interrupted download of a different remote file
+    content = b'0123456789abcdef'
+    with open('test.bin.part', 'wb') as f:
+        f.write(b'other fi')
+    with open('test.bin.part.json', 'w') as f:
+        json.dump({ 'filename': '/opt/test.bin', 'binary': True, 'offset': 8, 'chunk_size': 8 }, f)
+    serve_ranges(http_service, content)
+
+    # Run the action
+    action = DownloadFileAction()
+    action.run({ 'filename': '/tmp/test.bin', 'binary': True })
+
+    # Expect the whole file to have been downloaded again
+    with open('test.bin', 'rb') as f:
+        assert f.read() == content
+
+def test_grows_chunk_size_on_fast_links(http_service: MagicMock, fs: FakeFilesystem, mocker: pytest_mock.MockFixture) -> None:
+    # Serve a file where each request takes a constant, short time
+    mocker.patch.object(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 1024)
+    mocker.patch.object(DownloadFileAction, 'MIN_CHUNK_SIZE', 1024)
+    mocker.patch('time.perf_counter', side_effect = [ i * 0.01 for i in range(100) ])
+    serve_ranges(http_service, b'a' * 64 * 1024)
+
+    # Run the action
+    action = DownloadFileAction()
+    action.run({ 'filename': 'test.bin', 'binary': True })
+
+    # Expect each range to be bigger than the previous one
+    lengths = [ c.args[0]['args']['length'] for c in http_service.send_request.call_args_list ]
+    assert len(lengths) > 1 and all(a < b for a, b in zip(lengths, lengths[1:]))
+
+def test_downloads_measure_their_own_link_speed(http_service: MagicMock, fs: FakeFilesystem, mocker: pytest_mock.MockFixture) -> None:
+    # Serve a file over a slow link, and another one whose requests take no time
+    mocker.patch.object(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 1024)
+    mocker.patch.object(DownloadFileAction, 'MIN_CHUNK_SIZE', 1024)
+    clock = [ 0.0 ]
+    mocker.patch('time.perf_counter', side_effect = lambda: clock[0])
+    serve_ranges(http_service, b'a' * 64 * 1024)
+    serve_slow_range = http_service.send_request.side_effect
+    serve_ranges(http_service, b'b' * 64 * 1024)
+    serve_fast_range = http_service.send_request.side_effect
+
+    # Download the slow file alone, and then while downloading the fast one with the same action
+    action = DownloadFileAction()
+    def send_request(request: dict[str, Any], concurrent: bool) -> dict[str, Any]:
+        if request['args']['filename'] == 'fast.bin':
+            return serve_fast_range(request)
+        if concurrent and request['args']['offset'] == 1024:
+            action.run({ 'filename': 'fast.bin', 'binary': True })
+        clock[0] += 0.1 + request['args']['length'] / 1024
+        return serve_slow_range(request)
+    lengths = []
+    for concurrent in [ False, True ]:
+        http_service.send_request.reset_mock()
+        http_service.send_request.side_effect = lambda request: send_request(request, concurrent)
+        action.run({ 'filename': 'slow.bin', 'binary': True })
+        lengths.append([ c.args[0]['args']['length'] for c in http_service.send_request.call_args_list if c.args[0]['args']['filename'] == 'slow.bin' ])
+
+    # Expect the fast download not to have changed the ranges of the slow one
+    assert len(lengths[0]) > 2 and lengths[1] == lengths[0]
+
 ################################################################################
 #                                                                              #
 # Test scenarios to avoid test-case code duplication                           #
@@ -89,7 +218,9 @@ def run_requests_file_test_scenario(filename: str, binary: bool, http_service: M
         'action': 'download_file',
         'args': {
             'filename': filename,
-            'binary': binary
+            'binary': binary,
+            'offset': 0,
+            'length': DownloadFileAction.INITIAL_CHUNK_SIZE
         }
     }
     create_response(http_service)
@@ -138,6 +269,25 @@ def run_uses_basename_to_create_file_test_scenario(path: str, content: str | byt
         assert content == f.read()
 
 
+def run_downloads_file_in_ranges_test_scenario(filename: str, content: bytes, binary: bool, http_service: MagicMock) -> None:
+    serve_ranges(http_service, content)
+
+    # Call the action with a small chunk size
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 8)
+        monkeypatch.setattr(DownloadFileAction, 'MIN_CHUNK_SIZE', 8)
+        monkeypatch.setattr(DownloadFileAction, 'MAX_CHUNK_SIZE', 8)
+        action = DownloadFileAction()
+        action.run({ 'filename': filename, 'binary': binary })
+
+    # Expect consecutive ranges to have been requested
+    offsets = [ c.args[0]['args']['offset'] for c in http_service.send_request.call_args_list ]
+    assert offsets == list(range(0, len(content), 8))
+
+    # Expect the file to have been created with the correct contents
+    with open(filename, 'rb') as f:
+        assert content == f.read()
+
 ################################################################################
 #                                                                              #
 # Helper functions                                                             #
@@ -152,3 +302,17 @@ def create_response(http_service: MagicMock, content: str | bytes = '') -> None:
     }
     http_service.send_request.return_value = response
 
+
+def serve_ranges(http_service: MagicMock, content: bytes, fail_at: int = -1) -> None:
+    # Configure the mocked service to answer ranged requests like a shell supporting them
+    def send_request(request: dict[str, Any]) -> dict[str, Any]:
+        offset = request['args']['offset']
+        if offset == fail_at:
+            raise ConnectionError('Connection lost')
+
+        chunk = content[offset:offset + request['args']['length']]
+        return {
+            'output': b64encode(chunk).decode(),
+            'eof': offset + len(chunk) >= len(content)
+        }
+    http_service.send_request.side_effect = send_request
@@ -0,0 +1,264 @@
+from client.http_service import HTTPService
+from client.history_service import HistoryService
+from client.execute_command_action import ExecuteCommandAction
+from client.execute_batch_action import ExecuteBatchAction
+from client.upload_file_action import UploadFileAction
+from client.download_file_action import DownloadFileAction
+from client.job_service import JobService
+from tests.webshell_server import WebshellServer
+
+import pytest
+import os
+import requests
+import secrets
+import threading
+import time
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture(params = [ HTTPService.JSON_PROTOCOL, HTTPService.BINARY_PROTOCOL ])
+def http_service(webshell_server: WebshellServer, request: pytest.FixtureRequest) -> HTTPService:
+    # Connect the HTTPService to the local webshell using each protocol
+    http_service = HTTPService()
+    http_service.initialize(webshell_server.url, webshell_server.key, webshell_server.nonce, request.param)
+
+    yield http_service
+
+    # Restore the HTTPService instance to an uninitialized state
+    delattr(HTTPService, 'instance')
+
+@pytest.fixture
+def local_dir(tmp_path, monkeypatch: pytest.MonkeyPatch) -> str:
+    # Run the client from an empty directory, with a fresh history
+    local_dir = tmp_path / 'client'
+    local_dir.mkdir()
+    monkeypatch.chdir(local_dir)
+
+    yield str(local_dir)
+
+    if hasattr(HistoryService, 'instance'):
+        HistoryService().close()
+        delattr(HistoryService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_executes_commands_rotating_the_nonce(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Run several commands
+    action = ExecuteCommandAction()
+    outputs = [ action.run({ 'cmd': f'echo {i}' }) for i in range(3) ]
+
+    # Expect each command to have been run with a different nonce
+    assert outputs == [ '0\n', '1\n', '2\n' ]
+    nonces = [ request['nonce'] for request in webshell_server.requests ]
+    assert nonces[0] == webshell_server.initial_nonce and len(set(nonces)) == 3
+
+def test_negotiates_compression_of_big_outputs(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Run a command with a big output
+    action = ExecuteCommandAction()
+    output = action.run({ 'cmd': 'seq 1 10000' })
+
+    # Expect the output to be complete and compression to have been negotiated
+    assert output == ''.join(f'{i}\n' for i in range(1, 10001))
+    assert http_service._HTTPService__compression == 'zlib'
+
+def test_streams_big_outputs_to_a_sink(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Run commands with big outputs, the second one once compression has been negotiated
+    for _ in range(2):
+        pieces = []
+        ExecuteCommandAction().run({ 'cmd': 'seq 1 100000', 'sink': pieces.append })
+
+        # Expect the output to have arrived in pieces, keeping the nonce chain
+        assert ''.join(pieces) == ''.join(f'{i}\n' for i in range(1, 100001)) and len(pieces) > 1
+    assert ExecuteCommandAction().run({ 'cmd': 'echo done' }) == 'done\n'
+
+def test_saves_redirected_outputs_to_a_local_file(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    assert ExecuteCommandAction().run({ 'cmd': 'seq 1 100000', 'output_file': 'seq.txt' }) == 'Output saved to seq.txt'
+    with open('seq.txt', 'r') as f:
+        assert f.read() == ''.join(f'{i}\n' for i in range(1, 100001))
+
+def test_uploads_and_downloads_binary_file(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Upload a file
+    content = secrets.token_bytes(10000)
+    with open('payload.bin', 'wb') as f:
+        f.write(content)
+    UploadFileAction().run({ 'filename': 'payload.bin', 'binary': True })
+
+    # Expect the file to have been created on the server
+    with open(os.path.join(webshell_server.root, 'payload.bin'), 'rb') as f:
+        assert f.read() == content
+
+    # Download it again and expect the contents to match
+    os.remove('payload.bin')
+    DownloadFileAction().run({ 'filename': '/payload.bin', 'binary': True })
+    with open('payload.bin', 'rb') as f:
+        assert f.read() == content
+
+def test_transfers_big_files_in_chunks(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Shrink the chunk sizes
+    monkeypatch.setattr(UploadFileAction, 'CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MAX_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MIN_CHUNK_SIZE', 4096)
+
+    # Upload and download a text file spanning several chunks
+    content = ''.join(f'line {i}\n' for i in range(5000))
+    with open('big.txt', 'w') as f:
+        f.write(content)
+    UploadFileAction().run({ 'filename': 'big.txt', 'binary': False })
+    os.remove('big.txt')
+    DownloadFileAction().run({ 'filename': 'big.txt', 'binary': False })
+
+    # Expect several requests to have been needed, and the file to be intact
+    assert len([ r for r in webshell_server.requests if r['action'] == 'upload_file' ]) > 1
+    assert len([ r for r in webshell_server.requests if r['action'] == 'download_file' ]) > 1
+    with open('big.txt', 'r') as f:
+        assert f.read() == content
+
+def test_uploads_whole_file_to_shells_without_chunk_support(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Disable chunked uploads, and shrink the chunk size
+    webshell_server.chunked_upload = False
+    monkeypatch.setattr(UploadFileAction, 'CHUNK_SIZE', 4096)
+
+    # Upload a file spanning several chunks
+    content = secrets.token_bytes(20000)
+    with open('file.bin', 'wb') as f:
+        f.write(content)
+    UploadFileAction().run({ 'filename': 'file.bin', 'binary': True })
+
+    # Expect the whole file to have been sent again after the first chunk, and to be intact
+    assert len([ r for r in webshell_server.requests if r['action'] == 'upload_file' ]) == 2
+    with open(os.path.join(webshell_server.root, 'file.bin'), 'rb') as f:
+        assert f.read() == content
+
+def test_downloads_whole_file_from_shells_without_ranges(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Disable ranges and create a remote file
+    webshell_server.ranges = False
+    content = secrets.token_bytes(5000)
+    with open(os.path.join(webshell_server.root, 'file.bin'), 'wb') as f:
+        f.write(content)
+
+    # Download it and expect the contents to match
+    DownloadFileAction().run({ 'filename': 'file.bin', 'binary': True })
+    with open('file.bin', 'rb') as f:
+        assert f.read() == content
+
+def test_simulates_link_latency(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Add latency to the link
+    webshell_server.latency = 0.05
+
+    # Expect each request to take at least the configured latency
+    start = time.perf_counter()
+    ExecuteCommandAction().run({ 'cmd': 'true' })
+    assert time.perf_counter() - start >= 0.05
+
+def test_runs_background_jobs_alongside_other_commands(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Download a file in several chunks in the background while running commands
+    monkeypatch.setattr(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MAX_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MIN_CHUNK_SIZE', 4096)
+    content = secrets.token_bytes(50000)
+    with open(os.path.join(webshell_server.root, 'file.bin'), 'wb') as f:
+        f.write(content)
+    job_id = JobService().submit('!binget file.bin', DownloadFileAction().run, { 'filename': 'file.bin', 'binary': True })
+    outputs = [ ExecuteCommandAction().run({ 'cmd': f'echo {i}' }) for i in range(5) ]
+
+    # Expect every request to have kept the nonce chain, and the file to be intact
+    JobService().wait(job_id)
+    assert outputs == [ f'{i}\n' for i in range(5) ]
+    with open('file.bin', 'rb') as f:
+        assert f.read() == content
+    assert len(webshell_server.requests) == len(set(request['nonce'] for request in webshell_server.requests))
+    delattr(JobService, 'instance')
+
+def test_runs_batches_in_a_single_request(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Run a batch of commands
+    cmds = [ f'echo {i}' for i in range(10) ]
+    outputs = list(ExecuteBatchAction().execute(cmds))
+
+    # Expect the first command to have been sent alone, and the rest in a single request
+    assert outputs == [ [ '0\n' ], [ f'{i}\n' for i in range(1, 10) ] ]
+    assert [ request['action'] for request in webshell_server.requests ] == [ 'execute_command', 'execute_batch' ]
+
+def test_runs_batches_one_command_at_a_time_without_batch_support(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Disable batches and run a batch of commands
+    webshell_server.batch = False
+    outputs = list(ExecuteBatchAction().execute([ 'echo 1', 'echo 2', 'echo 3' ]))
+
+    # Expect a request per command
+    assert outputs == [ [ '1\n' ], [ '2\n' ], [ '3\n' ] ]
+    assert [ request['action'] for request in webshell_server.requests ] == [ 'execute_command' ] * 3
+
+def test_resyncs_the_nonce_after_losing_a_response(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Lose the response of a command, which the server has already run
+    webshell_server.drop_responses = 1
+    with pytest.raises(requests.ConnectionError):
+        ExecuteCommandAction().run({ 'cmd': 'echo 1' })
+
+    # Expect the next command to be rejected, and sent again after resyncing the nonce
+    assert ExecuteCommandAction().run({ 'cmd': 'echo 2' }) == '2\n'
+    assert [ request['action'] for request in webshell_server.requests ] == [ 'execute_command', 'execute_command', 'resync', 'execute_command' ]
+
+def test_retries_transfers_after_losing_a_response(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Download a file in several chunks, losing the response of one of them
+    monkeypatch.setattr(HTTPService, 'RETRY_BACKOFF', 0)
+    monkeypatch.setattr(DownloadFileAction, 'INITIAL_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MAX_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(DownloadFileAction, 'MIN_CHUNK_SIZE', 4096)
+    content = secrets.token_bytes(20000)
+    with open(os.path.join(webshell_server.root, 'file.bin'), 'wb') as f:
+        f.write(content)
+    webshell_server.drop_responses = 1
+    DownloadFileAction().run({ 'filename': 'file.bin', 'binary': True })
+
+    # Expect the chunk to have been requested again, and the file to be intact
+    assert 'resync' in [ request['action'] for request in webshell_server.requests ]
+    with open('file.bin', 'rb') as f:
+        assert f.read() == content
+
+def test_pipelines_requests_with_a_window_of_nonces(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Use a window of nonces on a slow link
+    http_service.initialize(webshell_server.url, webshell_server.key, webshell_server.nonce, http_service._HTTPService__protocol, 4)
+    webshell_server.latency = 0.05
+    run_concurrent_commands(8)
+
+    # Expect several requests to have been in flight at once, each one with a different nonce
+    assert webshell_server.max_in_flight > 1
+    assert len(set(request['nonce'] for request in webshell_server.requests)) == 8
+
+def test_sends_one_request_at_a_time_to_shells_without_nonce_windows(http_service: HTTPService, webshell_server: WebshellServer, local_dir: str) -> None:
+    # Request a window of nonces from a shell not supporting it
+    http_service.initialize(webshell_server.url, webshell_server.key, webshell_server.nonce, http_service._HTTPService__protocol, 4)
+    webshell_server.window = False
+    run_concurrent_commands(4)
+
+    # Expect the requests to have been sent one at a time
+    assert webshell_server.max_in_flight == 1
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def run_concurrent_commands(count: int) -> None:
+    # Run commands from several threads and expect each one to get its own output. The history is
+    # set up beforehand, as the client does
+    HistoryService()
+    outputs = [ None ] * count
+    def run(i: int) -> None:
+        outputs[i] = ExecuteCommandAction().run({ 'cmd': f'echo {i}' })
+    threads = [ threading.Thread(target = run, args = (i,)) for i in range(count) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outputs == [ f'{i}\n' for i in range(count) ]
@@ -0,0 +1,117 @@
+from client.action import Action
+from client.execute_batch_action import ExecuteBatchAction
+from client.history_service import HistoryService
+from client.http_service import HTTPService
+
+import pytest
+from typing import Any
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def http_service() -> MagicMock:
+    # Mock HTTPService to return a mock instance answering to commands and batches
+    http_service = MagicMock()
+    http_service.send_request.side_effect = send_request
+    setattr(HTTPService, 'instance', http_service)
+
+    yield http_service
+
+    # Revert mock
+    delattr(HTTPService, 'instance')
+
+@pytest.fixture
+def history_service() -> MagicMock:
+    # Mock history_service to return a mock instance
+    history_service = MagicMock()
+    setattr(HistoryService, 'instance', history_service)
+
+    yield history_service
+
+    # Revert mock
+    delattr(HistoryService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_action() -> None:
+    assert issubclass(ExecuteBatchAction, Action)
+
+def test_sends_commands_in_a_single_request_if_supported(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = True
+    outputs = list(ExecuteBatchAction().execute([ 'id', 'pwd', 'whoami' ]))
+
+    # Expect a single request, and the output of each command
+    http_service.send_request.assert_called_once_with({ 'action': 'execute_batch', 'args': { 'cmds': [ 'id', 'pwd', 'whoami' ] } })
+    http_service.supports.assert_called_with('batch')
+    assert outputs == [ [ 'output of id', 'output of pwd', 'output of whoami' ] ]
+
+def test_sends_commands_one_at_a_time_if_not_supported(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = False
+    outputs = list(ExecuteBatchAction().execute([ 'id', 'pwd' ]))
+
+    # Expect a request per command
+    assert [ c.args[0] for c in http_service.send_request.call_args_list ] == [
+        { 'action': 'execute_command', 'args': { 'cmd': 'id' } },
+        { 'action': 'execute_command', 'args': { 'cmd': 'pwd' } }
+    ]
+    assert outputs == [ [ 'output of id' ], [ 'output of pwd' ] ]
+
+def test_starts_batching_once_the_shell_advertises_support(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.side_effect = [ False, True ]
+    outputs = list(ExecuteBatchAction().execute([ 'id', 'pwd', 'whoami' ]))
+
+    assert [ c.args[0]['action'] for c in http_service.send_request.call_args_list ] == [ 'execute_command', 'execute_batch' ]
+    assert outputs == [ [ 'output of id' ], [ 'output of pwd', 'output of whoami' ] ]
+
+def test_splits_big_batches(http_service: MagicMock, history_service: MagicMock, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(ExecuteBatchAction, 'MAX_BATCH_SIZE', 2)
+    http_service.supports.return_value = True
+    outputs = list(ExecuteBatchAction().execute([ f'echo {i}' for i in range(5) ]))
+
+    # Expect two full batches and a lone command
+    assert [ c.args[0]['action'] for c in http_service.send_request.call_args_list ] == [ 'execute_batch', 'execute_batch', 'execute_command' ]
+    assert outputs == [ [ 'output of echo 0', 'output of echo 1' ], [ 'output of echo 2', 'output of echo 3' ], [ 'output of echo 4' ] ]
+
+def test_logs_each_command(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = True
+    list(ExecuteBatchAction().execute([ 'id', 'pwd' ]))
+
+    assert [ c.args[0] for c in history_service.add_command.call_args_list ] == [ 'id', 'pwd' ]
+    assert history_service.record_result.call_count == 2
+
+def test_fails_if_outputs_are_missing(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = True
+    http_service.send_request.side_effect = lambda request: { 'outputs': [ 'uid=33' ] }
+    with pytest.raises(ValueError):
+        list(ExecuteBatchAction().execute([ 'id', 'pwd' ]))
+
+def test_yields_the_outputs_of_each_request_before_sending_the_next_one(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = False
+    outputs = ExecuteBatchAction().execute([ 'id', 'pwd' ])
+
+    assert next(outputs) == [ 'output of id' ] and http_service.send_request.call_count == 1
+
+def test_shows_each_command_followed_by_its_output(http_service: MagicMock, history_service: MagicMock) -> None:
+    http_service.supports.return_value = True
+    output = ExecuteBatchAction().run({ 'cmds': [ 'id', 'pwd' ] })
+    assert output == '$ id\noutput of id\n$ pwd\noutput of pwd'
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def send_request(request: dict[str, Any]) -> dict[str, Any]:
+    if request['action'] == 'execute_batch':
+        return { 'outputs': [ f'output of {cmd}' for cmd in request['args']['cmds'] ] }
+    return { 'output': f"output of {request['args']['cmd']}" }
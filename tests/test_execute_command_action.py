@@ -3,6 +3,8 @@ from client.execute_command_action import ExecuteCommandAction
 from client.history_service import HistoryService
 from client.http_service import HTTPService
 
+from typing import Callable
+
 import pytest
 from unittest.mock import MagicMock
 
@@ -68,6 +70,44 @@ def test_logs_different_requested_command(http_service: MagicMock, history_servi
     cmd = 'pwd'
     run_logs_command_test_scenario(cmd, history_service)
 
+def test_records_command_result(http_service: MagicMock, history_service: MagicMock) -> None:
+    # Run a command
+    history_service.add_command.return_value = 7
+    http_service.send_request.return_value = { 'output': 'www-data' }
+    ExecuteCommandAction().run({ 'cmd': 'whoami' })
+
+    # Expect its duration and output size to have been saved to the history
+    entry, duration, output_size = history_service.record_result.call_args.args
+    assert entry == 7 and duration >= 0 and output_size == len('www-data')
+
+def test_saves_redirected_output_to_the_file(http_service: MagicMock, history_service: MagicMock, fs) -> None:
+    # Stream the output of a command redirected to a file
+    def send_request(request: dict, sink: Callable[[str], None]) -> dict:
+        sink('root:x:0:0\\n')
+        sink('www-data:x:33:33\\n')
+        return {}
+    http_service.send_request.side_effect = send_request
+    output = ExecuteCommandAction().run({ 'cmd': 'cat /etc/passwd', 'output_file': 'passwd.txt' })
+
+    # Expect the file to hold the output, and a message to be returned instead
+    assert output == 'Output saved to passwd.txt'
+    with open('passwd.txt', 'r') as f:
+        assert f.read() == 'root:x:0:0\nwww-data:x:33:33\n'
+
+def test_streams_output_to_the_sink(http_service: MagicMock, history_service: MagicMock) -> None:
+    # Pass the output to the sink in two pieces
+    def send_request(request: dict, sink: Callable[[str], None]) -> dict:
+        sink('www-')
+        sink('data')
+        return {}
+    http_service.send_request.side_effect = send_request
+    pieces = []
+    output = ExecuteCommandAction().run({ 'cmd': 'whoami', 'sink': pieces.append })
+
+    # Expect the pieces to have reached the sink, and their size to have been saved to the history
+    assert output == '' and pieces == [ 'www-', 'data' ]
+    assert history_service.record_result.call_args.args[2] == len('www-data')
+
 
 ################################################################################
 #                                                                              #
@@ -0,0 +1,37 @@
+from client.action import Action
+from client.foreground_job_action import ForegroundJobAction
+from client.job_service import JobService
+
+import pytest
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def job_service() -> MagicMock:
+    # Mock JobService to return a mock instance
+    job_service = MagicMock()
+    setattr(JobService, 'instance', job_service)
+
+    yield job_service
+
+    # Revert mock
+    delattr(JobService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_an_action() -> None:
+    assert issubclass(ForegroundJobAction, Action)
+
+def test_returns_the_output_of_the_job(job_service: MagicMock) -> None:
+    job_service.wait.return_value = '/var/www/html/index.php'
+    assert ForegroundJobAction().run({ 'id': 2 }) == '/var/www/html/index.php'
+    job_service.wait.assert_called_once_with(2)
@@ -0,0 +1,104 @@
+from client.history_database import HistoryDatabase
+
+import pytest
+import sqlite3
+from multiprocessing import Process
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def database(tmp_path) -> HistoryDatabase:
+    # Return a database in a temporary directory
+    database = HistoryDatabase(str(tmp_path / 'history.db'))
+    yield database
+    database.close()
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_saves_commands_in_order(database: HistoryDatabase) -> None:
+    for cmd in [ 'whoami', 'id', 'pwd' ]:
+        database.add(cmd)
+    assert database.commands() == [ 'whoami', 'id', 'pwd' ]
+    assert database.last() == 'pwd' and len(database) == 3
+
+def test_returns_latest_command_with_prefix(database: HistoryDatabase) -> None:
+    for cmd in [ 'ls -l', 'cat flag.txt', 'ls -la', 'cd /tmp', 'ls%' ]:
+        database.add(cmd)
+    assert database.latest('ls -') == 'ls -la'
+    assert database.latest('c') == 'cd /tmp'
+    assert database.latest('ls%') == 'ls%'
+    assert database.latest('x') is None
+
+def test_uses_full_text_index() -> None:
+    # The index is only created when SQLite is built with FTS5
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute("CREATE VIRTUAL TABLE test USING fts5(cmd, tokenize = 'trigram')")
+    except sqlite3.OperationalError:
+        pytest.skip('SQLite was built without FTS5')
+
+    database = HistoryDatabase(':memory:')
+    assert database.full_text
+
+def test_searches_fragments(database: HistoryDatabase) -> None:
+    for cmd in [ 'cat /etc/passwd', 'id', 'grep root /etc/passwd', 'cat /etc/PASSWD', 'echo "passwd"' ]:
+        database.add(cmd)
+
+    # Expect the matching commands, from newest to oldest
+    assert [ entry['cmd'] for entry in database.search('passwd') ] == [ 'echo "passwd"', 'grep root /etc/passwd', 'cat /etc/passwd' ]
+    assert [ entry['cmd'] for entry in database.search('"pass') ] == [ 'echo "passwd"' ]
+    assert [ entry['cmd'] for entry in database.search('passwd', 1) ] == [ 'echo "passwd"' ]
+    assert [ entry['cmd'] for entry in database.search('id') ] == [ 'id' ]
+    assert database.search('shadow') == []
+
+def test_records_command_results(database: HistoryDatabase) -> None:
+    entry = database.add('id', 1700000000.0)
+    database.record_result(entry, 0.25, 42)
+    assert database.search('id') == [ { 'cmd': 'id', 'timestamp': 1700000000.0, 'duration': 0.25, 'output_size': 42 } ]
+
+def test_trims_oldest_commands(database: HistoryDatabase) -> None:
+    database.add_many([ 'whoami', 'id', 'pwd' ])
+    database.trim(2)
+    assert database.commands() == [ 'id', 'pwd' ]
+    assert database.search('who') == []
+
+def test_clear_empties_the_database(database: HistoryDatabase) -> None:
+    database.add_many([ 'whoami', 'id' ])
+    database.clear()
+    assert database.commands() == [] and database.search('who') == []
+
+def test_several_processes_can_write_at_once(tmp_path) -> None:
+    # Add commands from several processes to the same database
+    path = str(tmp_path / 'history.db')
+    HistoryDatabase(path).close()
+    processes = [ Process(target = add_commands, args = (path, f'echo {i}', 50)) for i in range(4) ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # Expect every command to have been saved
+    database = HistoryDatabase(path)
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(database) == 200
+    assert len(database.search('echo 3')) == 50
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def add_commands(path: str, cmd: str, count: int) -> None:
+    database = HistoryDatabase(path)
+    for _ in range(count):
+        database.add(cmd)
+    database.close()
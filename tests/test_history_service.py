@@ -3,6 +3,10 @@ from client.singleton import Singleton
 
 import pytest
 import os
+import threading
+import time
+from typing import Any
+from pytest_mock import MockFixture
 from pyfakefs.fake_filesystem import FakeFilesystem
 
 ################################################################################
@@ -12,8 +16,8 @@ from pyfakefs.fake_filesystem import FakeFilesystem
 ################################################################################
 
 @pytest.fixture
-def history_service() -> HistoryService:
-    # Return a history service instance
+def history_service(fs: FakeFilesystem) -> HistoryService:
+    # Return a history service instance, using the fake filesystem
     yield HistoryService()
 
     # Reset the history service
@@ -64,6 +68,182 @@ def test_search_history_filters_output_to_commands_matching_different_query(hist
     search_cmd = 'ls' 
     run_search_history_test_scenario(history_service, cmds, search_cmd)
 
+def test_is_loaded_only_once(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Add a command and modify the history file behind the service's back
+    history_service.add_command('id')
+    history_service.flush()
+    os.remove('./.webshell_history')
+
+    # Expect new references to the singleton to keep the history in memory
+    assert HistoryService().get_history() == [ 'id' ]
+
+def test_search_latest_returns_most_recent_match(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    cmds = [ 'cat /etc/passwd', 'cd /home/web-admin', 'ls -l', 'cat flag.txt', 'ls -la' ]
+    run_search_latest_test_scenario(history_service, cmds, [ 'cat', 'c', 'cd', 'ls -l', 'ls -la', 'l', '' ])
+
+def test_search_latest_includes_commands_loaded_from_disk(fs: FakeFilesystem) -> None:
+    # Save a history and load it
+    with open('./.webshell_history', 'w') as f:
+        f.writelines([ 'whoami\n', 'id\n', 'ls -l\n' ])
+    history_service = HistoryService()
+
+    # Add a command after building the index
+    assert history_service.search_latest('i') == 'id'
+    history_service.add_command('ifconfig')
+
+    # Expect both loaded and added commands to be found
+    assert history_service.search_latest('i') == 'ifconfig' and history_service.search_latest('w') == 'whoami'
+
+    reset_history_service()
+
+def test_search_latest_returns_none_if_nothing_matches(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    assert history_service.search_latest('whoami') is None
+
+def test_search_latest_supports_long_prefixes(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    base = 'a' * 100
+    cmds = [ base + 'one', base + 'two', base + 'one more', base ]
+    run_search_latest_test_scenario(history_service, cmds, [ base + 'one', base + 'tw', base + 'three', base, 'a' ])
+
+def test_search_latest_forgets_deleted_history(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    history_service.search_latest('i')
+    history_service.delete_history()
+    assert history_service.search_latest('i') is None
+
+def test_loads_only_the_tail_of_the_history_when_first_used(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Save a history longer than the loaded tail
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 3)
+    saved_history = [ f'echo {i}' for i in range(10) ]
+    write_history_file(saved_history)
+
+    # Expect nothing to be loaded at startup, only the tail to be loaded when the history is first
+    # used, and the rest to be loaded when the full history is requested
+    history_service = HistoryService()
+    assert len(history_service._HistoryService__history) == 0
+    assert history_service.search_latest('echo 9') == 'echo 9'
+    assert history_service._HistoryService__history.to_list() == saved_history[-3:]
+    assert history_service.get_history() == saved_history
+
+    reset_history_service()
+
+def test_pages_in_older_commands_when_searching(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Save a history several pages long
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 2)
+    mocker.patch.object(HistoryService, 'PAGE_LINES', 2)
+    mocker.patch.object(HistoryService, 'BLOCK_SIZE', 8)
+    saved_history = [ 'whoami', 'cat /etc/passwd', 'id', 'pwd', 'cat flag.txt', 'ls -l', 'cd /tmp', 'ls -la' ]
+    write_history_file(saved_history)
+    history_service = HistoryService()
+
+    # Expect recent matches to be found without loading older commands
+    assert history_service.search_latest('ls') == 'ls -la'
+    assert len(history_service._HistoryService__history) == 2
+
+    # Expect older matches to page in only what is needed
+    assert history_service.search_latest('cat') == 'cat flag.txt'
+    assert len(history_service._HistoryService__history) == 4
+    assert history_service.search_latest('w') == 'whoami'
+    assert history_service.search_latest('x') is None
+    assert history_service.get_history() == saved_history
+
+    reset_history_service()
+
+def test_loads_tail_using_memory_mapped_file(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Save a history in the real filesystem, without a trailing newline
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(HistoryService, 'TAIL_LINES', 2)
+    monkeypatch.setattr(HistoryService, 'PAGE_LINES', 2)
+    with open('./.webshell_history', 'w') as f:
+        f.write('whoami\nid\npwd\nls -l')
+
+    # Expect the tail to be loaded and older commands to be paged in
+    history_service = HistoryService()
+    assert history_service.search_latest('l') == 'ls -l'
+    assert history_service._HistoryService__history.to_list() == [ 'pwd', 'ls -l' ]
+    assert history_service.search_latest('w') == 'whoami'
+    assert history_service.get_history() == [ 'whoami', 'id', 'pwd', 'ls -l' ]
+
+    reset_history_service()
+
+def test_keeps_added_commands_after_paging_in_older_ones(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Save a history longer than the loaded tail
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 1)
+    write_history_file([ 'whoami', 'id' ])
+    history_service = HistoryService()
+
+    # Add a command, flush it, and page in the rest of the history
+    history_service.add_command('pwd')
+    history_service.flush()
+    assert history_service.search_latest('w') == 'whoami'
+    assert history_service.get_history() == [ 'whoami', 'id', 'pwd' ]
+
+    reset_history_service()
+
+def test_buffers_commands_until_flushed(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Add a command without filling the buffer
+    history_service.add_command('id')
+    assert not os.path.exists('./.webshell_history')
+
+    # Flush the buffer and expect the command to have been saved
+    history_service.flush()
+    assert read_history_file() == [ 'id\n' ]
+
+def test_flushes_when_buffer_is_full(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Add as many commands as fit in the buffer
+    history_service.configure(flush_size = 3)
+    for cmd in [ 'id', 'pwd', 'ls' ]:
+        history_service.add_command(cmd)
+
+    # Expect them to have been saved without flushing
+    assert read_history_file() == [ 'id\n', 'pwd\n', 'ls\n' ]
+
+def test_flushes_after_the_flush_interval(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Add a command with a short flush interval
+    history_service.configure(flush_interval = 0.01)
+    history_service.add_command('id')
+
+    # Expect the command to be saved shortly after
+    deadline = time.time() + 5
+    while not os.path.exists('./.webshell_history') and time.time() < deadline:
+        time.sleep(0.01)
+    assert read_history_file() == [ 'id\n' ]
+
+def test_syncs_every_command_with_always_policy(history_service: HistoryService, fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Sync every command
+    history_service.configure(fsync_policy = HistoryService.FSYNC_ALWAYS)
+    mock_fsync = mocker.patch('os.fsync')
+    history_service.add_command('id')
+    history_service.add_command('pwd')
+
+    # Expect both commands to have been written and synced
+    assert read_history_file() == [ 'id\n', 'pwd\n' ] and mock_fsync.call_count == 2
+
+def test_never_syncs_with_never_policy(history_service: HistoryService, fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Never sync
+    history_service.configure(fsync_policy = HistoryService.FSYNC_NEVER)
+    mock_fsync = mocker.patch('os.fsync')
+    history_service.add_command('id')
+    history_service.flush()
+
+    # Expect the command to have been written without syncing it
+    assert read_history_file() == [ 'id\n' ] and mock_fsync.call_count == 0
+
+def test_rejects_unknown_fsync_policies(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    with pytest.raises(ValueError):
+        history_service.configure(fsync_policy = 'sometimes')
+
+def test_close_saves_pending_commands(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    history_service.close()
+    assert read_history_file() == [ 'id\n' ]
+
+def test_delete_history_discards_pending_commands(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    history_service.delete_history()
+    history_service.flush()
+    assert not os.path.exists('./.webshell_history')
+
 def test_delete_history_empties_the_command_history(history_service: HistoryService, fs: FakeFilesystem) -> None:
     # Add a series of commands
     cmds = [ 'cat /etc/passwd', 'cd /home/web-admin', 'ls -l' ]
@@ -85,6 +265,224 @@ def test_delete_history_deletes_the_history_file(history_service: HistoryService
     
     assert os.path.exists('./.webshell_history') == False
 
+def test_keeps_only_the_maximum_number_of_entries(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.configure(max_entries = 3)
+    for cmd in [ 'whoami', 'id', 'pwd', 'ls -l' ]:
+        history_service.add_command(cmd)
+
+    # Expect the oldest command to have been dropped, and to be no longer found
+    assert history_service.get_history() == [ 'id', 'pwd', 'ls -l' ]
+    assert history_service.search_latest('w') is None
+
+def test_drops_the_oldest_entries_from_the_index(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Index a small history, then add many more commands than it keeps
+    history_service.configure(max_entries = 3)
+    for cmd in [ 'cat flag.txt', 'ls -l' ]:
+        history_service.add_command(cmd)
+    history_service.search_latest('')
+    for i in range(1000):
+        history_service.add_command(f'echo {i}')
+
+    # Expect the dropped commands to be no longer found, and the index to only hold the kept ones
+    assert history_service.search_latest('c') is None and history_service.search_latest('l') is None
+    assert history_service.search_latest('echo 99') == 'echo 999'
+    assert count_index_nodes(history_service) <= 2 * 3 + 1
+
+def test_loads_only_the_maximum_number_of_entries(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Save a history longer than the maximum, and page it in a few commands at a time
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 2)
+    mocker.patch.object(HistoryService, 'PAGE_LINES', 2)
+    write_history_file([ 'whoami', 'cat flag.txt', 'id', 'pwd', 'ls -l' ])
+    history_service = HistoryService()
+    history_service.configure(max_entries = 3)
+
+    # Expect only the most recent commands to be loaded
+    assert history_service.search_latest('c') is None
+    assert history_service.search_latest('w') is None
+    assert history_service.get_history() == [ 'id', 'pwd', 'ls -l' ]
+
+    reset_history_service()
+
+def test_lowering_the_maximum_drops_the_oldest_entries(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    for cmd in [ 'whoami', 'id', 'pwd' ]:
+        history_service.add_command(cmd)
+    history_service.search_latest('')
+    history_service.configure(max_entries = 1)
+    assert history_service.get_history() == [ 'pwd' ]
+    assert history_service.search_latest('') == 'pwd' and history_service.search_latest('w') is None
+
+def test_rejects_invalid_maximum_number_of_entries(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    with pytest.raises(ValueError):
+        history_service.configure(max_entries = 0)
+
+def test_collapses_consecutive_duplicates(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.configure(collapse_duplicates = True)
+    for cmd in [ 'id', 'id', 'pwd', 'id', 'id' ]:
+        history_service.add_command(cmd)
+    history_service.flush()
+
+    # Expect only non-consecutive duplicates to be kept and saved
+    assert history_service.get_history() == [ 'id', 'pwd', 'id' ]
+    assert read_history_file() == [ 'id\n', 'pwd\n', 'id\n' ]
+
+def test_keeps_consecutive_duplicates_by_default(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    for cmd in [ 'id', 'id' ]:
+        history_service.add_command(cmd)
+    assert history_service.get_history() == [ 'id', 'id' ]
+
+def test_compacts_the_history_file(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Save more commands than the maximum, collapsing duplicates
+    write_history_file([ 'whoami', 'id', 'id', 'pwd' ])
+    history_service.configure(max_entries = 3, collapse_duplicates = True)
+    history_service.compact()
+
+    # Expect only the most recent, non-duplicated commands to be kept
+    assert read_history_file() == [ 'id\n', 'pwd\n' ]
+    assert not os.path.exists('./.webshell_history.compact')
+
+    # Expect new commands to be appended to the compacted file
+    history_service.add_command('ls -l')
+    history_service.flush()
+    assert read_history_file() == [ 'id\n', 'pwd\n', 'ls -l\n' ]
+
+def test_compacts_in_the_background_when_the_file_is_too_big(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    # Add commands to a small history, with a low compaction threshold
+    history_service.configure(max_entries = 2, compaction_threshold = 10)
+    for cmd in [ 'whoami', 'id', 'pwd' ]:
+        history_service.add_command(cmd)
+    history_service.flush()
+
+    # Expect the history file to be compacted shortly after
+    deadline = time.time() + 5
+    while len(read_history_file()) > 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert read_history_file() == [ 'id\n', 'pwd\n' ]
+
+def test_delete_history_does_not_wait_for_a_compaction_in_flight(history_service: HistoryService, fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Hold a background compaction while it copies the history file
+    for cmd in [ 'whoami', 'id', 'pwd' ]:
+        history_service.add_command(cmd)
+    copying, release = threading.Event(), threading.Event()
+    find_lines_start = history_service._HistoryService__find_lines_start
+    def slow_find_lines_start(*args: Any) -> int:
+        copying.set()
+        release.wait(5)
+        return find_lines_start(*args)
+    mocker.patch.object(history_service, '_HistoryService__find_lines_start', side_effect = slow_find_lines_start)
+    history_service.configure(max_entries = 2, compaction_threshold = 10)
+    history_service.add_command('ls -l')
+    history_service.flush()
+    assert copying.wait(5)
+
+    # Delete the history while the compaction is running, and let the compaction continue
+    deletion = threading.Thread(target = history_service.delete_history, daemon = True)
+    deletion.start()
+    time.sleep(0.05)
+    release.set()
+    deletion.join(5)
+
+    # Expect the history to be deleted, and the compacted copy to be discarded
+    assert not deletion.is_alive()
+    assert not os.path.exists('./.webshell_history')
+    assert not os.path.exists('./.webshell_history.compact')
+    assert history_service.get_history() == []
+
+def test_commands_added_from_jobs_wait_for_a_search_paging_in_older_commands(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Load the tail of a long history, and hold the next search while it reads older commands
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 1)
+    mocker.patch.object(HistoryService, 'PAGE_LINES', 1)
+    write_history_file([ 'whoami', 'id', 'pwd' ])
+    history_service = HistoryService()
+    assert history_service.search_latest('p') == 'pwd'
+    reading, release = threading.Event(), threading.Event()
+    read_lines = history_service._HistoryService__read_lines
+    def slow_read_lines(*args: Any) -> list[str]:
+        reading.set()
+        release.wait(5)
+        return read_lines(*args)
+    mocker.patch.object(history_service, '_HistoryService__read_lines', side_effect = slow_read_lines)
+    results = []
+    search = threading.Thread(target = lambda: results.append(history_service.search_latest('w')), daemon = True)
+    search.start()
+    assert reading.wait(5)
+
+    # Add a command from another thread while the search is reading
+    job = threading.Thread(target = history_service.add_command, args = ('ls -l',), daemon = True)
+    job.start()
+    time.sleep(0.05)
+    added_during_search = not job.is_alive()
+    release.set()
+    search.join(5)
+    job.join(5)
+
+    # Expect the command to have been added once the search finished
+    assert not added_during_search
+    assert results == [ 'whoami' ]
+    assert history_service.get_history() == [ 'whoami', 'id', 'pwd', 'ls -l' ]
+
+    reset_history_service()
+
+def test_pages_in_older_commands_after_compacting(fs: FakeFilesystem, mocker: MockFixture) -> None:
+    # Load the tail of a long history and compact it
+    mocker.patch.object(HistoryService, 'TAIL_LINES', 1)
+    mocker.patch.object(HistoryService, 'PAGE_LINES', 1)
+    write_history_file([ 'whoami', 'id', 'id', 'pwd', 'ls -l' ])
+    history_service = HistoryService()
+    history_service.configure(max_entries = 4, collapse_duplicates = True)
+    history_service.compact()
+
+    # Expect the older commands to be paged in from the compacted file
+    assert history_service.search_latest('i') == 'id'
+    assert history_service.get_history() == [ 'id', 'pwd', 'ls -l' ]
+
+    reset_history_service()
+
+def test_saves_commands_to_the_database(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Use a database with a previously saved history
+    monkeypatch.chdir(tmp_path)
+    write_history_file([ 'whoami', 'id' ])
+    history_service = HistoryService()
+    history_service.use_database('history.db')
+
+    # Expect the saved history to have been imported, and new commands to be saved to the database
+    entry = history_service.add_command('cat /etc/passwd')
+    history_service.record_result(entry, 0.5, 1024)
+    history_service.close()
+    assert history_service.get_history() == [ 'whoami', 'id', 'cat /etc/passwd' ]
+    assert read_history_file() == [ 'whoami\n', 'id\n' ]
+
+    # Expect the commands to be found by prefix and by fragment
+    assert history_service.search_latest('w') == 'whoami'
+    assert history_service.search_command('c') == [ 'cat /etc/passwd' ]
+    matches = history_service.search_fragment('passwd')
+    assert [ (m['cmd'], m['duration'], m['output_size']) for m in matches ] == [ ('cat /etc/passwd', 0.5, 1024) ]
+
+    reset_history_service()
+
+def test_database_keeps_only_the_maximum_number_of_entries(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    history_service = HistoryService()
+    history_service.use_database('history.db')
+    history_service.configure(max_entries = 2, collapse_duplicates = True)
+    for cmd in [ 'whoami', 'id', 'id', 'pwd' ]:
+        history_service.add_command(cmd)
+
+    assert history_service.get_history() == [ 'id', 'pwd' ]
+
+    # Expect deleting the history to empty the database
+    history_service.delete_history()
+    assert history_service.get_history() == []
+
+    reset_history_service()
+
+def test_search_fragment_without_database(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    for cmd in [ 'cat /etc/passwd', 'id', 'grep root /etc/passwd' ]:
+        history_service.add_command(cmd)
+
+    matches = history_service.search_fragment('passwd')
+    assert [ m['cmd'] for m in matches ] == [ 'grep root /etc/passwd', 'cat /etc/passwd' ]
+    assert [ m['cmd'] for m in history_service.search_fragment('passwd', 1) ] == [ 'grep root /etc/passwd' ]
+
 ################################################################################
 #                                                                              #
 # Test scenarios to avoid test-case code duplication                           #
@@ -102,9 +500,12 @@ def run_loads_history_test_scenario(saved_history: list[str]) -> None:
     # Expect both lists to be equal
     assert history == saved_history
 
+    reset_history_service()
+
 def run_saves_command_test_scenario(command: str, history_service: HistoryService) -> None:
-    # Use the history service to save the command
+    # Use the history service to save the command and flush it to disk
     history_service.add_command(command)
+    history_service.flush()
 
     # Expect the command to be saved
     with open('./.webshell_history', 'r') as f:
@@ -122,12 +523,38 @@ def run_search_history_test_scenario(history_service: HistoryService, commands:
 
     assert result == expected_result
 
+def run_search_latest_test_scenario(history_service: HistoryService, commands: list[str], prefixes: list[str]) -> None:
+    # Save a list of commands
+    for cmd in commands:
+        history_service.add_command(cmd)
+
+    # Expect each search to return the last command starting with the prefix
+    for prefix in prefixes:
+        matches = [ cmd for cmd in commands if cmd.startswith(prefix) ]
+        expected_result = matches[-1] if len(matches) > 0 else None
+        assert history_service.search_latest(prefix) == expected_result
+
 ################################################################################
 #                                                                              #
 # Helper functions and classes                                                 #
 #                                                                              #
 ################################################################################
 
+def write_history_file(history: list[str]) -> None:
+    with open('./.webshell_history', 'w') as f:
+        f.writelines(map(lambda cmd: cmd + '\n', history))
+
+def read_history_file() -> list[str]:
+    with open('./.webshell_history', 'r') as f:
+        return f.readlines()
+
+def count_index_nodes(history_service: HistoryService) -> int:
+    nodes = [ history_service._HistoryService__index._PrefixIndex__root ]
+    for node in nodes:
+        nodes.extend((node.children or {}).values())
+    return len(nodes)
+
 def reset_history_service() -> None:
-    # Destroy the created instance to reset state
+    # Save the pending commands and destroy the created instance to reset state
+    HistoryService().close()
     delattr(HistoryService, 'instance')
@@ -0,0 +1,68 @@
+from client.history_store import HistoryStore
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_stores_commands_in_order() -> None:
+    store = create_store([ 'whoami', 'id', 'pwd' ])
+    assert store.to_list() == [ 'whoami', 'id', 'pwd' ]
+    assert list(reversed(store)) == [ 'pwd', 'id', 'whoami' ]
+    assert len(store) == 3 and store[-1] == 'pwd'
+
+def test_stores_repeated_commands_once() -> None:
+    store = HistoryStore()
+    first = store.append('ls -la')
+    store.append('id')
+    second = store.append(''.join([ 'ls', ' -la' ]))
+
+    # Expect both entries to share the same string
+    assert store.to_list() == [ 'ls -la', 'id', 'ls -la' ]
+    assert first is second
+
+def test_prepends_older_commands() -> None:
+    store = create_store([ 'pwd' ])
+    assert store.prepend([ 'whoami', 'pwd' ]) == [ 'whoami', 'pwd' ]
+    assert store.to_list() == [ 'whoami', 'pwd', 'pwd' ]
+
+def test_trims_oldest_commands() -> None:
+    store = create_store([ 'whoami', 'id', 'whoami', 'pwd' ])
+    assert store.trim(2) == [ 'id' ]
+    assert store.trim(2) == []
+    assert store.to_list() == [ 'whoami', 'pwd' ]
+
+def test_returns_released_commands_from_least_recently_used() -> None:
+    store = create_store([ 'id', 'whoami', 'id', 'pwd', 'uname', 'pwd' ])
+    assert store.trim(1) == [ 'whoami', 'id', 'uname' ]
+
+def test_forgets_commands_no_longer_stored() -> None:
+    store = create_store([ 'whoami', 'id', 'whoami', 'pwd' ])
+    store.trim(2)
+    assert 'whoami' in store and 'pwd' in store
+    assert 'id' not in store
+
+def test_reuses_released_entries() -> None:
+    store = create_store([ 'whoami', 'id' ])
+    store.trim(1)
+    store.append('pwd')
+    store.append('whoami')
+    assert store.to_list() == [ 'id', 'pwd', 'whoami' ]
+
+def test_clear_empties_the_store() -> None:
+    store = create_store([ 'whoami', 'id' ])
+    store.clear()
+    assert len(store) == 0 and 'id' not in store
+
+################################################################################
+#                                                                              #
+# Helper functions and classes                                                 #
+#                                                                              #
+################################################################################
+
+def create_store(cmds: list[str]) -> HistoryStore:
+    store = HistoryStore()
+    for cmd in cmds:
+        store.append(cmd)
+    return store
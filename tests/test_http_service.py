@@ -1,6 +1,8 @@
 from client.http_service import HTTPService
 from client.singleton import Singleton
 from client.cypher import AESCypher
+from client.compressor import Compressor
+from client.stats_service import StatsService
 from typing import Any, Callable
 from pytest_mock import MockFixture
 from unittest.mock import MagicMock
@@ -10,6 +12,13 @@ import secrets
 import binascii
 import requests
 import json
+import zlib
+import base64
+import struct
+import threading
+import time
+import tracemalloc
+from Crypto.Cipher import AES
 
 ################################################################################
 #                                                                              #
@@ -76,6 +85,651 @@ def test_returns_empty_output_if_response_has_no_output(mock_session: MagicMock)
     # Expect response output to be empty
     assert response['output'] == ''
 
+def test_uses_json_protocol_by_default(http_service: HTTPService) -> None:
+    assert http_service.raw_content == False
+
+def test_binary_protocol_sends_framed_request_with_raw_content(mock_session: MagicMock) -> None:
+    # Initialize http service using the binary protocol
+    url = 'https://example.com/webshell.php'
+    key = secrets.token_bytes(32)
+    nonce = binascii.hexlify(secrets.token_bytes(16)).decode()
+    initialize_http_service(url = url, key = key, nonce = nonce, protocol = HTTPService.BINARY_PROTOCOL)
+    mock_session.post.return_value = create_mock_binary_response(key, { 'output': '', 'nonce': nonce })
+
+    # Send a request with raw content
+    http_service = HTTPService()
+    content = b'\x00\x01binary content\xff'
+    request = { 'action': 'upload_file', 'args': { 'filename': 'test.bin', 'content': content, 'binary': True } }
+    http_service.send_request(request)
+
+    # Verify the request was sent as an octet stream to the correct URL
+    args, kwargs = mock_session.post.call_args
+    assert args[0] == url and kwargs['headers']['Content-Type'] == 'application/octet-stream'
+
+    # Verify the frame contains the iv and the encrypted header and content
+    header, payload = decode_binary_frame(key, kwargs['data'])
+    assert header['args'] == { 'filename': 'test.bin', 'binary': True } and header['nonce'] == nonce
+    assert payload == content
+
+    reset_http_service()
+
+def test_binary_protocol_returns_raw_content_as_output(mock_session: MagicMock) -> None:
+    # Initialize http service using the binary protocol
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, protocol = HTTPService.BINARY_PROTOCOL)
+    content = b'\x00\x01binary content\xff'
+    nonce = 'd9c0dce01d7770b3a61ec53382f7fb60'
+    mock_session.post.return_value = create_mock_binary_response(key, { 'eof': True, 'nonce': nonce }, content)
+
+    # Send a request
+    http_service = HTTPService()
+    response = http_service.send_request({ 'action': 'download_file', 'args': { 'filename': 'test.bin' } })
+
+    # Verify the raw content was returned and the nonce updated
+    assert response == { 'output': content, 'eof': True }
+    assert list(http_service._HTTPService__nonces) == [ nonce ] and http_service.raw_content == True
+
+    reset_http_service()
+
+def test_binary_protocol_returns_json_output(mock_session: MagicMock) -> None:
+    # Initialize http service using the binary protocol
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, protocol = HTTPService.BINARY_PROTOCOL)
+    mock_session.post.return_value = create_mock_binary_response(key, { 'output': 'www-data', 'nonce': 'd9c0' })
+
+    # Send a request and expect the output to be returned
+    response = HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'whoami' } })
+    assert response == { 'output': 'www-data' }
+
+    reset_http_service()
+
+def test_binary_protocol_rejects_invalid_frames(mock_session: MagicMock) -> None:
+    # Initialize http service using the binary protocol
+    initialize_http_service(protocol = HTTPService.BINARY_PROTOCOL)
+    mock_response = MagicMock()
+    mock_response.content = b'XXXX' + bytes(100)
+    mock_session.post.return_value = mock_response
+
+    # Expect the response to be rejected
+    with pytest.raises(ValueError):
+        HTTPService().send_request({ 'action': 'test' })
+
+    reset_http_service()
+
+def test_offers_available_compression_codecs(mock_session: MagicMock) -> None:
+    # Initialize http service
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    mock_session.post.return_value = create_mock_response(key, { 'output': '', 'nonce': 'd9c0' })
+
+    # Send a request
+    HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the request to offer the available codecs, without compressing it
+    outer_body = json.loads(mock_session.post.call_args.kwargs['data'])
+    body = json.loads(AESCypher(key).decrypt(outer_body['body'], outer_body['iv']))
+    assert body['compression'] == Compressor().codecs() and 'compression' not in outer_body
+
+    reset_http_service()
+
+def test_sends_the_outer_object_serialized_once(mock_session: MagicMock) -> None:
+    # Initialize http service and send a request
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    mock_session.post.return_value = create_mock_response(key, { 'output': '', 'nonce': 'd9c0' })
+    HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the outer object to have been sent as a JSON body, instead of being encoded by requests
+    kwargs = mock_session.post.call_args.kwargs
+    assert 'json' not in kwargs and isinstance(kwargs['data'], bytes)
+    assert kwargs['headers']['Content-Type'] == 'application/json'
+    assert set(json.loads(kwargs['data'])) == { 'body', 'iv' }
+
+    reset_http_service()
+
+def test_compresses_big_requests_once_the_shell_accepts_a_codec(mock_session: MagicMock) -> None:
+    # Initialize http service and accept zlib compression
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    http_service = HTTPService()
+    mock_session.post.return_value = create_mock_response(key, { 'output': '', 'nonce': 'd9c0', 'compression': 'zlib' })
+    http_service.send_request({ 'action': 'test' })
+
+    # Send a big request
+    request = { 'action': 'execute_command', 'args': { 'cmd': 'echo ' + 'a' * 10000 } }
+    http_service.send_request(request)
+
+    # Expect the request to have been compressed before encrypting it
+    outer_body = json.loads(mock_session.post.call_args.kwargs['data'])
+    assert outer_body['compression'] == 'zlib'
+    cyphertext = base64.b64decode(outer_body['body'])
+    iv = base64.b64decode(outer_body['iv'])
+    plaintext = AES.new(key, AES.MODE_CBC, iv).decrypt(cyphertext)
+    body = json.loads(zlib.decompress(plaintext[:-plaintext[-1]]))
+    assert body['args'] == request['args'] and len(cyphertext) < 1000
+
+    reset_http_service()
+
+def test_does_not_compress_small_requests(mock_session: MagicMock) -> None:
+    # Initialize http service and accept zlib compression
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    http_service = HTTPService()
+    mock_session.post.return_value = create_mock_response(key, { 'output': '', 'nonce': 'd9c0', 'compression': 'zlib' })
+    http_service.send_request({ 'action': 'test' })
+
+    # Send a small request and expect it not to be compressed
+    http_service.send_request({ 'action': 'execute_command', 'args': { 'cmd': 'id' } })
+    assert 'compression' not in json.loads(mock_session.post.call_args.kwargs['data'])
+
+    reset_http_service()
+
+def test_decompresses_compressed_responses(mock_session: MagicMock) -> None:
+    # Initialize http service
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+
+    # Create a compressed response
+    output = 'line\n' * 1000
+    plaintext = zlib.compress(json.dumps({ 'output': output, 'nonce': 'd9c0' }).encode())
+    iv = secrets.token_bytes(16)
+    padding = 16 - len(plaintext) % 16
+    cyphertext = AES.new(key, AES.MODE_CBC, iv).encrypt(plaintext + bytes([padding]) * padding)
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        'body': base64.b64encode(cyphertext).decode(),
+        'iv': base64.b64encode(iv).decode(),
+        'compression': 'zlib'
+    }).encode()
+    mock_session.post.return_value = mock_response
+
+    # Expect the response to be decompressed
+    response = HTTPService().send_request({ 'action': 'test' })
+    assert response == { 'output': output }
+
+    reset_http_service()
+
+def test_binary_protocol_decompresses_compressed_responses(mock_session: MagicMock) -> None:
+    # Initialize http service using the binary protocol
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, protocol = HTTPService.BINARY_PROTOCOL)
+    content = b'binary content' * 1000
+    mock_session.post.return_value = create_mock_binary_response(key, { 'nonce': 'd9c0' }, content, codec = 'zlib')
+
+    # Expect the response to be decompressed
+    response = HTTPService().send_request({ 'action': 'download_file', 'args': { 'filename': 'test.bin' } })
+    assert response == { 'output': content }
+
+    reset_http_service()
+
+def test_records_time_spent_on_each_stage(mock_session: MagicMock) -> None:
+    # Initialize http service and discard previous statistics
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    StatsService().reset()
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'www-data', 'nonce': 'd9c0' })
+
+    # Send a request
+    HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'whoami' } })
+
+    # Expect the duration of each stage and the transferred bytes to have been recorded
+    stats = StatsService().get_stats()['execute_command']
+    stages = [ 'serialize', 'encrypt', 'http', 'response_parse', 'decrypt', 'inner_parse', 'total' ]
+    assert all(stats[stage]['count'] == 1 for stage in stages)
+    assert stats['request_bytes']['p50'] > 0 and stats['response_bytes']['p50'] > 0
+    assert stats['total']['p50'] >= stats['http']['p50']
+
+    reset_http_service()
+
+def test_binary_protocol_records_time_spent_on_each_stage(mock_session: MagicMock) -> None:
+    # Initialize http service and discard previous statistics
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, protocol = HTTPService.BINARY_PROTOCOL)
+    StatsService().reset()
+    mock_session.post.return_value = create_mock_binary_response(key, { 'nonce': 'd9c0' }, b'content')
+
+    # Send a request
+    HTTPService().send_request({ 'action': 'download_file', 'args': { 'filename': 'test.bin' } })
+
+    # Expect the duration of each stage and the transferred bytes to have been recorded
+    stats = StatsService().get_stats()['download_file']
+    stages = [ 'serialize', 'encrypt', 'http', 'response_parse', 'decrypt', 'inner_parse', 'total' ]
+    assert all(stats[stage]['count'] == 1 for stage in stages)
+    assert stats['response_bytes']['p50'] == len(mock_session.post.return_value.content)
+
+    reset_http_service()
+
+def test_reports_transferred_bytes_to_the_thread_listener(mock_session: MagicMock) -> None:
+    # Listen to the bytes transferred by the current thread
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': '1' })
+    transferred = []
+    HTTPService().set_transfer_listener(transferred.append)
+    HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the request and response sizes to have been reported
+    body = json.loads(mock_session.post.call_args.kwargs['data'])
+    assert transferred == [ len(body['body']) + len(body['iv']) + len(mock_session.post.return_value.content) ]
+
+    # Expect other threads not to use the listener
+    thread = threading.Thread(target = HTTPService().send_request, args = ({ 'action': 'test' },))
+    thread.start()
+    thread.join()
+    assert len(transferred) == 1
+
+    reset_http_service()
+
+def test_sends_requests_from_several_threads_one_at_a_time(mock_session: MagicMock) -> None:
+    # Reply to each request after a short delay, counting the requests in flight
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    in_flight = []
+    def post(*args: Any, **kwargs: Any) -> MagicMock:
+        in_flight.append(None)
+        time.sleep(0.01)
+        concurrent = len(in_flight)
+        in_flight.pop()
+        return create_mock_response(key, { 'output': str(concurrent), 'nonce': '1' })
+    mock_session.post.side_effect = post
+
+    # Send requests from several threads
+    outputs = []
+    threads = [ threading.Thread(target = lambda: outputs.append(HTTPService().send_request({ 'action': 'test' }))) for _ in range(4) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Expect every request to have been sent alone
+    assert [ output['output'] for output in outputs ] == [ '1' ] * 4
+
+    reset_http_service()
+
+def test_keeps_capabilities_advertised_by_the_shell(mock_session: MagicMock) -> None:
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    assert not HTTPService().supports('batch')
+
+    # Expect the capabilities to be removed from the response and saved
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': '1', 'capabilities': [ 'batch' ] })
+    assert HTTPService().send_request({ 'action': 'test' }) == { 'output': 'test' }
+    assert HTTPService().supports('batch') and not HTTPService().supports('streaming')
+
+    reset_http_service()
+
+def test_requests_a_window_of_nonces(mock_session: MagicMock) -> None:
+    # Send a request with a window of three nonces
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0', window = 3)
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': 'n1', 'nonces': [ 'n2', 'n3' ], 'id': 1 })
+    response = HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the request to have been identified and the window requested
+    body = json.loads(mock_session.post.call_args.kwargs['data'])
+    request = json.loads(AESCypher(key).decrypt(body['body'], body['iv']))
+    assert request['id'] == 1 and request['window'] == 3 and request['nonce'] == 'n0'
+
+    # Expect the issued nonces to have been kept, and the response not to include them
+    assert response == { 'output': 'test' }
+    assert list(HTTPService()._HTTPService__nonces) == [ 'n1', 'n2', 'n3' ]
+
+    reset_http_service()
+
+def test_does_not_identify_requests_without_window(mock_session: MagicMock) -> None:
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key)
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': '1' })
+    HTTPService().send_request({ 'action': 'test' })
+
+    body = json.loads(mock_session.post.call_args.kwargs['data'])
+    request = json.loads(AESCypher(key).decrypt(body['body'], body['iv']))
+    assert 'id' not in request and 'window' not in request
+
+    reset_http_service()
+
+def test_fails_if_the_response_does_not_match_the_request(mock_session: MagicMock) -> None:
+    # Answer with the identifier of another request
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0', window = 2)
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': 'n1', 'id': 7 })
+
+    # Expect an error, keeping the issued nonce
+    with pytest.raises(ValueError):
+        HTTPService().send_request({ 'action': 'test' })
+    assert list(HTTPService()._HTTPService__nonces) == [ 'n1' ]
+
+    reset_http_service()
+
+def test_reuses_the_nonce_of_failed_requests(mock_session: MagicMock) -> None:
+    # Fail to send a request
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    mock_session.post.side_effect = requests.ConnectionError()
+    with pytest.raises(requests.ConnectionError):
+        HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the next request to use the same nonce
+    mock_session.post.side_effect = None
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': 'n1' })
+    HTTPService().send_request({ 'action': 'test' })
+    body = json.loads(mock_session.post.call_args.kwargs['data'])
+    assert json.loads(AESCypher(key).decrypt(body['body'], body['iv']))['nonce'] == 'n0'
+
+    reset_http_service()
+
+def test_sends_several_requests_at_once_with_a_window_of_nonces(mock_session: MagicMock) -> None:
+    # Only answer once two requests are in flight at the same time
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0', window = 2)
+    HTTPService()._HTTPService__nonces.append('n1')
+    barrier = threading.Barrier(2, timeout = 5)
+    def post(*args: Any, **kwargs: Any) -> MagicMock:
+        outer_body = json.loads(kwargs['data'])
+        request = json.loads(AESCypher(key).decrypt(outer_body['body'], outer_body['iv']))
+        barrier.wait()
+        return create_mock_response(key, { 'output': request['nonce'], 'nonce': request['nonce'] + "'", 'id': request['id'] })
+    mock_session.post.side_effect = post
+
+    # Send two requests from different threads
+    outputs = []
+    threads = [ threading.Thread(target = lambda: outputs.append(HTTPService().send_request({ 'action': 'test' }))) for _ in range(2) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Expect both to have used a different nonce
+    assert sorted(output['output'] for output in outputs) == [ 'n0', 'n1' ]
+
+    reset_http_service()
+
+def test_waits_for_the_connection_and_the_response_with_timeouts(mock_session: MagicMock) -> None:
+    key = secrets.token_bytes(32)
+    HTTPService().initialize('https://example.com/webshell.php', key, 'n0', timeout = (2.0, 30.0))
+    mock_session.post.return_value = create_mock_response(key, { 'output': 'test', 'nonce': 'n1' })
+    HTTPService().send_request({ 'action': 'test' })
+
+    assert mock_session.post.call_args.kwargs['timeout'] == (2.0, 30.0)
+
+    reset_http_service()
+
+def test_retries_idempotent_requests_with_increasing_delays(mock_session: MagicMock, mocker: MockFixture) -> None:
+    # Fail twice before answering a download request
+    sleep = mocker.patch('time.sleep')
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    mock_session.post.side_effect = [
+        requests.ConnectionError(),
+        requests.Timeout(),
+        create_mock_response(key, { 'output': 'test', 'nonce': 'n1' })
+    ]
+    response = HTTPService().send_request({ 'action': 'download_file', 'args': { 'filename': 'test.txt' } })
+
+    # Expect the request to have been sent three times, doubling the delay between them
+    assert response == { 'output': 'test' }
+    assert mock_session.post.call_count == 3
+    assert [ c.args[0] for c in sleep.call_args_list ] == [ HTTPService.RETRY_BACKOFF, HTTPService.RETRY_BACKOFF * 2 ]
+
+    reset_http_service()
+
+def test_does_not_retry_commands(mock_session: MagicMock, mocker: MockFixture) -> None:
+    # Running a command twice may have side effects
+    mocker.patch('time.sleep')
+    initialize_http_service()
+    mock_session.post.side_effect = requests.Timeout()
+    with pytest.raises(requests.Timeout):
+        HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'rm -rf /tmp/test' } })
+    assert mock_session.post.call_count == 1
+
+    reset_http_service()
+
+def test_gives_up_after_the_maximum_retries(mock_session: MagicMock, mocker: MockFixture) -> None:
+    mocker.patch('time.sleep')
+    initialize_http_service()
+    mock_session.post.side_effect = requests.ConnectionError()
+    with pytest.raises(requests.ConnectionError):
+        HTTPService().send_request({ 'action': 'upload_file', 'args': { 'filename': 'test.txt' } })
+    assert mock_session.post.call_count == HTTPService.MAX_RETRIES + 1
+
+    reset_http_service()
+
+def test_resyncs_and_resends_requests_if_the_shell_rejects_the_nonce(mock_session: MagicMock) -> None:
+    # Reject the first nonce, then issue a new one
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    mock_session.post.side_effect = [
+        create_rejected_response(),
+        create_mock_response(key, { 'nonce': 'n1' }),
+        create_mock_response(key, { 'output': 'test', 'nonce': 'n2' })
+    ]
+    response = HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'id' } })
+
+    # Expect the command to have been sent again with the new nonce
+    requests_sent = [ decrypt_request(key, json.loads(c.kwargs['data'])) for c in mock_session.post.call_args_list ]
+    assert [ (r['action'], r['nonce']) for r in requests_sent ] == [ ('execute_command', 'n0'), ('resync', None), ('execute_command', 'n1') ]
+    assert response == { 'output': 'test' }
+    assert list(HTTPService()._HTTPService__nonces) == [ 'n2' ]
+
+    reset_http_service()
+
+def test_keeps_the_nonce_if_the_shell_cannot_resync(mock_session: MagicMock) -> None:
+    # Reject both the request and the resync
+    initialize_http_service(nonce = 'n0')
+    mock_session.post.side_effect = [ create_rejected_response(), create_rejected_response() ]
+    with pytest.raises(PermissionError):
+        HTTPService().send_request({ 'action': 'test' })
+
+    # Expect the state not to have changed
+    assert list(HTTPService()._HTTPService__nonces) == [ 'n0' ]
+
+    reset_http_service()
+
+def test_resync_replaces_the_known_nonces(mock_session: MagicMock) -> None:
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0', window = 3)
+    mock_session.post.return_value = create_mock_response(key, { 'nonce': 'r1', 'nonces': [ 'r2', 'r3' ], 'capabilities': [ 'batch' ] })
+    HTTPService().resync()
+
+    assert list(HTTPService()._HTTPService__nonces) == [ 'r1', 'r2', 'r3' ]
+    assert HTTPService().supports('batch')
+
+    reset_http_service()
+
+def test_abandons_the_requests_of_aborted_threads(mock_session: MagicMock) -> None:
+    # Hold the first request until the main thread has sent its own
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    sent, release = threading.Event(), threading.Event()
+    responses = iter([ create_mock_response(key, { 'nonce': 'r1' }), create_mock_response(key, { 'output': 'test', 'nonce': 'r2' }) ])
+    def post(*args: Any, **kwargs: Any) -> MagicMock:
+        if threading.current_thread() is thread:
+            sent.set()
+            release.wait(5)
+            return create_mock_response(key, { 'output': 'late', 'nonce': 'n1' })
+        return next(responses)
+    mock_session.post.side_effect = post
+
+    # Abort the thread while its request is in flight, and send another request
+    errors = []
+    def send_requests() -> None:
+        HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'sleep 3' } })
+        try:
+            HTTPService().send_request({ 'action': 'test' })
+        except ConnectionAbortedError as e:
+            errors.append(e)
+    thread = threading.Thread(target = send_requests)
+    thread.start()
+    sent.wait(5)
+    HTTPService().abort(thread)
+    response = HTTPService().send_request({ 'action': 'execute_command', 'args': { 'cmd': 'id' } })
+    release.set()
+    thread.join()
+
+    # Expect the nonce to have been resynchronized without waiting for the abandoned request, whose
+    # session was closed and whose nonce was dropped, and the thread not to have sent more requests
+    requests_sent = [ decrypt_request(key, json.loads(c.kwargs['data'])) for c in mock_session.post.call_args_list ]
+    assert [ (r['action'], r['nonce']) for r in requests_sent ] == [ ('execute_command', 'n0'), ('resync', None), ('execute_command', 'r1') ]
+    assert response == { 'output': 'test' }
+    assert list(HTTPService()._HTTPService__nonces) == [ 'r2' ]
+    assert len(errors) == 1
+    mock_session.close.assert_called_once()
+    assert requests.session.call_count == 2
+
+    reset_http_service()
+
+def test_streams_the_output_to_the_sink(mock_session: MagicMock) -> None:
+    # Answer with a compressed body, sent after the iv and codec
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    output = ''.join(f'line {i}\n' for i in range(10000))
+    plaintext = zlib.compress(json.dumps({ 'output': output, 'nonce': 'n1' }).encode())
+    iv, cyphertext = AESCypher(key).encrypt_bytes(plaintext)
+    outer = json.dumps({ 'iv': base64.b64encode(iv).decode(), 'compression': 'zlib', 'body': base64.b64encode(cyphertext).decode() })
+    mock_session.post.return_value = create_mock_stream_response(outer.encode(), 1000)
+
+    # Expect the output to have reached the sink in pieces, and the rest of the response to be returned
+    pieces = []
+    response = HTTPService().send_request({ 'action': 'execute_command' }, pieces.append)
+    assert ''.join(pieces) == output and len(pieces) > 1
+    assert response == {} and list(HTTPService()._HTTPService__nonces) == [ 'n1' ]
+    assert mock_session.post.call_args.kwargs['stream']
+
+    reset_http_service()
+
+def test_spools_bodies_sent_before_their_iv(mock_session: MagicMock) -> None:
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    encrypted_response = AESCypher(key).encrypt(json.dumps({ 'output': 'test "output"', 'nonce': 'n1', 'eof': True }))
+    outer = json.dumps({ 'body': encrypted_response['body'], 'iv': encrypted_response['iv'] })
+    mock_session.post.return_value = create_mock_stream_response(outer.encode(), 7)
+
+    pieces = []
+    response = HTTPService().send_request({ 'action': 'execute_command' }, pieces.append)
+    assert ''.join(pieces) == 'test "output"' and response == { 'eof': True }
+
+    reset_http_service()
+
+def test_streams_bodies_sent_without_a_codec_as_they_arrive(mock_session: MagicMock) -> None:
+    # Answer with an uncompressed body, whose outer object has no codec
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    encrypted_response = AESCypher(key).encrypt(json.dumps({ 'output': 'x' * 1000, 'nonce': 'n1' }))
+    outer = json.dumps({ 'iv': encrypted_response['iv'], 'body': encrypted_response['body'] }).encode()
+    pieces = []
+    received_before_the_end = None
+    def generate_response(chunk_size: int) -> Any:
+        nonlocal received_before_the_end
+        yield outer[:-2]
+        received_before_the_end = len(pieces) > 0
+        yield outer[-2:]
+    mock_session.post.return_value.iter_content.side_effect = generate_response
+
+    # Expect the output to have reached the sink before the end of the body
+    HTTPService().send_request({ 'action': 'execute_command' }, pieces.append)
+    assert received_before_the_end and ''.join(pieces) == 'x' * 1000
+
+    reset_http_service()
+
+def test_rejects_codecs_sent_after_a_streamed_body(mock_session: MagicMock) -> None:
+    # Answer with the codec after a body that was decoded as it arrived
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    encrypted_response = AESCypher(key).encrypt(json.dumps({ 'output': 'test', 'nonce': 'n1' }))
+    outer = json.dumps({ 'iv': encrypted_response['iv'], 'body': encrypted_response['body'], 'compression': 'zlib' })
+    mock_session.post.return_value = create_mock_stream_response(outer.encode(), 7)
+
+    # Expect the response to be rejected
+    with pytest.raises(ValueError):
+        HTTPService().send_request({ 'action': 'execute_command' }, lambda piece: None)
+
+    reset_http_service()
+
+def test_accepts_codecs_sent_after_a_spooled_body(mock_session: MagicMock) -> None:
+    # Answer with the iv and codec after the body
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    plaintext = zlib.compress(json.dumps({ 'output': 'test', 'nonce': 'n1' }).encode())
+    iv, cyphertext = AESCypher(key).encrypt_bytes(plaintext)
+    outer = json.dumps({ 'body': base64.b64encode(cyphertext).decode(), 'iv': base64.b64encode(iv).decode(), 'compression': 'zlib' })
+    mock_session.post.return_value = create_mock_stream_response(outer.encode(), 7)
+
+    # Expect the body to have been decompressed once the whole outer object was known
+    pieces = []
+    HTTPService().send_request({ 'action': 'execute_command' }, pieces.append)
+    assert ''.join(pieces) == 'test'
+
+    reset_http_service()
+
+def test_streaming_records_time_spent_on_each_stage(mock_session: MagicMock) -> None:
+    # Answer with compressed responses using both protocols
+    key = secrets.token_bytes(32)
+    plaintext = zlib.compress(json.dumps({ 'output': 'test' * 1000, 'nonce': 'n1' }).encode())
+    iv, cyphertext = AESCypher(key).encrypt_bytes(plaintext)
+    outer = json.dumps({ 'compression': 'zlib', 'iv': base64.b64encode(iv).decode(), 'body': base64.b64encode(cyphertext).decode() })
+    frame = create_mock_binary_response(key, { 'output': 'test' * 1000, 'nonce': 'n1' }, b'', 'zlib').content
+    for protocol, body in [ (HTTPService.JSON_PROTOCOL, outer.encode()), (HTTPService.BINARY_PROTOCOL, frame) ]:
+        initialize_http_service(key = key, nonce = 'n0', protocol = protocol)
+        StatsService().reset()
+        mock_session.post.return_value = create_mock_stream_response(body, 100)
+        HTTPService().send_request({ 'action': 'execute_command' }, lambda piece: None)
+
+        # Expect the stages to be the ones of responses that are not streamed, and the time spent
+        # passing the output to the sink, adding up to the total time
+        stats = StatsService().get_stats()['execute_command']
+        stages = [ 'serialize', 'encrypt', 'http', 'response_parse', 'decrypt', 'decompress', 'inner_parse', 'output' ]
+        assert all(stats[stage]['count'] == 1 for stage in stages + [ 'total' ])
+        assert sum(stats[stage]['p50'] for stage in stages) == pytest.approx(stats['total']['p50'])
+        reset_http_service()
+
+def test_binary_protocol_streams_the_output_to_the_sink(mock_session: MagicMock) -> None:
+    # Answer with output in the header, and with a raw payload
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, protocol = HTTPService.BINARY_PROTOCOL)
+    for header, payload, expected_output in [
+        ({ 'output': 'uid=33(www-data)\n' * 500, 'nonce': '1' }, b'', 'uid=33(www-data)\n' * 500),
+        ({ 'nonce': '2', 'eof': True }, b'\x00\xff' * 5000, b'\x00\xff' * 5000)
+    ]:
+        frame = create_mock_binary_response(key, header, payload, 'zlib').content
+        mock_session.post.return_value = create_mock_stream_response(frame, 100)
+
+        # Expect the output to have reached the sink, and the rest of the header to be returned
+        pieces = []
+        response = HTTPService().send_request({ 'action': 'test' }, pieces.append)
+        assert type(pieces[0])().join(pieces) == expected_output
+        assert response == { key: value for key, value in header.items() if key not in [ 'output', 'nonce' ] }
+
+    reset_http_service()
+
+def test_streams_big_outputs_in_constant_memory(mock_session: MagicMock) -> None:
+    # Answer with a 32 MB output, generating the response as it is read
+    key = secrets.token_bytes(32)
+    initialize_http_service(key = key, nonce = 'n0')
+    size = 32 * 1024 * 1024
+    def generate_response(chunk_size: int) -> Any:
+        encryptor = AESCypher(key).encryptor()
+        yield f'{{"iv": "{encryptor.iv}", "compression": null, "body": "'.encode()
+        yield encryptor.update(b'{"nonce": "n1", "output": "')
+        line = b'x' * 1022 + b'\\n'
+        for _ in range(size // chunk_size):
+            yield encryptor.update(line * (chunk_size // len(line)))
+        yield encryptor.update(b'"}') + encryptor.finalize() + b'"}'
+    mock_response = MagicMock()
+    mock_response.iter_content.side_effect = generate_response
+    mock_session.post.return_value = mock_response
+
+    # Expect the memory used to be a small fraction of the output
+    received = 0
+    def sink(piece: str) -> None:
+        nonlocal received
+        received += len(piece)
+    tracemalloc.start()
+    HTTPService().send_request({ 'action': 'execute_command' }, sink)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert received == size // 1024 * 1023 and peak < size / 8
+
+    reset_http_service()
 
 ################################################################################
 #                                                                              #
@@ -108,8 +762,9 @@ def run_test_request_args_scenario(request: dict[str, Any], mock_session: MagicM
     assert len(args) == 1 and args[0] == url
 
     # Verify the payload is as expected
-    cypher = http_service._HTTPService__cypher
-    raw_body = cypher.decrypt(kwargs['json']['body'], kwargs['json']['iv'])
+    cypher = AESCypher(key)
+    outer_body = json.loads(kwargs['data'])
+    raw_body = cypher.decrypt(outer_body['body'], outer_body['iv'])
     body = json.loads(raw_body)
 
     assert body['action'] == request['action'] and body['args'] == request['args'] and body['nonce'] == nonce
@@ -132,7 +787,7 @@ def run_test_response_scenario(response: dict[str, Any], mock_session: MagicMock
     assert received_response['output'] == response['output']
 
     # Verify the Nonce has been updated
-    assert http_service._HTTPService__nonce == response['nonce']
+    assert list(http_service._HTTPService__nonces) == [ response['nonce'] ]
 
     reset_http_service()
 
@@ -145,10 +800,12 @@ def run_test_response_scenario(response: dict[str, Any], mock_session: MagicMock
 def initialize_http_service(
     url: str = 'https://example.com/webshell.php',
     key: bytes = secrets.token_bytes(32),
-    nonce: str = binascii.hexlify(secrets.token_bytes(16)).decode()
+    nonce: str = binascii.hexlify(secrets.token_bytes(16)).decode(),
+    protocol: str = HTTPService.JSON_PROTOCOL,
+    window: int = 1
 ) -> None:
     http_service = HTTPService()
-    http_service.initialize(url, key, nonce)
+    http_service.initialize(url, key, nonce, protocol, window)
 
 def create_mock_response(key: bytes, body: dict[str, Any] | str) -> MagicMock:
     # Encrypt the body and convert the object into json
@@ -156,9 +813,47 @@ def create_mock_response(key: bytes, body: dict[str, Any] | str) -> MagicMock:
 
     # Mock the Response object to return the body in the correct format
     mock_response = MagicMock()
-    mock_response.text = json.dumps(response) if body != '' else ''
-    mock_response.json.return_value = response if body != '' else ''
+    mock_response.content = json.dumps(response).encode() if body != '' else b''
+
+    return mock_response
+
+def create_mock_binary_response(key: bytes, header: dict[str, Any], payload: bytes = b'', codec: str | None = None) -> MagicMock:
+    # Build the plaintext, compress it if needed and encrypt it
+    raw_header = json.dumps(header).encode()
+    plaintext = struct.pack('>I', len(raw_header)) + raw_header + payload
+    if codec is not None:
+        plaintext = zlib.compress(plaintext)
+    iv = secrets.token_bytes(16)
+    padding = 16 - len(plaintext) % 16
+    cyphertext = AES.new(key, AES.MODE_CBC, iv).encrypt(plaintext + bytes([padding]) * padding)
+
+    # Mock the Response object to return the frame
+    mock_response = MagicMock()
+    mock_response.content = b'WSB1' + bytes([Compressor().codec_id(codec)]) + iv + cyphertext
+    return mock_response
+
+def decode_binary_frame(key: bytes, frame: bytes) -> tuple[dict[str, Any], bytes]:
+    # Check the magic number and decrypt the frame
+    assert frame[:4] == b'WSB1'
+    iv = frame[5:21]
+    plaintext = AES.new(key, AES.MODE_CBC, iv).decrypt(frame[21:])
+    plaintext = plaintext[:-plaintext[-1]]
 
+    # Split the header and payload
+    header_length = struct.unpack('>I', plaintext[:4])[0]
+    return json.loads(plaintext[4:4 + header_length]), plaintext[4 + header_length:]
+
+def create_rejected_response() -> MagicMock:
+    mock_response = MagicMock()
+    mock_response.status_code = 403
+    return mock_response
+
+def decrypt_request(key: bytes, body: dict[str, Any]) -> dict[str, Any]:
+    return json.loads(AESCypher(key).decrypt(body['body'], body['iv']))
+
+def create_mock_stream_response(body: bytes, chunk_size: int) -> MagicMock:
+    mock_response = MagicMock()
+    mock_response.iter_content.return_value = [ body[i:i + chunk_size] for i in range(0, len(body), chunk_size) ]
     return mock_response
 
 def reset_http_service() -> None:
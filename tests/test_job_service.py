@@ -0,0 +1,109 @@
+from client.job_service import JobService
+from client.http_service import HTTPService
+from client.singleton import Singleton
+
+import pytest
+import threading
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def http_service() -> MagicMock:
+    # Mock HTTPService to return a mock instance
+    http_service = MagicMock()
+    setattr(HTTPService, 'instance', http_service)
+
+    yield http_service
+
+    # Revert mock
+    delattr(HTTPService, 'instance')
+
+@pytest.fixture
+def job_service(http_service: MagicMock) -> JobService:
+    # Return a job service without jobs
+    yield JobService()
+
+    # Reset the job service
+    delattr(JobService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_singleton() -> None:
+    assert issubclass(JobService, Singleton)
+
+def test_runs_jobs_in_the_background(job_service: JobService) -> None:
+    # Start a job that waits to be released
+    release = threading.Event()
+    job_id = job_service.submit('sleep 10', lambda args: release.wait(5) and args['output'], { 'output': 'done' })
+
+    # Expect it to be running until released
+    assert job_id == 1
+    jobs = job_service.get_jobs()
+    assert [ (job['id'], job['description'], job['status']) for job in jobs ] == [ (1, 'sleep 10', JobService.RUNNING) ]
+
+    release.set()
+    assert job_service.wait(job_id) == 'done'
+
+def test_numbers_jobs_in_order(job_service: JobService) -> None:
+    ids = [ job_service.submit(f'echo {i}', lambda args: args['cmd'], { 'cmd': f'echo {i}' }) for i in range(3) ]
+    assert ids == [ 1, 2, 3 ]
+    assert [ job_service.wait(i) for i in ids ] == [ 'echo 0', 'echo 1', 'echo 2' ]
+
+def test_lists_finished_jobs_until_brought_to_the_foreground(job_service: JobService) -> None:
+    # Run a job that succeeds and another one that fails
+    done = job_service.submit('id', lambda args: 'uid=33', {})
+    failed = job_service.submit('!get missing.txt', fail, {})
+    wait_until_finished(job_service)
+
+    # Expect both to be listed with their status
+    assert [ job['status'] for job in job_service.get_jobs() ] == [ JobService.DONE, JobService.FAILED ]
+
+    # Expect their output or error when brought to the foreground, and to be forgotten afterwards
+    assert job_service.wait(done) == 'uid=33'
+    with pytest.raises(FileNotFoundError):
+        job_service.wait(failed)
+    assert job_service.get_jobs() == []
+
+def test_counts_bytes_transferred_by_each_job(job_service: JobService, http_service: MagicMock) -> None:
+    # Report transferred bytes to the listener set by the job
+    http_service.set_transfer_listener.side_effect = lambda listener: setattr(http_service, 'listener', listener)
+    def transfer(args: dict) -> str:
+        http_service.listener(100)
+        http_service.listener(24)
+        return ''
+
+    # Expect the bytes to have been added up, and the listener to have been removed afterwards
+    job_id = job_service.submit('!put big.txt', transfer, {})
+    wait_until_finished(job_service)
+    assert job_service.get_jobs()[0]['bytes'] == 124
+    assert job_service.get_jobs()[0]['elapsed'] >= 0
+    assert http_service.listener is None
+
+def test_fails_to_wait_for_unknown_jobs(job_service: JobService) -> None:
+    with pytest.raises(LookupError):
+        job_service.wait(42)
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def fail(args: dict) -> str:
+    raise FileNotFoundError('missing.txt')
+
+def wait_until_finished(job_service: JobService) -> None:
+    for job in job_service.get_jobs():
+        try:
+            job_service._JobService__jobs[job['id']]['future'].exception(5)
+        except Exception:
+            pass
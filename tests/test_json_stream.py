@@ -0,0 +1,83 @@
+from client.json_stream import JSONStreamParser
+
+import pytest
+import json
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_parses_objects_fed_at_once() -> None:
+    parser = JSONStreamParser({})
+    parser.feed('{"nonce": "1", "eof": true, "length": 10, "nonces": ["2", "3"], "args": {"a": [1, {"b": null}]}}')
+    assert parser.done
+    assert parser.close() == { 'nonce': '1', 'eof': True, 'length': 10, 'nonces': [ '2', '3' ], 'args': { 'a': [ 1, { 'b': None } ] } }
+
+def test_parses_empty_objects() -> None:
+    parser = JSONStreamParser({})
+    parser.feed(' { } ')
+    assert parser.close() == {}
+
+def test_passes_streamed_fields_to_their_handler() -> None:
+    # Feed an object with a streamed field in pieces
+    pieces = []
+    parser = JSONStreamParser({ 'output': pieces.append })
+    run_feed_test_scenario(parser, '{"nonce": "1", "output": "uid=33(www-data)\\ngid=33(www-data)\\n", "eof": false}', 5)
+
+    # Expect the handler to have received the decoded value, and the field not to be saved
+    assert ''.join(pieces) == 'uid=33(www-data)\ngid=33(www-data)\n' and len(pieces) > 1
+    assert parser.close() == { 'nonce': '1', 'eof': False }
+
+def test_does_not_split_escapes() -> None:
+    # Feed a value full of escapes, one character at a time
+    output = 'tab\there "quoted" back\\slash é 😀   /'
+    pieces = []
+    parser = JSONStreamParser({ 'output': pieces.append })
+    run_feed_test_scenario(parser, json.dumps({ 'output': output }), 1)
+
+    # Expect every piece to be valid text, and the value to be complete
+    assert ''.join(pieces) == output
+    assert all(piece.encode() for piece in pieces)
+
+def test_ignores_delimiters_inside_skipped_values() -> None:
+    pieces = []
+    parser = JSONStreamParser({ 'output': pieces.append })
+    run_feed_test_scenario(parser, '{"outputs": ["a,}", "]\\"{"], "output": "test", "capabilities": [[], {}]}', 3)
+    assert ''.join(pieces) == 'test'
+    assert parser.close() == { 'outputs': [ 'a,}', ']"{' ], 'capabilities': [ [], {} ] }
+
+def test_parses_streamed_fields_without_string_values() -> None:
+    pieces = []
+    parser = JSONStreamParser({ 'output': pieces.append })
+    parser.feed('{"output": null}')
+    assert pieces == [] and parser.close() == { 'output': None }
+
+def test_exposes_fields_as_soon_as_they_are_parsed() -> None:
+    parser = JSONStreamParser({ 'body': lambda piece: None })
+    parser.feed('{"iv": "abc", "body": "de')
+    assert parser.fields == { 'iv': 'abc' } and not parser.done
+
+def test_rejects_incomplete_objects() -> None:
+    parser = JSONStreamParser({})
+    parser.feed('{"nonce": "1"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+def test_rejects_invalid_objects() -> None:
+    with pytest.raises(ValueError):
+        JSONStreamParser({}).feed('["nonce"]')
+    with pytest.raises(ValueError):
+        JSONStreamParser({}).feed('{"nonce" "1"}')
+
+################################################################################
+#                                                                              #
+# Test scenarios to avoid test-case code duplication                           #
+#                                                                              #
+################################################################################
+
+def run_feed_test_scenario(parser: JSONStreamParser, text: str, size: int) -> None:
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    assert parser.done
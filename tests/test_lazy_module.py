@@ -0,0 +1,29 @@
+from client.lazy_module import LazyModule
+
+import sys
+import pytest
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_imports_the_module_on_first_use(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Forget the module, if it was imported
+    monkeypatch.delitem(sys.modules, 'colorsys', raising = False)
+    colorsys = LazyModule('colorsys')
+
+    # Expect the module to be imported only when one of its attributes is used
+    assert 'colorsys' not in sys.modules
+    assert colorsys.rgb_to_hsv(0.0, 0.0, 0.0) == (0.0, 0.0, 0.0)
+    assert 'colorsys' in sys.modules
+
+def test_returns_the_attributes_of_the_module() -> None:
+    json = LazyModule('json')
+    assert json.dumps is sys.modules['json'].dumps
+
+def test_raises_an_error_if_the_module_does_not_exist() -> None:
+    missing = LazyModule('client.missing_module')
+    with pytest.raises(ModuleNotFoundError):
+        missing.anything
@@ -0,0 +1,76 @@
+from client.output_sink import OutputSink
+
+import pytest
+import os
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def spilled_output() -> OutputSink:
+    # Write an output bigger than the threshold
+    with OutputSink(threshold = 100) as output:
+        for i in range(1000):
+            output.write(f'line {i}\\n')
+
+    yield output
+
+    # Remove the temporary file
+    os.remove(output.path)
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_keeps_small_outputs_in_memory() -> None:
+    with OutputSink() as output:
+        output.write('uid=33(www-data)')
+    assert not output.spilled and output.path is None and output.text == 'uid=33(www-data)'
+
+def test_converts_escaped_newlines_split_across_pieces() -> None:
+    # Expect the same result as converting the whole output at once
+    pieces = [ 'test1\\', 'ntest2', '\\n', 'test3\\', '\\', 'n\\' ]
+    with OutputSink() as output:
+        for piece in pieces:
+            output.write(piece)
+    assert output.text == ''.join(pieces).replace('\\n', '\n') and output.lines == 4
+
+def test_spills_big_outputs_to_a_temporary_file(spilled_output: OutputSink) -> None:
+    assert spilled_output.spilled and spilled_output.text is None
+    with open(spilled_output.path, 'r') as f:
+        assert f.read() == ''.join(f'line {i}\n' for i in range(1000))
+    assert spilled_output.size == os.path.getsize(spilled_output.path) and spilled_output.lines == 1000
+
+def test_previews_the_first_and_last_lines(spilled_output: OutputSink) -> None:
+    lines = spilled_output.preview(3, 2).split('\n')
+    assert lines[:3] == [ 'line 0', 'line 1', 'line 2' ] and lines[4:] == [ 'line 998', 'line 999' ]
+    assert spilled_output.path in lines[3]
+
+def test_does_not_repeat_lines_of_short_outputs_in_the_preview() -> None:
+    with OutputSink(threshold = 10) as output:
+        output.write('a' * 20 + '\nb\nc')
+    lines = output.preview(2, 5).split('\n')
+    os.remove(output.path)
+
+    assert lines[:2] == [ 'a' * 20, 'b' ] and lines[3:] == [ 'c' ]
+
+def test_cuts_long_lines_in_the_preview() -> None:
+    with OutputSink(threshold = 10) as output:
+        output.write('a' * 5000 + '\n' + 'b' * 5000)
+    lines = output.preview(1, 1).split('\n')
+    os.remove(output.path)
+
+    assert lines[0] == 'a' * OutputSink.MAX_LINE_LENGTH + '...'
+    assert lines[2] == 'b' * OutputSink.MAX_LINE_LENGTH + '...'
+
+def test_writes_redirected_outputs_to_the_file(fs) -> None:
+    with OutputSink('output.txt') as output:
+        output.write('test1\\ntest2')
+    assert not output.spilled and output.text is None and output.path == 'output.txt'
+    with open('output.txt', 'r') as f:
+        assert f.read() == 'test1\ntest2'
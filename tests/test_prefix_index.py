@@ -0,0 +1,109 @@
+from client.prefix_index import PrefixIndex
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_returns_none_for_empty_index() -> None:
+    assert PrefixIndex().latest('ls') is None
+
+def test_returns_latest_command_with_prefix() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'ls -l', 'cat flag.txt', 'ls -la', 'cd /tmp' ]:
+        index.add(cmd)
+
+    assert index.latest('ls') == 'ls -la'
+    assert index.latest('ls -l') == 'ls -la'
+    assert index.latest('c') == 'cd /tmp'
+    assert index.latest('ca') == 'cat flag.txt'
+    assert index.latest('') == 'cd /tmp'
+    assert index.latest('x') is None
+
+def test_repeated_commands_become_the_latest_again() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'ls -l', 'ls -la', 'ls -l' ]:
+        index.add(cmd)
+
+    assert index.latest('ls') == 'ls -l'
+
+def test_older_commands_do_not_replace_newer_ones() -> None:
+    index = PrefixIndex()
+    index.add('ls -la')
+    for cmd in [ 'ls -l', 'cat flag.txt', 'ls' ]:
+        index.add_older(cmd)
+
+    assert index.latest('ls') == 'ls -la'
+    assert index.latest('ls -l') == 'ls -la'
+    assert index.latest('c') == 'cat flag.txt'
+    assert index.latest('') == 'ls -la'
+
+def test_clear_empties_the_index() -> None:
+    index = PrefixIndex()
+    index.add('id')
+    index.clear()
+    assert index.latest('i') is None
+
+def test_returns_latest_command_with_prefix_among_many_commands() -> None:
+    # Add commands branching at different depths, repeating an old one at the end
+    index = PrefixIndex()
+    for i in range(200):
+        index.add(f'echo {i}')
+    for i in range(128):
+        index.add(f'cat file{i}')
+    index.add('echo 5')
+
+    assert index.latest('echo') == 'echo 5'
+    assert index.latest('echo 1') == 'echo 199'
+    assert index.latest('echo 10') == 'echo 109'
+    assert index.latest('cat file1') == 'cat file127'
+    assert index.latest('cat fild') is None
+    assert index.latest('cat file1000') is None
+
+def test_commands_can_be_prefixes_of_other_commands() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'ls -la', 'ls', 'ls -l' ]:
+        index.add(cmd)
+    index.add_older('l')
+
+    assert index.latest('ls') == 'ls -l'
+    assert index.latest('ls -la') == 'ls -la'
+    assert index.latest('l') == 'ls -l'
+    assert index.latest('ls -lah') is None
+
+def test_supports_prefixes_ending_in_the_last_character() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'echo \U0010ffff', 'echo \U0010ffffa', 'echp' ]:
+        index.add(cmd)
+
+    assert index.latest('echo \U0010ffff') == 'echo \U0010ffffa'
+    assert index.latest('\U0010ffff') is None
+
+def test_removes_the_least_recently_used_commands() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'ls -l', 'ls -la', 'cat flag.txt', 'ls' ]:
+        index.add(cmd)
+
+    # Remove the commands from the oldest
+    index.remove('ls -l')
+    assert index.latest('ls -l') == 'ls -la'
+    index.remove('ls -la')
+    assert index.latest('ls -l') is None and index.latest('ls') == 'ls'
+    index.remove('cat flag.txt')
+    assert index.latest('c') is None and index.latest('') == 'ls'
+    index.remove('ls')
+    assert index.latest('') is None
+
+def test_merges_nodes_left_with_a_single_branch() -> None:
+    index = PrefixIndex()
+    for cmd in [ 'ab', 'abc', 'abd' ]:
+        index.add(cmd)
+    index.remove('ab')
+    index.remove('abc')
+
+    # Expect the remaining command to be found from any of its prefixes
+    assert [ index.latest(prefix) for prefix in [ '', 'a', 'ab', 'abd' ] ] == [ 'abd' ] * 4
+    assert index.latest('abc') is None
+    index.add('abc')
+    assert index.latest('ab') == 'abc' and index.latest('abd') == 'abd'
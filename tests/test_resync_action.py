@@ -0,0 +1,41 @@
+from client.action import Action
+from client.resync_action import ResyncAction
+from client.http_service import HTTPService
+
+import pytest
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def http_service() -> MagicMock:
+    # Mock HTTPService to return a mock instance
+    http_service = MagicMock()
+    setattr(HTTPService, 'instance', http_service)
+
+    yield http_service
+
+    # Revert mock
+    delattr(HTTPService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_an_action() -> None:
+    assert issubclass(ResyncAction, Action)
+
+def test_resyncs_the_nonce(http_service: MagicMock) -> None:
+    assert ResyncAction().run({}) == 'Nonce resynchronized'
+    http_service.resync.assert_called_once()
+
+def test_raises_error_if_the_webshell_cannot_resync(http_service: MagicMock) -> None:
+    http_service.resync.side_effect = PermissionError('The webshell rejected the nonce')
+    with pytest.raises(PermissionError):
+        ResyncAction().run({})
@@ -0,0 +1,145 @@
+from client.script_runner import ScriptRunner
+from client.client import Client
+
+import io
+import json
+from typing import Any
+from unittest.mock import MagicMock
+from pytest_mock import MockFixture
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_a_client() -> None:
+    assert issubclass(ScriptRunner, Client)
+
+def test_runs_consecutive_commands_as_a_batch(mocker: MockFixture) -> None:
+    # Run a script with commands, comments and actions
+    script = '# Enumeration\nid\n\npwd\n!get /etc/passwd\nwhoami\n'
+    runner, actions = create_runner(script)
+    mock_print = mocker.patch('builtins.print')
+
+    # Expect the commands around the action to have been batched, in order
+    assert runner.run() == 0
+    assert actions['execute_batch'].run.call_args_list[0].args[0] == { 'cmds': [ 'id', 'pwd' ] }
+    actions['download_file'].run.assert_called_once_with({ 'filename': '/etc/passwd', 'binary': False })
+    assert actions['execute_batch'].run.call_args_list[1].args[0] == { 'cmds': [ 'whoami' ] }
+    assert [ c.args[0] for c in mock_print.call_args_list ] == [ 'batch', 'download', 'batch' ]
+
+def test_reads_explicit_batches_from_the_script(mocker: MockFixture) -> None:
+    # Run a script with a batch, whose commands would otherwise run on their own
+    runner, actions = create_runner('id\n!batch\nps aux > !processes.txt\n\n!get /etc/passwd\n!end\npwd\n', ScriptRunner.JSONL_FORMAT)
+    mock_input = mocker.patch('builtins.input', side_effect = EOFError())
+    mock_print = mocker.patch('builtins.print')
+
+    # Expect the commands of the batch to have been read from the script, without prompting
+    assert runner.run() == 0
+    actions['execute_batch'].execute.assert_called_once_with([ 'id', 'ps aux > !processes.txt', '!get /etc/passwd', 'pwd' ])
+    assert [ f['input'] for f in read_frames(mock_print) ] == [ 'id', 'ps aux > !processes.txt', '!get /etc/passwd', 'pwd' ]
+    mock_input.assert_not_called()
+
+def test_reads_batches_left_open_until_the_end_of_the_script(mocker: MockFixture) -> None:
+    runner, actions = create_runner('!batch\nid\npwd\n')
+    mocker.patch('builtins.input', side_effect = EOFError())
+    mocker.patch('builtins.print')
+
+    assert runner.run() == 0
+    actions['execute_batch'].run.assert_called_once_with({ 'cmds': [ 'id', 'pwd' ] })
+
+def test_runs_commands_redirected_to_a_file_on_their_own(mocker: MockFixture) -> None:
+    runner, actions = create_runner('id\nps aux > !processes.txt\npwd\n')
+    actions['execute_command'].run.return_value = 'Output saved to processes.txt'
+    mocker.patch('builtins.print')
+
+    assert runner.run() == 0
+    assert [ c.args[0] for c in actions['execute_batch'].run.call_args_list ] == [ { 'cmds': [ 'id' ] }, { 'cmds': [ 'pwd' ] } ]
+    actions['execute_command'].run.assert_called_once_with({ 'cmd': 'ps aux', 'output_file': 'processes.txt' })
+
+def test_stops_at_exit(mocker: MockFixture) -> None:
+    runner, actions = create_runner('id\nexit\npwd\n')
+    mocker.patch('builtins.print')
+
+    runner.run()
+    actions['execute_batch'].run.assert_called_once_with({ 'cmds': [ 'id' ] })
+
+def test_reports_failed_actions(mocker: MockFixture) -> None:
+    runner, actions = create_runner('!get missing.txt\nid\n')
+    actions['download_file'].run.side_effect = FileNotFoundError('missing.txt')
+    mock_print = mocker.patch('builtins.print')
+
+    # Expect the error to be shown, the script to go on, and the status to reflect the failure
+    assert runner.run() == 1
+    mock_print.assert_any_call('Error: the requested action could not be performed')
+    actions['execute_batch'].run.assert_called_once_with({ 'cmds': [ 'id' ] })
+
+def test_writes_a_json_line_per_command(mocker: MockFixture) -> None:
+    # Run a script writing JSON lines
+    runner, actions = create_runner('id\npwd\n!get /etc/passwd\n', ScriptRunner.JSONL_FORMAT)
+    mock_print = mocker.patch('builtins.print')
+    assert runner.run() == 0
+
+    # Expect a frame per command, with its output (converting newlines) and timing
+    frames = read_frames(mock_print)
+    assert [ (f['seq'], f['input'], f['status'], f['output']) for f in frames ] == [
+        (1, 'id', 'ok', 'output of id\n'),
+        (2, 'pwd', 'ok', 'output of pwd\n'),
+        (3, '!get /etc/passwd', 'ok', 'download')
+    ]
+    assert all(f['started'] > 0 and f['duration'] >= 0 and 'error' not in f for f in frames)
+    actions['execute_batch'].execute.assert_called_once_with([ 'id', 'pwd' ])
+    assert all(c.kwargs == { 'flush': True } for c in mock_print.call_args_list)
+
+def test_writes_errors_as_json_lines(mocker: MockFixture) -> None:
+    # Fail an action and a batch
+    runner, actions = create_runner('!get missing.txt\nid\npwd\n', ScriptRunner.JSONL_FORMAT)
+    actions['download_file'].run.side_effect = FileNotFoundError('missing.txt')
+    actions['execute_batch'].execute.side_effect = ConnectionError()
+    mock_print = mocker.patch('builtins.print')
+
+    # Expect a frame with the error of each command
+    assert runner.run() == 1
+    frames = read_frames(mock_print)
+    assert [ (f['input'], f['status'], f['output'], f['error']) for f in frames ] == [
+        ('!get missing.txt', 'error', None, 'missing.txt'),
+        ('id', 'error', None, 'ConnectionError'),
+        ('pwd', 'error', None, 'ConnectionError')
+    ]
+
+def test_writes_the_frame_of_each_command_as_soon_as_it_completes(mocker: MockFixture) -> None:
+    # Run the commands one at a time, failing the last one
+    runner, actions = create_runner('id\npwd\nwhoami\n', ScriptRunner.JSONL_FORMAT)
+    mock_print = mocker.patch('builtins.print')
+    def execute(cmds: list[str]) -> Any:
+        yield [ 'output of id' ]
+        assert len(mock_print.call_args_list) == 1
+        yield [ 'output of pwd' ]
+        raise ConnectionError()
+    actions['execute_batch'].execute.side_effect = execute
+
+    # Expect the commands already run to be reported as such
+    assert runner.run() == 1
+    frames = read_frames(mock_print)
+    assert [ (f['input'], f['status'], f['output']) for f in frames ] == [
+        ('id', 'ok', 'output of id'),
+        ('pwd', 'ok', 'output of pwd'),
+        ('whoami', 'error', None)
+    ]
+
+################################################################################
+#                                                                              #
+# Helper functions                                                             #
+#                                                                              #
+################################################################################
+
+def create_runner(script: str, output_format: str = ScriptRunner.TEXT_FORMAT) -> tuple[ScriptRunner, dict[str, MagicMock]]:
+    actions = { key: MagicMock() for key in [ 'execute_command', 'execute_batch', 'download_file', 'show_history' ] }
+    actions['execute_batch'].run.return_value = 'batch'
+    actions['execute_batch'].execute.side_effect = lambda cmds: iter([ [ f'output of {cmd}\\n' for cmd in cmds ] ])
+    actions['download_file'].run.return_value = 'download'
+    return ScriptRunner(actions, io.StringIO(script), output_format), actions
+
+def read_frames(mock_print: MagicMock) -> list[dict]:
+    return [ json.loads(c.args[0]) for c in mock_print.call_args_list ]
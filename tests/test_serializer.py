@@ -0,0 +1,37 @@
+from client.serializer import Serializer
+
+import pytest
+import json
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_json_is_always_available() -> None:
+    assert 'json' in Serializer().backends()
+
+def test_uses_the_fastest_available_backend() -> None:
+    serializer = Serializer()
+    assert serializer.backend == serializer.backends()[0]
+
+def test_falls_back_to_json_if_no_backend_is_installed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('client.serializer.orjson', None)
+    monkeypatch.setattr('client.serializer.ujson', None)
+    serializer = Serializer()
+    assert serializer.backends() == [ 'json' ] and serializer.backend == 'json'
+
+def test_serializes_and_parses_with_each_backend() -> None:
+    obj = { 'action': 'execute_command', 'args': { 'cmd': 'echo ñ' }, 'nonce': None, 'window': 2, 'compression': [ 'zlib' ] }
+    for backend in Serializer().backends():
+        serializer = Serializer(backend)
+        data = serializer.dumps(obj)
+        assert isinstance(data, bytes) and json.loads(data) == obj
+        assert serializer.loads(data) == obj
+        assert serializer.loads(data.decode()) == obj
+        assert serializer.loads(memoryview(b'  ' + data)[2:]) == obj
+
+def test_rejects_unknown_backends() -> None:
+    with pytest.raises(ValueError):
+        Serializer('simplejson')
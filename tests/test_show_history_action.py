@@ -12,8 +12,8 @@ from pyfakefs.fake_filesystem import FakeFilesystem
 ################################################################################
 
 @pytest.fixture
-def history_service() -> HistoryService:
-    # Return a history service instance
+def history_service(fs: FakeFilesystem) -> HistoryService:
+    # Return a history service instance, using the fake filesystem
     yield HistoryService()
 
     # Reset the history service
@@ -49,6 +49,30 @@ def test_returns_last_instance_of_executed_command_when_supplied_different_searc
     run_search_history_test_scenario(saved_history, target, history_service)
 
 
+def test_fails_if_no_command_matches_the_search_parameter(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    with pytest.raises(LookupError):
+        ShowHistoryAction().run({ 'search': 'whoami' })
+
+def test_returns_last_command_containing_a_fragment(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    for cmd in [ 'cat /etc/passwd', 'id', 'grep root /etc/passwd', 'pwd' ]:
+        history_service.add_command(cmd)
+    assert ShowHistoryAction().run({ 'contains': 'passwd' }) == 'grep root /etc/passwd'
+
+def test_fails_if_no_command_contains_the_fragment(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    history_service.add_command('id')
+    with pytest.raises(LookupError):
+        ShowHistoryAction().run({ 'contains': 'passwd' })
+
+def test_lists_commands_containing_a_fragment(history_service: HistoryService, fs: FakeFilesystem) -> None:
+    for cmd in [ 'cat /etc/passwd', 'id', 'grep root /etc/passwd' ]:
+        history_service.add_command(cmd)
+
+    # Expect the matching commands from oldest to newest, without unknown details
+    lines = ShowHistoryAction().run({ 'find': 'passwd' }).split('\n')
+    assert len(lines) == 2
+    assert lines[0].startswith('-') and lines[0].endswith('  cat /etc/passwd')
+    assert lines[1].endswith('  grep root /etc/passwd')
 
 ################################################################################
 #                                                                              #
@@ -89,5 +113,6 @@ def run_search_history_test_scenario(saved_history: list[str], cmd: str, history
 ################################################################################
 
 def reset_history_service() -> None:
-    # Destroy the created instance to reset state
+    # Save the pending commands and destroy the created instance to reset state
+    HistoryService().close()
     delattr(HistoryService, 'instance')
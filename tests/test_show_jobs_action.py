@@ -0,0 +1,48 @@
+from client.action import Action
+from client.show_jobs_action import ShowJobsAction
+from client.job_service import JobService
+
+import pytest
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def job_service() -> MagicMock:
+    # Mock JobService to return a mock instance
+    job_service = MagicMock()
+    setattr(JobService, 'instance', job_service)
+
+    yield job_service
+
+    # Revert mock
+    delattr(JobService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_an_action() -> None:
+    assert issubclass(ShowJobsAction, Action)
+
+def test_shows_message_if_there_are_no_jobs(job_service: MagicMock) -> None:
+    job_service.get_jobs.return_value = []
+    assert ShowJobsAction().run({}) == 'No background jobs'
+
+def test_shows_each_job(job_service: MagicMock) -> None:
+    job_service.get_jobs.return_value = [
+        { 'id': 1, 'description': 'tar czf /tmp/www.tgz /var/www', 'status': 'running', 'elapsed': 12.34, 'bytes': 256 },
+        { 'id': 2, 'description': '!get /tmp/www.tgz', 'status': 'done', 'elapsed': 3.0, 'bytes': 1048576 }
+    ]
+
+    # Expect a line per job with its state, elapsed time and transferred bytes
+    lines = ShowJobsAction().run({}).split('\n')
+    assert lines[0].split() == [ 'id', 'status', 'elapsed', 'bytes', 'command' ]
+    assert lines[1].split() == [ '1', 'running', '12.3', 's', '256', 'B', 'tar', 'czf', '/tmp/www.tgz', '/var/www' ]
+    assert lines[2].split() == [ '2', 'done', '3.0', 's', '1048576', 'B', '!get', '/tmp/www.tgz' ]
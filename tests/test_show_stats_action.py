@@ -0,0 +1,46 @@
+from client.action import Action
+from client.show_stats_action import ShowStatsAction
+from client.stats_service import StatsService
+
+import pytest
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def stats_service() -> StatsService:
+    # Return an empty stats service instance
+    stats_service = StatsService()
+    stats_service.reset()
+    yield stats_service
+
+    # Reset the stats service
+    delattr(StatsService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_an_action() -> None:
+    assert issubclass(ShowStatsAction, Action)
+
+def test_shows_message_if_there_are_no_requests(stats_service: StatsService) -> None:
+    assert ShowStatsAction().run({}) == 'No requests have been sent yet'
+
+def test_shows_percentiles_of_each_stage(stats_service: StatsService) -> None:
+    # Record a request
+    stats_service.record('execute_command', { 'encrypt': 0.0005, 'http': 0.25, 'total': 0.3 }, 128, 4096)
+
+    # Expect each stage to be shown in milliseconds and each size in bytes
+    output = ShowStatsAction().run({})
+    lines = output.split('\n')
+    assert 'execute_command (1 requests)' in lines
+    assert any(line.split() == [ 'http', '250.00', 'ms', '250.00', 'ms', '250.00', 'ms' ] for line in lines)
+    assert any(line.split() == [ 'encrypt', '0.50', 'ms', '0.50', 'ms', '0.50', 'ms' ] for line in lines)
+    assert any(line.split() == [ 'response_bytes', '4096', 'B', '4096', 'B', '4096', 'B' ] for line in lines)
+    assert 'all (1 requests)' in lines
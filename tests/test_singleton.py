@@ -14,7 +14,8 @@ import pytest
 def singleton_factory() -> Callable[[], Singleton]:
     # Create a Singleton class for testing the metaclass
     class TestSingleton(Singleton):
-        pass
+        def __init__(self) -> None:
+            self.initializations = getattr(self, 'initializations', 0) + 1
     
     # Define a factory function to create singleton instances
     def _singleton_factory():
@@ -38,5 +39,13 @@ def test_returns_the_same_object(singleton_factory: Callable[[], Singleton]) ->
     # Expect both instances to be the same object
     assert instance1 is instance2
 
+def test_initializes_the_object_once(singleton_factory: Callable[[], Singleton]) -> None:
+    # Get the singleton instance several times
+    singleton_factory()
+    instance = singleton_factory()
+
+    # Expect __init__ to only have run when the instance was created
+    assert instance.initializations == 1
+
 def test_singleton_is_abc() -> None:
     assert issubclass(Singleton, ABC)
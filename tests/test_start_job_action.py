@@ -0,0 +1,47 @@
+from client.action import Action
+from client.start_job_action import StartJobAction
+from client.job_service import JobService
+
+import pytest
+from unittest.mock import MagicMock
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def job_service() -> MagicMock:
+    # Mock JobService to return a mock instance
+    job_service = MagicMock()
+    setattr(JobService, 'instance', job_service)
+
+    yield job_service
+
+    # Revert mock
+    delattr(JobService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_an_action() -> None:
+    assert issubclass(StartJobAction, Action)
+
+def test_runs_the_requested_action_in_the_background(job_service: MagicMock) -> None:
+    # Start a job running the download action
+    download_file = MagicMock()
+    job_service.submit.return_value = 3
+    action = StartJobAction({ 'download_file': download_file })
+    output = action.run({
+        'action': 'download_file',
+        'args': { 'filename': 'backup.tar.gz', 'binary': True },
+        'description': '!binget backup.tar.gz'
+    })
+
+    # Expect the job to have been submitted and its identifier returned
+    job_service.submit.assert_called_once_with('!binget backup.tar.gz', download_file.run, { 'filename': 'backup.tar.gz', 'binary': True })
+    assert output == '[3] !binget backup.tar.gz'
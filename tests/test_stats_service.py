@@ -0,0 +1,89 @@
+from client.stats_service import StatsService
+from client.singleton import Singleton
+
+import pytest
+import sys
+import threading
+
+################################################################################
+#                                                                              #
+# Fixtures -> used for setup and teardown                                      #
+#                                                                              #
+################################################################################
+
+@pytest.fixture
+def stats_service() -> StatsService:
+    # Return an empty stats service instance
+    stats_service = StatsService()
+    stats_service.reset()
+    yield stats_service
+
+    # Reset the stats service
+    delattr(StatsService, 'instance')
+
+################################################################################
+#                                                                              #
+# Test cases                                                                   #
+#                                                                              #
+################################################################################
+
+def test_is_singleton() -> None:
+    assert issubclass(StatsService, Singleton)
+
+def test_keeps_samples_across_instantiations(stats_service: StatsService) -> None:
+    stats_service.record('execute_command', { 'http': 0.1 }, 10, 20)
+    assert StatsService().get_stats()['execute_command']['http']['count'] == 1
+
+def test_computes_percentiles_per_stage_and_action(stats_service: StatsService) -> None:
+    # Record 100 requests with increasing durations
+    for i in range(1, 101):
+        stats_service.record('execute_command', { 'http': i / 1000, 'decrypt': i / 10000 }, i, 2 * i)
+
+    # Expect the percentiles of each metric to be computed
+    stats = stats_service.get_stats()['execute_command']
+    assert stats['http'] == { 'count': 100, 'p50': 0.05, 'p95': 0.095, 'p99': 0.099 }
+    assert stats['decrypt']['p50'] == 0.005
+    assert stats['response_bytes']['p99'] == 198
+
+def test_computes_aggregate_statistics(stats_service: StatsService) -> None:
+    # Record requests of different actions
+    stats_service.record('execute_command', { 'http': 0.1 }, 10, 20)
+    stats_service.record('download_file', { 'http': 0.3 }, 10, 20)
+
+    # Expect the statistics to be shown per action and for all of them
+    stats = stats_service.get_stats()
+    assert stats['execute_command']['http']['count'] == 1 and stats['download_file']['http']['count'] == 1
+    assert stats['all']['http']['count'] == 2
+
+def test_keeps_only_most_recent_samples(stats_service: StatsService) -> None:
+    for i in range(StatsService.MAX_SAMPLES + 10):
+        stats_service.record('execute_command', { 'http': 0.1 }, 10, 20)
+    assert stats_service.get_stats()['execute_command']['http']['count'] == StatsService.MAX_SAMPLES
+
+def test_reset_removes_samples(stats_service: StatsService) -> None:
+    stats_service.record('execute_command', { 'http': 0.1 }, 10, 20)
+    stats_service.reset()
+    assert stats_service.get_stats() == {}
+
+def test_computes_statistics_while_samples_are_recorded(stats_service: StatsService) -> None:
+    # Record samples of new actions from another thread, as jobs do, switching threads as often as
+    # possible
+    done = threading.Event()
+    def record() -> None:
+        for i in range(2000):
+            stats_service.record(f'action_{i}', { 'http': 0.1 }, 10, 20)
+        done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread = threading.Thread(target = record)
+        thread.start()
+
+        # Expect the statistics to be computed without the samples changing during the iteration
+        while not done.is_set():
+            stats_service.get_stats()
+        thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert len(stats_service.get_stats()) == 2001
